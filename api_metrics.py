@@ -0,0 +1,215 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class _Histogram:
+    """Простая гистограмма с фиксированными границами корзин (в секундах)."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Последняя корзина - +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Приближенный квантиль: верхняя граница корзины, в которую он попадает."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        running = 0
+        for i, bucket_count in enumerate(self.counts):
+            running += bucket_count
+            if running >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+class _EndpointStats:
+    """Накопленная статистика по одному эндпоинту."""
+
+    def __init__(self, buckets):
+        self.latency = _Histogram(buckets)
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.statuses: Dict[str, int] = {}
+        self.throttled = 0
+
+
+class ApiMetrics:
+    """
+    Потокобезопасный сборщик метрик для OzonSellerAPI и циклов синхронизации.
+    Умеет отдавать данные в формате Prometheus и в виде текста для окна статистики.
+    """
+
+    LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+    CYCLE_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, _EndpointStats] = {}
+        self._cycles: Dict[str, _Histogram] = {}
+        self._cycle_results: Dict[tuple, int] = {}
+        self._last_cycle: Dict[str, float] = {}
+        self.started_at = time.time()
+
+    def _endpoint(self, endpoint: str) -> _EndpointStats:
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            stats = self._endpoints[endpoint] = _EndpointStats(self.LATENCY_BUCKETS)
+        return stats
+
+    def observe_request(self, endpoint: str, duration: float, status: str,
+                        bytes_out: int = 0, bytes_in: int = 0):
+        """
+        Регистрирует один запрос к API.
+
+        Args:
+            endpoint: Эндпоинт (например, '/v3/product/list').
+            duration: Длительность запроса в секундах.
+            status: HTTP-код ответа строкой или 'error' для сетевых ошибок.
+            bytes_out: Размер тела запроса.
+            bytes_in: Размер тела ответа.
+        """
+        with self._lock:
+            stats = self._endpoint(endpoint)
+            stats.latency.observe(duration)
+            stats.bytes_out += bytes_out
+            stats.bytes_in += bytes_in
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            if status == "429":
+                stats.throttled += 1
+
+    def observe_cycle(self, name: str, duration: float, ok: bool = True):
+        """Регистрирует длительность цикла синхронизации (например, 'price_update')."""
+        with self._lock:
+            histogram = self._cycles.get(name)
+            if histogram is None:
+                histogram = self._cycles[name] = _Histogram(self.CYCLE_BUCKETS)
+            histogram.observe(duration)
+            key = (name, "ok" if ok else "error")
+            self._cycle_results[key] = self._cycle_results.get(key, 0) + 1
+            self._last_cycle[name] = duration
+
+    def render_prometheus(self) -> str:
+        """Возвращает все метрики в текстовом формате Prometheus."""
+        lines = []
+        with self._lock:
+            lines.append("# HELP ozon_api_request_duration_seconds Latency of Ozon Seller API requests.")
+            lines.append("# TYPE ozon_api_request_duration_seconds histogram")
+            for endpoint, stats in sorted(self._endpoints.items()):
+                lines.extend(_histogram_lines("ozon_api_request_duration_seconds",
+                                              stats.latency, f'endpoint="{endpoint}"'))
+
+            lines.append("# HELP ozon_api_requests_total Ozon Seller API requests by status code.")
+            lines.append("# TYPE ozon_api_requests_total counter")
+            for endpoint, stats in sorted(self._endpoints.items()):
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(f'ozon_api_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+
+            for metric, attr, help_text in (
+                    ("ozon_api_request_bytes_total", "bytes_out", "Bytes sent in request bodies."),
+                    ("ozon_api_response_bytes_total", "bytes_in", "Bytes received in response bodies."),
+                    ("ozon_api_throttled_total", "throttled", "Requests rejected with HTTP 429.")):
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} counter")
+                for endpoint, stats in sorted(self._endpoints.items()):
+                    lines.append(f'{metric}{{endpoint="{endpoint}"}} {getattr(stats, attr)}')
+
+            lines.append("# HELP ozon_sync_cycle_duration_seconds Duration of sync cycles.")
+            lines.append("# TYPE ozon_sync_cycle_duration_seconds histogram")
+            for name, histogram in sorted(self._cycles.items()):
+                lines.extend(_histogram_lines("ozon_sync_cycle_duration_seconds", histogram, f'cycle="{name}"'))
+
+            lines.append("# HELP ozon_sync_cycles_total Sync cycles by result.")
+            lines.append("# TYPE ozon_sync_cycles_total counter")
+            for (name, result), count in sorted(self._cycle_results.items()):
+                lines.append(f'ozon_sync_cycles_total{{cycle="{name}",result="{result}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def render_text(self) -> str:
+        """Возвращает краткую сводку для окна статистики в приложении."""
+        lines = [f"Время работы: {int(time.time() - self.started_at)} с", ""]
+        with self._lock:
+            lines.append("Эндпоинт | запросов | p50 / p95, с | получено / отправлено, КБ | коды | 429")
+            for endpoint, stats in sorted(self._endpoints.items()):
+                codes = ", ".join(f"{status}: {count}" for status, count in sorted(stats.statuses.items()))
+                lines.append(
+                    f"{endpoint} | {stats.latency.count} | "
+                    f"{stats.latency.quantile(0.5):g} / {stats.latency.quantile(0.95):g} | "
+                    f"{stats.bytes_in / 1024:.1f} / {stats.bytes_out / 1024:.1f} | {codes} | "
+                    f"{stats.throttled}"
+                )
+            lines.append("")
+            lines.append("Цикл | выполнено | среднее, с | последний, с | ошибок")
+            for name, histogram in sorted(self._cycles.items()):
+                average = histogram.total / histogram.count if histogram.count else 0.0
+                errors = self._cycle_results.get((name, "error"), 0)
+                lines.append(f"{name} | {histogram.count} | {average:.2f} | {self._last_cycle[name]:.2f} | {errors}")
+        return "\n".join(lines)
+
+
+def _histogram_lines(metric: str, histogram: _Histogram, labels: str):
+    running = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        running += count
+        yield f'{metric}_bucket{{{labels},le="{bound:g}"}} {running}'
+    yield f'{metric}_bucket{{{labels},le="+Inf"}} {histogram.count}'
+    yield f"{metric}_sum{{{labels}}} {histogram.total:.6f}"
+    yield f"{metric}_count{{{labels}}} {histogram.count}"
+
+
+# Общий сборщик метрик приложения
+REGISTRY = ApiMetrics()
+
+
+class _MetricsRequestHandler:
+    """Обработчик GET /metrics; смешивается с BaseHTTPRequestHandler в start_metrics_server."""
+    metrics: ApiMetrics = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.metrics.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Не засоряем консоль запросами Prometheus
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1",
+                         metrics: Optional[ApiMetrics] = None) -> Optional["ThreadingHTTPServer"]:
+    """
+    Запускает локальный HTTP-сервер с метриками (GET /metrics) в фоновом потоке.
+
+    Returns:
+        Объект сервера или None, если порт занят.
+    """
+    # http.server заметно замедляет импорт, а нужен только здесь
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    handler = type("MetricsRequestHandler", (_MetricsRequestHandler, BaseHTTPRequestHandler),
+                   {"metrics": metrics or REGISTRY})
+    try:
+        server = ThreadingHTTPServer((host, port), handler)
+    except OSError as e:
+        logger.warning("Не удалось запустить сервер метрик на %s:%s: %s", host, port, e)
+        return None
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    logger.info("Метрики доступны по адресу http://%s:%s/metrics", host, port)
+    return server
@@ -0,0 +1,99 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from typing import Iterable, Optional
+
+# Формат строки лога: время, уровень, поток, модуль и сообщение с доп. полями key=value
+LOG_FORMAT = "%(asctime)s %(levelname)-7s [%(threadName)s] %(name)s: %(message)s"
+LOG_FILE_NAME = "ozon_price_equalizer.log"
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUP_COUNT = 5
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Форматтер, который дописывает к сообщению структурированные поля.
+    Поля передаются через extra={"fields": {...}} и выводятся как key=value.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            message += " | " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return message
+
+
+def default_log_dir() -> str:
+    """Каталог для файлов лога: OZON_LOG_DIR или ~/OzonPriceEqualizer/logs."""
+    return os.environ.get("OZON_LOG_DIR") or os.path.join(os.path.expanduser("~"), "OzonPriceEqualizer", "logs")
+
+
+def setup_logging(log_dir: Optional[str] = None, level: Optional[str] = None) -> logging.handlers.QueueListener:
+    """
+    Настраивает логирование приложения.
+
+    Все логгеры пишут в неблокирующий QueueHandler, а реальный вывод (файл с ротацией
+    и консоль) выполняет отдельный поток QueueListener. Поэтому потоки GUI и воркеров
+    не ждут дискового и консольного ввода-вывода.
+
+    Args:
+        log_dir: Каталог для файлов лога (по умолчанию default_log_dir()).
+        level: Уровень логирования; по умолчанию берется из OZON_LOG_LEVEL или INFO.
+
+    Returns:
+        Запущенный QueueListener (останавливается автоматически при выходе).
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    level_name = (level or os.environ.get("OZON_LOG_LEVEL") or "INFO").upper()
+    formatter = StructuredFormatter(LOG_FORMAT)
+    handlers = []
+
+    log_dir = log_dir or default_log_dir()
+    try:
+        os.makedirs(log_dir, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            os.path.join(log_dir, LOG_FILE_NAME), maxBytes=LOG_FILE_MAX_BYTES,
+            backupCount=LOG_FILE_BACKUP_COUNT, encoding="utf-8"
+        )
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+    except OSError as e:
+        if sys.stderr is not None:
+            sys.stderr.write(f"Не удалось открыть файл лога в {log_dir}: {e}\n")
+
+    # В сборке PyInstaller --windowed консоли нет, и sys.stderr равен None
+    if sys.stderr is not None:
+        console_handler = logging.StreamHandler(sys.stderr)
+        console_handler.setFormatter(formatter)
+        handlers.append(console_handler)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(getattr(logging, level_name, logging.INFO))
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
+
+
+def summarize_items(items: Iterable, limit: int = 5) -> str:
+    """
+    Сворачивает список элементов в короткую строку для одного сообщения лога:
+    'A1, A2, A3 и еще 997'. Используется вместо отдельной строки на каждый товар.
+    """
+    items = list(items)
+    shown = ", ".join(str(item) for item in items[:limit])
+    if len(items) > limit:
+        shown += f" и еще {len(items) - limit}"
+    return shown
@@ -0,0 +1,223 @@
+"""
+Потоковая выгрузка каталога и рассчитанных цен в CSV или Parquet.
+
+Записи строятся прямо из загруженного каталога (без QTableWidget) и пишутся
+пачками по CHUNK_ROWS строк, поэтому выгрузка 100 тыс. товаров занимает секунды.
+Файл сначала пишется во временный и затем переименовывается, так что
+аналитика никогда не прочитает недописанный снимок.
+
+Можно запускать без GUI (например, по расписанию из cron):
+    python catalog_export.py --out snapshots/catalog.parquet
+Учетные данные берутся из OZON_CLIENT_ID/OZON_API_KEY или из настроек приложения.
+"""
+import argparse
+import csv
+import itertools
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, Optional
+
+import pricing
+
+logger = logging.getLogger(__name__)
+
+# Сколько строк писать за раз
+CHUNK_ROWS = 10000
+
+# Столбцы выгрузки в порядке записи
+EXPORT_COLUMNS = (
+    "exported_at", "product_id", "offer_id", "name", "status", "price", "marketing_price",
+    "coef", "displayed_price", "target", "deviation", "deviation_pct", "out_of_band",
+)
+
+FORMATS = ("csv", "parquet")
+
+
+class CatalogExportError(Exception):
+    """Выгрузку не удалось выполнить (неизвестный формат, нет нужной библиотеки)."""
+
+
+def product_status(product: Dict) -> str:
+    """Статус товара так же, как в столбце 'Статус' таблицы."""
+    status = product.get('statuses', {}).get('status_description', 'Статус не найден')
+    return 'Продается' if status == '' else status
+
+
+def iter_records(products: Iterable[Dict], tracked_products: Optional[Dict[str, float]] = None,
+                 coef: float = 0.852, product_coefs: Optional[Dict[str, float]] = None,
+                 exported_at: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Строит записи выгрузки по товарам каталога.
+    Товары без корректной цены пропускаются (как и в таблице).
+    Для отслеживаемых товаров заполняются желаемая цена и отклонение от нее цены продавца.
+    """
+    tracked_products = tracked_products or {}
+    product_coefs = product_coefs or {}
+    exported_at = exported_at or datetime.now(timezone.utc).isoformat(timespec="seconds")
+    for product in products:
+        prices = pricing.parse_prices(product)
+        if prices is None:
+            continue
+        price, marketing_price = prices
+        offer_id = product.get('offer_id')
+        product_coef = product_coefs.get(offer_id, coef)
+        target = tracked_products.get(offer_id)
+        deviation = deviation_pct = out_of_band = None
+        if target:
+            deviation = price - target
+            deviation_pct = deviation / target * 100
+            out_of_band = pricing.is_out_of_band(price, target)
+        yield {
+            "exported_at": exported_at,
+            "product_id": product.get('product_id', product.get('id')),
+            "offer_id": offer_id,
+            "name": product.get('name'),
+            "status": product_status(product),
+            "price": price,
+            "marketing_price": marketing_price,
+            "coef": product_coef,
+            "displayed_price": pricing.displayed_price(price, marketing_price, product_coef) if price else None,
+            "target": target,
+            "deviation": deviation,
+            "deviation_pct": deviation_pct,
+            "out_of_band": out_of_band,
+        }
+
+
+def _chunks(records: Iterable[Dict], size: int) -> Iterator[list]:
+    iterator = iter(records)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _write_csv(records: Iterable[Dict], path: str, chunk_rows: int) -> int:
+    rows = 0
+    # utf-8-sig и ';' - чтобы файл сразу открывался в Excel с русской локалью
+    with open(path, "w", encoding="utf-8-sig", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=EXPORT_COLUMNS, delimiter=";")
+        writer.writeheader()
+        for chunk in _chunks(records, chunk_rows):
+            writer.writerows(chunk)
+            rows += len(chunk)
+    return rows
+
+
+def _write_parquet(records: Iterable[Dict], path: str, chunk_rows: int) -> int:
+    try:
+        import pyarrow as pa  # Необязательная зависимость, нужна только для Parquet
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise CatalogExportError("Для выгрузки в Parquet установите пакет pyarrow или выберите CSV.") from e
+
+    schema = pa.schema([
+        ("exported_at", pa.string()), ("product_id", pa.int64()), ("offer_id", pa.string()),
+        ("name", pa.string()), ("status", pa.string()), ("price", pa.float64()),
+        ("marketing_price", pa.float64()), ("coef", pa.float64()), ("displayed_price", pa.int64()),
+        ("target", pa.float64()), ("deviation", pa.float64()), ("deviation_pct", pa.float64()),
+        ("out_of_band", pa.bool_()),
+    ])
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for chunk in _chunks(records, chunk_rows):
+            columns = {name: [record[name] for record in chunk] for name in EXPORT_COLUMNS}
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            rows += len(chunk)
+    return rows
+
+
+def export_records(records: Iterable[Dict], path: str, fmt: Optional[str] = None,
+                   chunk_rows: int = CHUNK_ROWS) -> int:
+    """
+    Пишет записи в файл и возвращает число строк.
+    :param fmt: 'csv' или 'parquet'; None - по расширению файла.
+    """
+    fmt = (fmt or os.path.splitext(path)[1].lstrip(".")).lower()
+    if fmt not in FORMATS:
+        raise CatalogExportError(f"Неподдерживаемый формат выгрузки: {fmt or 'без расширения'}")
+    writer = _write_parquet if fmt == "parquet" else _write_csv
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    started = time.perf_counter()
+    try:
+        rows = writer(records, tmp_path, chunk_rows)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    logger.info("Выгружено %d товаров в %s за %.2f с", rows, path, time.perf_counter() - started)
+    return rows
+
+
+def export_catalog(products: Iterable[Dict], path: str, fmt: Optional[str] = None,
+                   tracked_products: Optional[Dict[str, float]] = None, coef: float = 0.852,
+                   product_coefs: Optional[Dict[str, float]] = None) -> int:
+    """Выгружает каталог с рассчитанными ценами. Возвращает число записанных строк."""
+    return export_records(iter_records(products, tracked_products, coef, product_coefs), path, fmt)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Выгрузка каталога Ozon и рассчитанных цен в CSV/Parquet.")
+    parser.add_argument("--out", required=True, help="Файл выгрузки (.csv или .parquet)")
+    parser.add_argument("--format", choices=FORMATS, help="Формат (по умолчанию - по расширению файла)")
+    parser.add_argument("--client-id", default=os.environ.get("OZON_CLIENT_ID"),
+                        help="Client-ID (по умолчанию OZON_CLIENT_ID или настройки приложения)")
+    parser.add_argument("--api-key", default=os.environ.get("OZON_API_KEY"),
+                        help="API key (по умолчанию OZON_API_KEY или настройки приложения)")
+    parser.add_argument("--deadline", type=float, default=300.0, help="Лимит времени загрузки каталога, с")
+    parser.add_argument("--timestamped", action="store_true",
+                        help="Добавить к имени файла время выгрузки (для периодических снимков)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    from app_logging import setup_logging
+    from circuit_breaker import CircuitOpenError
+    from config_manger import ConfigManager
+    from deadline import Deadline, DeadlineExceeded
+    from ozon_seller_api import IncompleteDataError, OzonSellerAPI
+
+    args = parse_args(argv)
+    setup_logging()
+    config_manager = ConfigManager()
+    saved_client_id, saved_api_key = config_manager.load_credentials()
+    client_id = args.client_id or saved_client_id
+    api_key = args.api_key or saved_api_key
+    if not client_id or not api_key:
+        logger.error("Не заданы Client-ID и API key (--client-id/--api-key или OZON_CLIENT_ID/OZON_API_KEY).")
+        return 2
+
+    path = args.out
+    if args.timestamped:
+        stem, extension = os.path.splitext(path)
+        path = f"{stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}"
+
+    api_client = OzonSellerAPI(client_id=client_id, api_key=api_key)
+    try:
+        products = api_client.get_products_with_details(deadline=Deadline(args.deadline), strict=True)
+    except (IncompleteDataError, CircuitOpenError, DeadlineExceeded) as e:
+        # Неполный каталог не выгружаем: аналитика приняла бы его за снимок всего магазина
+        logger.error("Каталог не загружен: %s", e)
+        return 1
+    try:
+        export_catalog(
+            products, path, args.format,
+            tracked_products=config_manager.load_tracked_products(client_id),
+            coef=config_manager.load_coefficient(),
+            product_coefs=config_manager.load_product_coefficients(client_id),
+        )
+    except CatalogExportError as e:
+        logger.error("%s", e)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Запрос не отправлен: предохранитель группы эндпоинтов разомкнут."""
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для группы эндпоинтов API.
+
+    - CLOSED: запросы идут как обычно, подряд идущие ошибки считаются.
+    - OPEN: после failure_threshold ошибок подряд запросы не отправляются
+      recovery_timeout секунд.
+    - HALF_OPEN: по истечении паузы пропускается один пробный запрос.
+      Успех замыкает предохранитель, ошибка снова размыкает его на recovery_timeout.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def retry_in(self) -> float:
+        """Через сколько секунд предохранитель пропустит запрос (0 - уже пропускает)."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return 0.0
+            if self._state == self.HALF_OPEN:
+                return self.recovery_timeout if self._probe_in_flight else 0.0
+            return max(0.0, self._opened_at + self.recovery_timeout - self._clock())
+
+    def allow_request(self) -> bool:
+        """Решает, можно ли отправить запрос. В HALF_OPEN пропускает только один пробный."""
+        with self._lock:
+            if self._state == self.OPEN:
+                if self._clock() - self._opened_at < self.recovery_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                logger.info("Предохранитель '%s': пробный запрос после паузы.", self.name)
+            if self._state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("Предохранитель '%s' замкнут: API снова отвечает.", self.name)
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning("Предохранитель '%s' разомкнут на %g с (ошибок подряд: %d).",
+                                   self.name, self.recovery_timeout, self._failures)
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+            self._probe_in_flight = False
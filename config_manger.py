@@ -1,5 +1,10 @@
+import logging
+import os
+
 from PyQt5.QtCore import QSettings
 
+logger = logging.getLogger(__name__)
+
 class ConfigManager:
     """
     Класс для управления сохранением и загрузкой настроек приложения.
@@ -11,13 +16,13 @@ class ConfigManager:
 
     def save_credentials(self, client_id, api_key):
         """Сохраняет учетные данные API."""
-        print("Сохранение учетных данных...")
+        logger.debug("Сохранение учетных данных...")
         self.settings.setValue("credentials/client_id", client_id)
         self.settings.setValue("credentials/api_key", api_key)
 
     def load_credentials(self):
         """Загружает учетные данные API."""
-        print("Загрузка учетных данных...")
+        logger.debug("Загрузка учетных данных...")
         client_id = self.settings.value("credentials/client_id", "") # Второй аргумент - значение по умолчанию
         api_key = self.settings.value("credentials/api_key", "")
         return client_id, api_key
@@ -26,7 +31,7 @@ class ConfigManager:
         """Сохраняет словарь отслеживаемых товаров для КОНКРЕТНОГО магазина."""
         if not client_id: # Не сохраняем, если Client ID пустой
             return
-        print(f"Сохранение отслеживаемых товаров для магазина {client_id}...")
+        logger.info("Сохранение отслеживаемых товаров для магазина %s...", client_id)
         # Используем beginGroup для создания "папки" для каждого магазина
         self.settings.beginGroup(client_id)
         self.settings.setValue("tracked_products", products_dict)
@@ -36,27 +41,102 @@ class ConfigManager:
         """Загружает словарь отслеживаемых товаров для КОНКРЕТНОГО магазина."""
         if not client_id:
             return {}
-        print(f"Загрузка отслеживаемых товаров для магазина {client_id}...")
+        logger.info("Загрузка отслеживаемых товаров для магазина %s...", client_id)
         self.settings.beginGroup(client_id)
         tracked = self.settings.value("tracked_products", {}, type=dict)
         self.settings.endGroup()
         return tracked
 
+    def save_product_coefficients(self, client_id, coefs_dict):
+        """Сохраняет коэффициенты скидки отдельных товаров для КОНКРЕТНОГО магазина."""
+        if not client_id:
+            return
+        self.settings.beginGroup(client_id)
+        self.settings.setValue("product_coefficients", coefs_dict)
+        self.settings.endGroup()
+
+    def load_product_coefficients(self, client_id):
+        """Загружает коэффициенты скидки отдельных товаров для КОНКРЕТНОГО магазина."""
+        if not client_id:
+            return {}
+        self.settings.beginGroup(client_id)
+        coefs = self.settings.value("product_coefficients", {}, type=dict)
+        self.settings.endGroup()
+        return {offer_id: float(coef) for offer_id, coef in coefs.items()}
+
     def save_coefficient(self, coefficient):
         """Сохраняет коэффициент скидки."""
-        print(f"Сохранение коэффициента: {coefficient}")
+        logger.debug("Сохранение коэффициента: %s", coefficient)
         # Сохраняем значение. QSettings сам справится с типом float/double.
         self.settings.setValue("app/price_discount_coefficient", coefficient)
 
     def load_coefficient(self):
         """Загружает коэффициент скидки."""
-        print("Загрузка коэффициента...")
+        logger.debug("Загрузка коэффициента...")
         # Загружаем значение. Указываем значение по умолчанию (0.852) и тип float
         # на случай, если это первый запуск и в конфиге еще ничего нет.
         default_value = 0.852
         coefficient = self.settings.value("app/price_discount_coefficient", default_value, type=float)
         return coefficient
 
+    def load_metrics_port(self):
+        """
+        Загружает порт локального сервера метрик Prometheus.
+        Переменная окружения OZON_METRICS_PORT имеет приоритет. 0 - сервер выключен.
+        """
+        env_port = os.environ.get("OZON_METRICS_PORT")
+        if env_port is not None:
+            try:
+                return int(env_port)
+            except ValueError:
+                logger.warning("Некорректное значение OZON_METRICS_PORT: %s", env_port)
+        return self.settings.value("app/metrics_port", 9108, type=int)
+
+    def load_push_settings(self):
+        """
+        Загружает настройки приема push-уведомлений Ozon: (порт, адрес). Порт 0 - прием выключен.
+        Переменные окружения OZON_PUSH_PORT и OZON_PUSH_HOST имеют приоритет.
+        """
+        port = self.settings.value("push/port", 0, type=int)
+        env_port = os.environ.get("OZON_PUSH_PORT")
+        if env_port is not None:
+            try:
+                port = int(env_port)
+            except ValueError:
+                logger.warning("Некорректное значение OZON_PUSH_PORT: %s", env_port)
+        host = os.environ.get("OZON_PUSH_HOST") or self.settings.value("push/host", "127.0.0.1", type=str)
+        return port, host
+
+    def load_lease_path(self):
+        """
+        Загружает путь к общему файлу аренды ведущего (см. leader_lease). Пустая строка -
+        координация экземпляров выключена. Переменная окружения OZON_LEASE_PATH имеет приоритет.
+        """
+        return os.environ.get("OZON_LEASE_PATH") or self.settings.value("leader/lease_path", "", type=str)
+
+    def load_profiling_settings(self):
+        """
+        Загружает настройки профилирования циклов: (включено, каталог отчетов, сколько хранить).
+        Переменные окружения OZON_PROFILE, OZON_PROFILE_DIR и OZON_PROFILE_KEEP имеют приоритет.
+        """
+        enabled = self.settings.value("profiling/enabled", False, type=bool)
+        env_enabled = os.environ.get("OZON_PROFILE")
+        if env_enabled is not None:
+            enabled = env_enabled.strip().lower() in ("1", "true", "yes", "on")
+        report_dir = os.environ.get("OZON_PROFILE_DIR") or self.settings.value("profiling/report_dir", "", type=str)
+        keep_last = self.settings.value("profiling/keep_last", 20, type=int)
+        env_keep = os.environ.get("OZON_PROFILE_KEEP")
+        if env_keep is not None:
+            try:
+                keep_last = int(env_keep)
+            except ValueError:
+                logger.warning("Некорректное значение OZON_PROFILE_KEEP: %s", env_keep)
+        return enabled, report_dir, keep_last
+
+    def save_profiling_enabled(self, enabled):
+        """Сохраняет флаг профилирования циклов."""
+        self.settings.setValue("profiling/enabled", enabled)
+
     def save_window_state(self, main_window):
         """Сохраняет размер и положение окна."""
         self.settings.setValue("window/geometry", main_window.saveGeometry())
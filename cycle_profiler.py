@@ -0,0 +1,122 @@
+import functools
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CycleProfiler:
+    """
+    Профилировщик отдельных циклов синхронизации (cProfile + tracemalloc).
+
+    Пока профилирование выключено, обернутые методы вызываются напрямую -
+    проверяется только флаг enabled. Во включенном состоянии каждый вызов
+    записывает в report_dir текстовый отчет с самыми дорогими функциями и
+    приростом памяти, хранится только keep_last последних отчетов (0 - все).
+    """
+
+    TOP_FUNCTIONS = 30
+    TOP_ALLOCATIONS = 20
+
+    def __init__(self, report_dir: Optional[str] = None, keep_last: int = 20):
+        self.report_dir = report_dir or os.path.join(os.path.expanduser("~"), "OzonPriceEqualizer", "profiles")
+        self.keep_last = keep_last
+        self.enabled = False
+        self._started_tracemalloc = False
+        self._lock = threading.Lock()
+
+    def configure(self, enabled: bool, report_dir: Optional[str] = None, keep_last: Optional[int] = None):
+        """Включает/выключает профилирование и меняет параметры хранения отчетов."""
+        if report_dir:
+            self.report_dir = report_dir
+        if keep_last is not None:
+            self.keep_last = keep_last
+        if enabled and not self.enabled:
+            import tracemalloc  # Модули профилирования загружаются, только когда оно включено
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+            logger.info("Профилирование циклов включено, отчеты: %s", self.report_dir)
+        elif not enabled and self.enabled:
+            if self._started_tracemalloc:
+                import tracemalloc
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+            logger.info("Профилирование циклов выключено.")
+        self.enabled = enabled
+
+    def profile(self, name: str):
+        """Декоратор: профилирует каждый вызов функции как цикл с именем name."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                return self.run(name, func, *args, **kwargs)
+            return wrapper
+        return decorator
+
+    def run(self, name: str, func, *args, **kwargs):
+        """Выполняет func под профилировщиком и сохраняет отчет."""
+        import cProfile
+        import tracemalloc
+
+        snapshot_before = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            duration = time.perf_counter() - started
+            try:
+                self._write_report(name, duration, profiler, snapshot_before)
+            except Exception:
+                logger.exception("Не удалось сохранить отчет профилировщика для цикла %s", name)
+
+    def _write_report(self, name: str, duration: float, profiler: "cProfile.Profile", snapshot_before):
+        import io
+        import pstats
+        import tracemalloc
+
+        stats_stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stats_stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.TOP_FUNCTIONS)
+
+        lines = [f"Цикл: {name}", f"Длительность: {duration:.3f} с", "",
+                 "=== Функции (по накопленному времени) ===", stats_stream.getvalue()]
+
+        if snapshot_before is not None and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            lines.append("=== Память ===")
+            lines.append(f"Сейчас выделено: {current / 2 ** 20:.1f} МиБ, пик: {peak / 2 ** 20:.1f} МиБ")
+            lines.append("Прирост по строкам кода:")
+            snapshot_after = tracemalloc.take_snapshot()
+            for stat in snapshot_after.compare_to(snapshot_before, "lineno")[:self.TOP_ALLOCATIONS]:
+                lines.append(f"  {stat}")
+
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        with self._lock:
+            os.makedirs(self.report_dir, exist_ok=True)
+            path = os.path.join(self.report_dir, f"{timestamp}_{name}.txt")
+            with open(path, "w", encoding="utf-8") as report_file:
+                report_file.write("\n".join(lines))
+            self._prune()
+        logger.info("Отчет профилировщика для цикла %s (%.3f с): %s", name, duration, path)
+
+    def _prune(self):
+        """Удаляет старые отчеты, оставляя keep_last последних (0 или меньше - не удаляет ничего)."""
+        if self.keep_last <= 0:
+            return
+        reports = sorted(f for f in os.listdir(self.report_dir) if f.endswith(".txt"))
+        for old_report in reports[:-self.keep_last]:
+            os.remove(os.path.join(self.report_dir, old_report))
+
+
+# Общий профилировщик приложения
+PROFILER = CycleProfiler()
@@ -0,0 +1,47 @@
+import time
+from typing import Tuple
+
+# Лимит одного цикла загрузки цен, с: по нему же сторожевой таймер окна замечает зависший цикл
+CYCLE_DEADLINE_S = 120
+
+
+class DeadlineExceeded(Exception):
+    """Цикл синхронизации не уложился в отведенное время."""
+
+
+class Deadline:
+    """
+    Крайний срок выполнения цикла синхронизации.
+
+    Создается в начале цикла и передается вниз через постраничную загрузку и
+    разбиение на пачки: каждый запрос получает таймаут не больше оставшегося
+    времени, а между запросами срок проверяется явно. Если передан cancel_token,
+    при каждой проверке срока проверяется и отмена задачи.
+    """
+
+    def __init__(self, seconds: float, clock=time.monotonic, cancel_token=None):
+        self.seconds = seconds
+        self._clock = clock
+        self.expires_at = clock() + seconds
+        self.cancel_token = cancel_token
+
+    def remaining(self) -> float:
+        """Сколько секунд осталось (не меньше нуля)."""
+        return max(0.0, self.expires_at - self._clock())
+
+    def expired(self) -> bool:
+        return self._clock() >= self.expires_at
+
+    def check(self, stage: str = ""):
+        """Бросает DeadlineExceeded, если срок истек (или JobCancelled, если задача отменена)."""
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled()
+        if self.expired():
+            where = f" ({stage})" if stage else ""
+            raise DeadlineExceeded(f"Превышен лимит времени цикла {self.seconds:g} с{where}")
+
+    def timeout(self, connect: float, read: float, stage: str = "") -> Tuple[float, float]:
+        """Таймауты (connect, read) для requests, урезанные до оставшегося времени."""
+        self.check(stage)
+        remaining = self.remaining()
+        return min(connect, remaining), min(read, remaining)
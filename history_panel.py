@@ -0,0 +1,191 @@
+import time
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from price_history import HistoryPoint, PriceHistory
+
+
+class HistoryChart(QtWidgets.QWidget):
+    """
+    Простой график истории цен одного товара: цена продавца (с коридором min-max
+    для агрегатов), маркетинговая цена, желаемая цена и отметки отправленных цен.
+    """
+    MARGIN = 48
+
+    PRICE_COLOR = QtGui.QColor(0, 91, 255)
+    MARKETING_COLOR = QtGui.QColor(240, 120, 0)
+    TARGET_COLOR = QtGui.QColor(0, 150, 60)
+    PUSH_COLOR = QtGui.QColor(200, 0, 0)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumSize(640, 320)
+        self.points: List[HistoryPoint] = []
+        self.pushes: List[Tuple[float, float]] = []
+        self.start = 0.0
+        self.end = 1.0
+
+    def set_data(self, points: Sequence[HistoryPoint], pushes: Sequence[Tuple[float, float]],
+                 start: float, end: float):
+        self.points = list(points)
+        self.pushes = list(pushes)
+        self.start, self.end = start, end
+        self.update()
+
+    def _value_range(self):
+        values = []
+        for point in self.points:
+            values.extend((point.price_min, point.price_max, point.marketing_price))
+            if point.target is not None:
+                values.append(point.target)
+        values.extend(price for _, price in self.pushes)
+        low, high = min(values), max(values)
+        padding = (high - low) * 0.05 or max(1.0, high * 0.01)
+        return low - padding, high + padding
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        painter.fillRect(self.rect(), self.palette().base())
+        plot = self.rect().adjusted(self.MARGIN, 12, -12, -28)
+        painter.setPen(self.palette().mid().color())
+        painter.drawRect(plot)
+
+        if not self.points and not self.pushes:
+            painter.setPen(self.palette().text().color())
+            painter.drawText(plot, QtCore.Qt.AlignCenter, "Нет данных за выбранный период")
+            return
+
+        low, high = self._value_range()
+        span_t = max(self.end - self.start, 1e-9)
+
+        def to_x(ts):
+            return plot.left() + (ts - self.start) / span_t * plot.width()
+
+        def to_y(value):
+            return plot.bottom() - (value - low) / (high - low) * plot.height()
+
+        # Оси: три подписи цены и время начала/конца периода
+        painter.setPen(self.palette().text().color())
+        for fraction in (0.0, 0.5, 1.0):
+            value = low + (high - low) * fraction
+            painter.drawText(QtCore.QRectF(0, to_y(value) - 8, self.MARGIN - 4, 16),
+                             QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter, f"{value:.0f}")
+        time_format = "%d.%m %H:%M" if span_t <= 3 * 86400 else "%d.%m.%Y"
+        painter.drawText(QtCore.QRectF(plot.left(), plot.bottom() + 4, 160, 20), QtCore.Qt.AlignLeft,
+                         datetime.fromtimestamp(self.start).strftime(time_format))
+        painter.drawText(QtCore.QRectF(plot.right() - 160, plot.bottom() + 4, 160, 20), QtCore.Qt.AlignRight,
+                         datetime.fromtimestamp(self.end).strftime(time_format))
+
+        if self.points and any(p.price_min != p.price_max for p in self.points):
+            band = QtGui.QPolygonF(
+                [QtCore.QPointF(to_x(p.ts), to_y(p.price_max)) for p in self.points]
+                + [QtCore.QPointF(to_x(p.ts), to_y(p.price_min)) for p in reversed(self.points)]
+            )
+            band_color = QtGui.QColor(self.PRICE_COLOR)
+            band_color.setAlpha(40)
+            painter.setPen(QtCore.Qt.NoPen)
+            painter.setBrush(band_color)
+            painter.drawPolygon(band)
+            painter.setBrush(QtCore.Qt.NoBrush)
+
+        for color, getter in ((self.MARKETING_COLOR, lambda p: p.marketing_price),
+                              (self.PRICE_COLOR, lambda p: p.price),
+                              (self.TARGET_COLOR, lambda p: p.target)):
+            painter.setPen(QtGui.QPen(color, 1.5))
+            line = QtGui.QPolygonF()
+            for point in self.points:
+                value = getter(point)
+                if value is None:
+                    if line.size() > 1:
+                        painter.drawPolyline(line)
+                    line = QtGui.QPolygonF()
+                    continue
+                line.append(QtCore.QPointF(to_x(point.ts), to_y(value)))
+            if line.size() > 1:
+                painter.drawPolyline(line)
+
+        painter.setPen(QtGui.QPen(self.PUSH_COLOR, 1))
+        painter.setBrush(self.PUSH_COLOR)
+        for ts, price in self.pushes:
+            painter.drawEllipse(QtCore.QPointF(to_x(ts), to_y(price)), 3, 3)
+
+
+class HistoryPanel(QtWidgets.QDialog):
+    """
+    Окно истории цен товара. Данные берутся из PriceHistory: последние часы -
+    из кольцевого буфера в памяти, длинные периоды - из агрегатов на диске.
+    """
+    PERIODS = (
+        ("6 часов", 6 * 3600), ("Сутки", 86400), ("Неделя", 7 * 86400),
+        ("Месяц", 30 * 86400), ("Год", 365 * 86400),
+    )
+
+    def __init__(self, history: PriceHistory, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.setWindowTitle("История цен")
+        self.resize(820, 440)
+
+        self.offer_combo = QtWidgets.QComboBox(self)
+        self.offer_combo.setEditable(True)
+        self.offer_combo.setMinimumWidth(220)
+        self.period_combo = QtWidgets.QComboBox(self)
+        for title, seconds in self.PERIODS:
+            self.period_combo.addItem(title, seconds)
+        self.period_combo.setCurrentIndex(1)
+        self.info_label = QtWidgets.QLabel(self)
+        self.chart = HistoryChart(self)
+
+        controls = QtWidgets.QHBoxLayout()
+        controls.addWidget(QtWidgets.QLabel("Артикул:", self))
+        controls.addWidget(self.offer_combo)
+        controls.addWidget(QtWidgets.QLabel("Период:", self))
+        controls.addWidget(self.period_combo)
+        controls.addStretch(1)
+        controls.addWidget(self.info_label)
+
+        legend = QtWidgets.QLabel(
+            f"<span style='color:{HistoryChart.PRICE_COLOR.name()}'>■ цена продавца</span> &nbsp; "
+            f"<span style='color:{HistoryChart.MARKETING_COLOR.name()}'>■ маркетинговая цена</span> &nbsp; "
+            f"<span style='color:{HistoryChart.TARGET_COLOR.name()}'>■ желаемая цена</span> &nbsp; "
+            f"<span style='color:{HistoryChart.PUSH_COLOR.name()}'>● отправленная цена</span>", self)
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addLayout(controls)
+        layout.addWidget(self.chart, 1)
+        layout.addWidget(legend)
+
+        self.offer_combo.currentTextChanged.connect(self.refresh)
+        self.period_combo.currentIndexChanged.connect(self.refresh)
+
+    def show_offer(self, offer_id: Optional[str] = None):
+        """Обновляет список товаров и показывает историю offer_id (или текущего выбранного)."""
+        current = offer_id or self.offer_combo.currentText()
+        self.offer_combo.blockSignals(True)
+        self.offer_combo.clear()
+        self.offer_combo.addItems(self.history.offer_ids())
+        self.offer_combo.setCurrentText(current)
+        self.offer_combo.blockSignals(False)
+        self.refresh()
+        self.show()
+        self.raise_()
+
+    def refresh(self):
+        """Перечитывает историю выбранного товара за выбранный период."""
+        offer_id = self.offer_combo.currentText().strip()
+        end = time.time()
+        start = end - self.period_combo.currentData()
+        if not offer_id:
+            self.chart.set_data([], [], start, end)
+            self.info_label.clear()
+            return
+        started = time.perf_counter()
+        resolution = self.history.pick_resolution(start, end)
+        points = self.history.query(offer_id, start, end, resolution)
+        pushes = self.history.pushes(offer_id, start, end)
+        self.chart.set_data(points, pushes, start, end)
+        self.info_label.setText(f"точек: {len(points)} ({resolution}), отправок: {len(pushes)}, "
+                                f"{(time.perf_counter() - started) * 1000:.0f} мс")
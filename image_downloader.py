@@ -1,26 +1,40 @@
+import logging
+
 import requests
 
 from PyQt5.QtGui import QPixmap
 from PyQt5 import QtCore
 
+from worker_pool import Job
 from worker_signals import WorkerSignals
 
+logger = logging.getLogger(__name__)
+
 class ImageDownloader:
     """
-    Класс-загрузчик изображений. Выполняется в отдельном потоке.
+    Класс-загрузчик изображений. Выполняется в пуле потоков.
     """
-    def __init__(self, urls: list, signals: WorkerSignals):
-        self.urls = urls
+    # Таймауты загрузки одного изображения: на соединение и на чтение
+    TIMEOUT = (5, 15)
+
+    def __init__(self, images: list, signals: WorkerSignals):
+        """
+        :param images: Список пар (номер строки таблицы, URL изображения).
+        :param signals: Общий объект сигналов загрузчика.
+        """
+        self.images = images
         self.signals = signals
 
-    def run(self):
+    def run(self, job: Job):
         """
         Основной метод, который выполняет загрузку.
+        Перед каждым изображением проверяет, не отменена ли задача.
         """
-        for i, url in enumerate(self.urls):
+        for i, url in self.images:
+            job.token.raise_if_cancelled()
             try:
                 # Выполняем запрос на получение изображения
-                response = requests.get(url, stream=True)
+                response = requests.get(url, stream=True, timeout=self.TIMEOUT)
                 response.raise_for_status()  # Проверяем, что запрос успешен (код 2xx)
 
                 pixmap = QPixmap()
@@ -28,14 +42,14 @@ class ImageDownloader:
                 thumbnail = pixmap.scaled(65, 65, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
 
                 # Отправляем сигнал о готовности изображения
-                self.signals.image_ready.emit(i, thumbnail)
+                self.signals.image_ready.emit(job.generation, i, thumbnail)
 
             except requests.exceptions.RequestException as e:
-                print(f"Сетевая ошибка при загрузке {url}: {e}")
-                self.signals.image_ready.emit(i, QPixmap()) # Отправляем пустой pixmap в случае ошибки
+                logger.warning("Сетевая ошибка при загрузке %s: %s", url, e)
+                self.signals.image_ready.emit(job.generation, i, QPixmap()) # Отправляем пустой pixmap в случае ошибки
             except Exception as e:
-                print(f"Неизвестная ошибка при обработке {url}: {e}")
-                self.signals.image_ready.emit(i, QPixmap())
+                logger.exception("Неизвестная ошибка при обработке %s: %s", url, e)
+                self.signals.image_ready.emit(job.generation, i, QPixmap())
 
         # После завершения цикла отправляем сигнал о завершении всей работы
-        self.signals.finished.emit()
\ No newline at end of file
+        self.signals.finished.emit(job.generation)
\ No newline at end of file
@@ -0,0 +1,148 @@
+import codecs
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence
+
+try:
+    import orjson
+except ImportError:  # orjson - необязательная зависимость
+    orjson = None
+
+# Имя используемой библиотеки, удобно для логов и замеров
+BACKEND_NAME = "orjson" if orjson is not None else "json"
+
+_WHITESPACE = " \t\n\r"
+# Символы, важные для поиска конца объекта: вне строки и внутри строки
+_OBJECT_TOKENS = re.compile(r'[{}"]')
+_STRING_TOKENS = re.compile(r'["\\]')
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Сериализует объект в компактный JSON (UTF-8, без пробелов).
+    Использует orjson, если он установлен.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data) -> Any:
+    """Разбирает JSON из bytes или str."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def project(item: Dict, fields: Optional[Sequence[str]]) -> Dict:
+    """Оставляет в словаре только нужные поля (если fields не задан - возвращает как есть)."""
+    if fields is None:
+        return item
+    return {key: item[key] for key in fields if key in item}
+
+
+def iter_array_items(chunks: Iterable[bytes], array_key: str,
+                     fields: Optional[Sequence[str]] = None) -> Iterator[Dict]:
+    """
+    Инкрементально разбирает JSON-ответ и по одному отдает объекты из массива array_key.
+
+    Тело читается порциями (например, из response.iter_content), каждый элемент
+    разбирается сразу после того, как он целиком пришел, и от него остаются только
+    поля из fields. Весь ответ в память не собирается, поэтому пиковое потребление
+    памяти определяется размером порции и одного элемента, а не всей страницы.
+
+    Ищется первое вхождение ключа array_key, поэтому метод рассчитан на ответы,
+    где массив лежит на верхнем уровне (например, {"items": [...]}),
+    а элементы массива - объекты (иначе ValueError).
+
+    Конец элемента ищется по балансу фигурных скобок вне строк, и позиция поиска
+    сохраняется между порциями, поэтому каждый символ просматривается один раз,
+    а json-разбор элемента запускается один раз, когда он пришел целиком.
+    """
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    key_pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(array_key))
+    chunk_iter = iter(chunks)
+    buffer = ""
+    pos = 0
+    in_array = False
+    exhausted = False
+
+    def read_more() -> bool:
+        nonlocal buffer, pos, exhausted
+        for chunk in chunk_iter:
+            if not chunk:
+                continue
+            # Перед добавлением новой порции отбрасываем уже разобранную часть буфера
+            buffer = buffer[pos:] + text_decoder.decode(chunk)
+            pos = 0
+            return True
+        exhausted = True
+        buffer = buffer[pos:] + text_decoder.decode(b"", final=True)
+        pos = 0
+        return False
+
+    while True:
+        if not in_array:
+            match = key_pattern.search(buffer, pos)
+            if match:
+                pos = match.end()
+                in_array = True
+                continue
+            # Оставляем хвост буфера на случай, если ключ разрезан между порциями
+            pos = max(pos, len(buffer) - len(array_key) - 16)
+            if not read_more() and not key_pattern.search(buffer):
+                return  # Массива в ответе нет
+            continue
+
+        # Пропускаем пробелы и запятые между элементами
+        while pos < len(buffer) and (buffer[pos] in _WHITESPACE or buffer[pos] == ","):
+            pos += 1
+        if pos >= len(buffer):
+            if exhausted or not read_more():
+                raise ValueError(f"Неожиданный конец JSON внутри массива '{array_key}'")
+            continue
+        if buffer[pos] == "]":
+            return
+        if buffer[pos] != "{":
+            raise ValueError(f"Элементы массива '{array_key}' должны быть объектами")
+
+        # Ищем конец объекта; scan - смещение от начала элемента (read_more сдвигает буфер)
+        scan = 0
+        depth = 0
+        in_string = False
+        while True:
+            index = pos + scan
+            if in_string:
+                match = _STRING_TOKENS.search(buffer, index)
+                if match and match.group() == "\\" and match.end() < len(buffer):
+                    scan = match.end() + 1 - pos  # Пропускаем экранированный символ
+                    continue
+                if match and match.group() == '"':
+                    in_string = False
+                    scan = match.end() - pos
+                    continue
+                # Строка не закончилась (или порция кончилась на обратной косой черте)
+                scan = (match.start() if match else len(buffer)) - pos
+            else:
+                match = _OBJECT_TOKENS.search(buffer, index)
+                if match:
+                    scan = match.end() - pos
+                    token = match.group()
+                    if token == '"':
+                        in_string = True
+                    elif token == "{":
+                        depth += 1
+                    else:
+                        depth -= 1
+                        if depth == 0:
+                            break
+                    continue
+                scan = len(buffer) - pos
+            # Элемент пришел не целиком - дочитываем следующую порцию
+            if exhausted or not read_more():
+                raise ValueError(f"Неожиданный конец JSON внутри массива '{array_key}'")
+
+        end = pos + scan
+        item = loads(buffer[pos:end])
+        pos = end
+        yield project(item, fields)
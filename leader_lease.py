@@ -0,0 +1,224 @@
+"""
+Выбор ведущего экземпляра, когда несколько копий приложения работают с одним магазином.
+
+Экземпляры делят один файл SQLite (например, на общем сетевом диске). В нем для
+каждого Client-ID хранится аренда: кто ведущий, до какого времени и номер срока.
+Ведущий продлевает аренду каждые HEARTBEAT_INTERVAL_S секунд; только он опрашивает
+API и записывает цены, а после каждого цикла публикует снимок: цены товаров и
+желаемые цены. Полный каталог (названия, статусы, фото) публикуется отдельно и только
+после полной загрузки, снимок ссылается на него по catalog_id. Остальные экземпляры
+ведомые: показывают последний снимок и пытаются взять аренду, как только она
+истечет (при штатной остановке ведущий освобождает ее сразу).
+
+Время аренды - системное время машин, поэтому часы экземпляров должны быть
+синхронизированы (NTP) с точностью заметно лучше LEASE_TTL_S.
+"""
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from typing import Dict, Optional
+
+from PyQt5 import QtCore
+
+import json_backend
+
+logger = logging.getLogger(__name__)
+
+# Срок аренды и период ее продления, с: отказ ведущего замечается не позже чем через LEASE_TTL_S
+LEASE_TTL_S = 10.0
+HEARTBEAT_INTERVAL_S = 3.0
+# Ведущий перестает считать себя ведущим на столько раньше истечения аренды
+LEASE_SAFETY_S = 2.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lease (
+    client_id TEXT PRIMARY KEY, holder TEXT NOT NULL, term INTEGER NOT NULL, expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshot (
+    client_id TEXT PRIMARY KEY, holder TEXT NOT NULL, term INTEGER NOT NULL,
+    updated_at REAL NOT NULL, data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS catalog (
+    client_id TEXT PRIMARY KEY, catalog_id TEXT NOT NULL, updated_at REAL NOT NULL, data BLOB NOT NULL
+);
+"""
+
+
+def encode_snapshot(payload: Dict) -> bytes:
+    """Сжатый JSON снимка (каталог на сотни тысяч товаров весит десятки МБ без сжатия)."""
+    return zlib.compress(json_backend.dumps(payload), 1)
+
+
+def decode_snapshot(data: bytes) -> Dict:
+    return json_backend.loads(zlib.decompress(data))
+
+
+class LeaseSignals(QtCore.QObject):
+    """Сигналы продления аренды (испускаются из пула потоков)."""
+    # Поколение задачи, ведущий ли этот экземпляр, новый снимок ведущего (dict) или None,
+    # опубликован ли снимок (None - публиковать было нечего)
+    heartbeat = QtCore.pyqtSignal(int, bool, object, object)
+
+
+class LeaderLease:
+    """
+    Аренда роли ведущего для одного Client-ID в общем файле SQLite.
+
+    Все операции короткие транзакции BEGIN IMMEDIATE, поэтому два экземпляра
+    не могут одновременно взять аренду. Журнал обычный (не WAL): WAL не работает
+    на сетевых дисках.
+    """
+
+    def __init__(self, db_path: str, client_id: str, holder: Optional[str] = None,
+                 ttl: float = LEASE_TTL_S, safety: float = LEASE_SAFETY_S, clock=time.time):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self.client_id = str(client_id)
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.ttl = ttl
+        self.safety = safety
+        self._clock = clock
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=self.ttl / 2, check_same_thread=False, isolation_level=None)
+        self._conn.executescript(_SCHEMA)
+        self._term = 0
+        self._expires_at = 0.0
+        # Кто ведущий по последней проверке (для логов и заголовка окна)
+        self.current_holder: Optional[str] = None
+
+    def _transaction(self, func):
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def try_acquire(self) -> bool:
+        """Берет свободную или истекшую аренду либо продлевает свою. Возвращает True, если экземпляр ведущий."""
+        def acquire(conn):
+            now = self._clock()
+            row = conn.execute("SELECT holder, term, expires_at FROM lease WHERE client_id = ?",
+                               (self.client_id,)).fetchone()
+            if row is None:
+                term = 1
+            elif row[0] == self.holder:
+                term = row[1]
+            elif row[2] <= now:
+                term = row[1] + 1
+            else:
+                self.current_holder = row[0]
+                self._expires_at = 0.0
+                return False
+            conn.execute(
+                "INSERT INTO lease (client_id, holder, term, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (client_id) DO UPDATE SET holder = excluded.holder, term = excluded.term, "
+                "expires_at = excluded.expires_at",
+                (self.client_id, self.holder, term, now + self.ttl),
+            )
+            if term != self._term:
+                logger.info("Аренда ведущего для магазина %s взята (срок #%d).", self.client_id, term)
+            self.current_holder = self.holder
+            self._term = term
+            self._expires_at = now + self.ttl
+            return True
+
+        return self._transaction(acquire)
+
+    def is_leader(self) -> bool:
+        """
+        Проверка без обращения к базе: аренда взята и до ее истечения больше LEASE_SAFETY_S.
+        Вызывается перед записью цен, чтобы экземпляр, потерявший связь с базой, не писал
+        одновременно с новым ведущим.
+        """
+        return self._clock() < self._expires_at - self.safety
+
+    def time_left(self) -> float:
+        """Сколько секунд экземпляр еще останется ведущим без продления (с запасом LEASE_SAFETY_S)."""
+        return max(0.0, self._expires_at - self.safety - self._clock())
+
+    def release(self):
+        """Освобождает аренду, чтобы ведомый занял ее на ближайшем продлении."""
+        def release(conn):
+            conn.execute("DELETE FROM lease WHERE client_id = ? AND holder = ?", (self.client_id, self.holder))
+
+        if self._expires_at:
+            self._expires_at = 0.0
+            self._transaction(release)
+
+    def publish_snapshot(self, data: bytes, catalog: Optional[bytes] = None,
+                         catalog_id: Optional[str] = None) -> bool:
+        """
+        Публикует снимок (см. encode_snapshot), только если аренда все еще наша. Возвращает True при успехе.
+        Если передан catalog, в той же транзакции заменяется и полный каталог с идентификатором catalog_id.
+        """
+        def publish(conn):
+            row = conn.execute("SELECT holder, term FROM lease WHERE client_id = ?", (self.client_id,)).fetchone()
+            if row is None or row[0] != self.holder or row[1] != self._term:
+                return False
+            now = self._clock()
+            if catalog is not None:
+                conn.execute(
+                    "INSERT INTO catalog (client_id, catalog_id, updated_at, data) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (client_id) DO UPDATE SET catalog_id = excluded.catalog_id, "
+                    "updated_at = excluded.updated_at, data = excluded.data",
+                    (self.client_id, catalog_id, now, sqlite3.Binary(catalog)),
+                )
+            conn.execute(
+                "INSERT INTO snapshot (client_id, holder, term, updated_at, data) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (client_id) DO UPDATE SET holder = excluded.holder, term = excluded.term, "
+                "updated_at = excluded.updated_at, data = excluded.data",
+                (self.client_id, self.holder, self._term, now, sqlite3.Binary(data)),
+            )
+            return True
+
+        return self._transaction(publish)
+
+    def read_snapshot(self, newer_than: float = 0.0, known_catalog_id: Optional[str] = None) -> Optional[Dict]:
+        """
+        Последний снимок ведущего, если он новее newer_than (иначе None).
+        К содержимому снимка добавляются updated_at и holder, а если снимок ссылается
+        не на known_catalog_id - еще products и catalog_id опубликованного каталога.
+        """
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT updated_at, holder, data FROM snapshot WHERE client_id = ? AND updated_at > ?",
+                (self.client_id, newer_than),
+            ).fetchone()
+        if row is None:
+            return None
+        snapshot = decode_snapshot(row[2])
+        snapshot["updated_at"], snapshot["holder"] = row[0], row[1]
+        if snapshot.get("catalog_id") not in (None, known_catalog_id):
+            catalog = self.read_catalog(known_catalog_id)
+            if catalog is not None:
+                snapshot["products"], snapshot["catalog_id"] = catalog["products"], catalog["catalog_id"]
+        return snapshot
+
+    def read_catalog(self, known_catalog_id: Optional[str] = None) -> Optional[Dict]:
+        """
+        Последний опубликованный каталог: {"catalog_id": ..., "products": [...]}.
+        None, если каталога нет или его catalog_id равен known_catalog_id (он уже загружен).
+        """
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT catalog_id, data FROM catalog WHERE client_id = ? AND catalog_id IS NOT ?",
+                (self.client_id, known_catalog_id),
+            ).fetchone()
+        if row is None:
+            return None
+        catalog = decode_snapshot(row[1])
+        catalog["catalog_id"] = row[0]
+        return catalog
+
+    def close(self):
+        with self._db_lock:
+            self._conn.close()
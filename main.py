@@ -1,25 +1,62 @@
-import json
+# Замер запуска включается до остальных импортов, чтобы учесть и их
+from startup_timing import STARTUP
+STARTUP.track_imports()
+
+import logging
 import sys
 import os
-import threading
 from functools import partial
 import math
+import sqlite3
+import time
 
-from ozon_seller_api import OzonSellerAPI
+# Здесь только то, что нужно для показа окна. Клиент API (requests), воркеры и
+# окна инструментов импортируются лениво - в методах, которые их используют
+from app_logging import setup_logging, summarize_items
+from api_metrics import REGISTRY as api_metrics, start_metrics_server
 from worker_signals import WorkerSignals
-from image_downloader import ImageDownloader
-from price_update_worker import PriceUpdateWorker, PriceUpdateWorkerSignals
 from config_manger import ConfigManager
-
-from PyQt5 import QtCore, QtWidgets, QtGui, Qt
+from worker_pool import WorkerPool
+from cycle_profiler import PROFILER
+from circuit_breaker import CircuitOpenError
+from deadline import CYCLE_DEADLINE_S, Deadline, DeadlineExceeded
+from polling_scheduler import AdaptivePollScheduler
+import pricing
+
+from PyQt5 import QtCore, QtWidgets, QtGui
 from PyQt5.QtCore import QIODevice, QTimer
 # from PyQt5.QtWidgets import QTableWidgetSelectionRange, QMessageBox, QFileDialog, QStyle
 from PyQt5.QtWidgets import QWidget, QCheckBox, QHBoxLayout, QTableWidget, QApplication, QTableWidgetItem, QHeaderView
+from PyQt5.QtWidgets import QFileDialog, QMessageBox, QProgressDialog
 
 import window
 
+STARTUP.mark("imports")
 os.environ["QT_AUTO_SCREEN_SCALE_FACTOR"] = "1"
 
+# Как часто планировщик проверяет, не пора ли опросить товары
+SCHEDULER_TICK_MS = 5000
+# Как часто загружается весь каталог (сверка таблицы и новых товаров)
+FULL_REFRESH_INTERVAL_S = 600
+# Лимиты времени: запись цен и первичная загрузка каталога (лимит цикла - deadline.CYCLE_DEADLINE_S)
+WRITE_DEADLINE_S = 60
+INITIAL_LOAD_DEADLINE_S = 300
+# Сторожевой таймер: как часто проверять и сколько ждать сверх лимита цикла
+WATCHDOG_INTERVAL_MS = 5000
+WATCHDOG_GRACE_S = 30
+# Размер общего пула потоков для фоновых задач
+WORKER_POOL_SIZE = 4
+# Как часто сбрасывать историю цен на диск
+HISTORY_FLUSH_INTERVAL_MS = 30000
+# Сколько копить push-уведомления перед опросом (пачка изменений - один запрос)
+PUSH_COALESCE_MS = 500
+# Нижняя граница интервала планового опроса, пока работают push-уведомления
+PUSH_RECONCILE_MIN_INTERVAL_S = 600
+# Как часто ведущий публикует снимок каталога для ведомых экземпляров, с
+SNAPSHOT_PUBLISH_INTERVAL_S = 10
+
+logger = logging.getLogger(__name__)
+
 def resource_path(relative_path):
     """ Получаем абсолютный путь к ресурсу, работает для dev и для PyInstaller """
     try:
@@ -38,7 +75,11 @@ class Window(QtWidgets.QMainWindow, window.Ui_MainWindow):
         self.setWindowIcon(QtGui.QIcon(icon_path))
 
         self.api_client = None
-        self.price_worker = None
+        # Общий пул потоков и долгоживущие объекты сигналов для всех фоновых задач
+        self.worker_pool = WorkerPool(max_workers=WORKER_POOL_SIZE)
+        self.price_signals = None  # Создаются вместе с первым воркером обновления цен
+        self.image_signals = WorkerSignals()
+        self.image_signals.image_ready.connect(self.update_image_in_table)
         self.start_btn.clicked.connect(self.start)
         self.detailed_products = None
         self.tableWidget.setColumnWidth(0, 65)
@@ -47,6 +88,8 @@ class Window(QtWidgets.QMainWindow, window.Ui_MainWindow):
         header.setSectionResizeMode(0, QHeaderView.ResizeToContents)
         header.setSectionResizeMode(1, QHeaderView.ResizeToContents)
         self.tracked_products = {}
+        # Коэффициенты скидки отдельных товаров (вместо общего coef_spin_box)
+        self.product_coefs = {}
         self.is_update_running = False
         self.is_running = False
         self.price_discount_coef = 0.852
@@ -55,12 +98,23 @@ class Window(QtWidgets.QMainWindow, window.Ui_MainWindow):
         self.coef_spin_box.setValue(self.price_discount_coef)
         self.coef_spin_box.setEnabled(False)
 
-        # 1. Создаем таймер
+        # 1. Планировщик опроса: у каждого отслеживаемого товара свой интервал
+        self.poll_scheduler = AdaptivePollScheduler()
+        self.last_full_refresh = 0.0
+        # 2. Таймер, по которому планировщик выдает товары, которым подошла очередь
         self.price_update_timer = QTimer(self)
-        # Устанавливаем интервал в миллисекундах (10 минут * 60 секунд * 1000 мс)
-        self.price_update_timer.setInterval(60000)  # поставить 300000 (5 минут)
-        # Подключаем сигнал таймера к слоту-запускатору
-        self.price_update_timer.timeout.connect(self.start_price_update)
+        self.price_update_timer.setInterval(SCHEDULER_TICK_MS)
+        self.price_update_timer.timeout.connect(self.on_scheduler_tick)
+
+        # Сторожевой таймер: заменяет цикл обновления, который завис дольше лимита
+        self.update_started_at = 0.0
+        self.watchdog_timer = QTimer(self)
+        self.watchdog_timer.setInterval(WATCHDOG_INTERVAL_MS)
+        self.watchdog_timer.timeout.connect(self.check_stalled_update)
+
+        # Деградированный режим: API недоступно, запись цен приостановлена,
+        # в таблице остается последний успешно загруженный каталог
+        self.is_degraded = False
 
         # Флаг для отслеживания состояния фильтра
         self.is_status_filtered = False
@@ -73,15 +127,83 @@ class Window(QtWidgets.QMainWindow, window.Ui_MainWindow):
         self.is_edit_mode = False
         # 2. Список для хранения ссылок на виджеты в таблице
         self.table_widgets = []
+        # Номер строки таблицы для каждого offer_id
+        self.row_by_offer_id = {}
         # 3. Подключаем кнопку редактирования к новому методу
         self.edit_btn.clicked.connect(self.toggle_edit_mode)
         self.select_all_btn.clicked.connect(self.select_all_or_none)
 
+        # История цен отслеживаемых товаров (открывается при старте для конкретного магазина)
+        self.price_history = None
+        self.history_panel = None
+        self.history_flush_timer = QTimer(self)
+        self.history_flush_timer.setInterval(HISTORY_FLUSH_INTERVAL_MS)
+        self.history_flush_timer.timeout.connect(self.flush_price_history)
+
+        # Прием push-уведомлений Ozon: изменившиеся товары опрашиваются сразу
+        self.push_server = None
+        self.push_signals = None
+        self.pending_push_offer_ids = set()
+        self.push_timer = QTimer(self)
+        self.push_timer.setSingleShot(True)
+        self.push_timer.setInterval(PUSH_COALESCE_MS)
+        self.push_timer.timeout.connect(self.process_push_changes)
+        # offer_id по product_id: в части уведомлений Ozon нет артикула
+        self.offer_id_by_product_id = {}
+
+        # Координация экземпляров: только ведущий опрашивает API и пишет цены,
+        # ведомые показывают его снимок (без общего файла аренды экземпляр всегда ведущий)
+        self.leader_lease = None
+        self.is_leader = True
+        self.lease_job_running = False
+        self.lease_job_catalog = False  # Задача продления публикует и полный каталог
+        self.snapshot_dirty = False
+        # Полный каталог публикуется только после полной загрузки; снимок ссылается на него по id
+        self.catalog_dirty = False
+        self.snapshot_catalog_id = None
+        self.snapshot_published_at = 0.0
+        self.snapshot_seen_at = 0.0
+        self.lease_signals = None
+        self.lease_timer = QTimer(self)
+        self.lease_timer.timeout.connect(self.on_lease_tick)
+
+        self.stats_panel = None
+        self.import_action.triggered.connect(self.import_prices)
+        self.export_action.triggered.connect(self.export_catalog)
+        self.stats_action.triggered.connect(self.show_stats_panel)
+        self.history_action.triggered.connect(self.show_history_panel)
+        self.profiling_action.toggled.connect(self.toggle_profiling)
+
+        # Размер и положение окна восстанавливаем до показа, иначе окно "прыгнет".
+        # Остальные настройки и сервер метрик - после первой отрисовки (finish_startup)
+        self.config_manager.load_window_state(self)
+        self.metrics_server = None
+        self.startup_finished = False
+        self.start_btn.setEnabled(False)
+        STARTUP.mark("window_created")
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        STARTUP.mark("first_paint")
+        if not self.startup_finished:
+            QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        """Загружает настройки и запускает сетевые службы, когда окно уже показано."""
+        if self.startup_finished:
+            return
+        self.startup_finished = True
         self.load_settings()
+        metrics_port = self.config_manager.load_metrics_port()
+        self.metrics_server = start_metrics_server(metrics_port) if metrics_port else None
+        self.start_btn.setEnabled(True)
+        STARTUP.mark("settings_loaded")
+        logger.info("Окно готово: первая отрисовка через %.0f мс, настройки загружены через %.0f мс.",
+                    STARTUP.marks.get("first_paint", 0.0) * 1000, STARTUP.marks["settings_loaded"] * 1000)
 
     def load_settings(self):
         """Загружает ОБЩИЕ настройки."""
-        print("Загрузка общих настроек...")
+        logger.info("Загрузка общих настроек...")
         client_id, api_key = self.config_manager.load_credentials()
         self.client_ID_lineEdit.setText(client_id)
         self.API_key_lineEdit.setText(api_key)
@@ -90,12 +212,17 @@ class Window(QtWidgets.QMainWindow, window.Ui_MainWindow):
         self.price_discount_coef = self.config_manager.load_coefficient()
         self.coef_spin_box.setValue(self.price_discount_coef)
 
-        # Восстанавливаем состояние окна
-        self.config_manager.load_window_state(self)
+        # Профилирование циклов (можно включить и через OZON_PROFILE=1)
+        profiling_enabled, report_dir, keep_last = self.config_manager.load_profiling_settings()
+        PROFILER.configure(profiling_enabled, report_dir, keep_last)
+        # Без сигнала: включение через OZON_PROFILE не должно сохраняться в настройках навсегда
+        self.profiling_action.blockSignals(True)
+        self.profiling_action.setChecked(profiling_enabled)
+        self.profiling_action.blockSignals(False)
 
     def save_settings(self):
         """Сохраняет ВСЕ настройки при выходе."""
-        print("Сохранение настроек приложения...")
+        logger.info("Сохранение настроек приложения...")
         current_client_id = self.client_ID_lineEdit.text()
 
         # Сохраняем общие настройки
@@ -108,35 +235,125 @@ class Window(QtWidgets.QMainWindow, window.Ui_MainWindow):
 
         # Сохраняем данные ТЕКУЩЕГО магазина
         self.config_manager.save_tracked_products(current_client_id, self.tracked_products)
+        self.config_manager.save_product_coefficients(current_client_id, self.product_coefs)
+
+    def show_stats_panel(self):
+        """Открывает окно статистики API."""
+        if self.stats_panel is None:
+            from stats_panel import StatsPanel
+            self.stats_panel = StatsPanel(api_metrics, self)
+        self.stats_panel.show()
+        self.stats_panel.raise_()
+
+    def show_history_panel(self):
+        """Открывает окно истории цен для выбранного в таблице товара."""
+        if self.price_history is None:
+            QMessageBox.information(self, "История цен", "История появится после запуска отслеживания (кнопка «Начать»).")
+            return
+        if self.history_panel is None:
+            from history_panel import HistoryPanel
+            self.history_panel = HistoryPanel(self.price_history, self)
+        offer_item = self.tableWidget.item(self.tableWidget.currentRow(), 1)
+        self.history_panel.show_offer(offer_item.text() if offer_item else None)
+
+    def open_price_history(self, client_id):
+        """Открывает хранилище истории цен магазина (прежнее, если оно было, закрывается)."""
+        from price_history import PriceHistory, default_history_path
+
+        path = default_history_path(client_id)
+        if self.price_history is not None:
+            if self.price_history.db_path == path:
+                return
+            self.price_history.close()
+            self.price_history = None
+            if self.history_panel is not None:
+                self.history_panel.close()
+                self.history_panel = None
+        try:
+            # Полная пачка замеров сбрасывается в пуле потоков, а не в record() на потоке GUI
+            self.price_history = PriceHistory(path, request_flush=self.flush_price_history)
+        except (OSError, sqlite3.Error) as e:
+            logger.error("История цен недоступна (%s): %s", path, e)
+            return
+        self.history_flush_timer.start()
+
+    def flush_price_history(self):
+        """Сбрасывает накопленную историю цен на диск в фоновом потоке."""
+        history = self.price_history
+        if history is not None:
+            self.worker_pool.submit("history", lambda job: history.flush())
+
+    def toggle_profiling(self, enabled):
+        """Включает или выключает профилирование циклов синхронизации."""
+        PROFILER.configure(enabled)
+        self.config_manager.save_profiling_enabled(enabled)
 
     def closeEvent(self, event):
         """
         Этот метод автоматически вызывается, когда пользователь закрывает окно.
         Идеальное место для сохранения настроек.
         """
-        self.save_settings()
+        if self.startup_finished:
+            # Пока настройки не загружены, сохранять нечего: затерли бы их значениями по умолчанию
+            self.save_settings()
+        self.stop_push_receiver()
+        self.close_leader_lease()
+        # Сначала пул: задачи сброса истории не должны стартовать после закрытия базы
+        self.worker_pool.shutdown()
+        if self.price_history is not None:
+            self.price_history.close()
         event.accept()  # Подтверждаем закрытие
 
     def start(self):
         if not self.is_running:
+            from ozon_seller_api import OzonSellerAPI
+
+            STARTUP.mark("start_clicked")
             self.tableWidget.clearContents()
             MY_CLIENT_ID = self.client_ID_lineEdit.text()
             MY_API_KEY = self.API_key_lineEdit.text()
 
             self.tracked_products = self.config_manager.load_tracked_products(MY_CLIENT_ID)
-            print(f"Загружены настройки отслеживания для магазина {MY_CLIENT_ID}")
+            self.product_coefs = self.config_manager.load_product_coefficients(MY_CLIENT_ID)
+            self.poll_scheduler.sync_tracked(self.tracked_products)
+            logger.info("Загружены настройки отслеживания для магазина %s", MY_CLIENT_ID)
+            self.open_price_history(MY_CLIENT_ID)
 
             self.client_ID_lineEdit.setEnabled(False)
             self.API_key_lineEdit.setEnabled(False)
             self.start_btn.setText("Остановить")
 
             self.api_client = OzonSellerAPI(client_id=MY_CLIENT_ID, api_key=MY_API_KEY)
+            self.open_leader_lease(MY_CLIENT_ID)
 
-            self.detailed_products = self.api_client.get_products_with_details()
-            self.detailed_products.reverse()
-            self.make_table(self.detailed_products)
-            print("Запускаю первичное обновление цен...")
-            self.start_price_update()
+            if self.is_leader:
+                self.start_push_receiver(MY_CLIENT_ID)
+                try:
+                    self.detailed_products = self.api_client.get_products_with_details(
+                        deadline=Deadline(INITIAL_LOAD_DEADLINE_S)
+                    )
+                except (DeadlineExceeded, CircuitOpenError) as e:
+                    logger.error("Первичная загрузка каталога прервана: %s", e)
+                    if isinstance(e, CircuitOpenError):
+                        # Каталог догрузит первая догоняющая синхронизация
+                        self.set_degraded(True)
+                    self.detailed_products = []
+                self.detailed_products.reverse()
+                self.make_table(self.detailed_products)
+                if not self.is_degraded:
+                    logger.info("Запускаю первичное обновление цен...")
+                    self.start_price_update()
+            else:
+                # Ведомый не обращается к API: таблица строится из снимка ведущего
+                snapshot = None
+                try:
+                    snapshot = self.leader_lease.read_snapshot(known_catalog_id=self.snapshot_catalog_id)
+                except Exception as e:  # Сбой базы или испорченный снимок (sqlite3.Error, zlib.error, ValueError)
+                    logger.error("Не удалось прочитать снимок ведущего: %s", e)
+                if snapshot is not None:
+                    self.apply_snapshot(snapshot)
+                else:
+                    logger.info("Снимка ведущего пока нет, таблица заполнится после его публикации.")
 
             self.is_running = True
         else:
@@ -144,84 +361,414 @@ class Window(QtWidgets.QMainWindow, window.Ui_MainWindow):
             self.API_key_lineEdit.setEnabled(True)
             self.start_btn.setText("Начать")
             self.price_update_timer.stop()
-            print("Таймер фонового обновления остановлен.")
+            self.watchdog_timer.stop()
+            self.stop_push_receiver()
+            self.close_leader_lease()
+            # Отменяем фоновые задачи; их запоздавшие результаты будут отброшены
+            self.worker_pool.cancel_all()
+            self.flush_price_history()
+            self.is_update_running = False
+            logger.info("Таймер фонового обновления остановлен.")
             self.is_running = False
 
-    def start_price_update(self):
-        """Слот, который запускает фоновый процесс обновления цен."""
-        if self.api_client is None:
-            return  # Не запускаем, если API не инициализирован
+    def open_leader_lease(self, client_id):
+        """
+        Подключается к общему файлу аренды, если он задан, и сразу пытается стать ведущим.
+        Если файл недоступен, экземпляр работает самостоятельно, как без координации.
+        """
+        from leader_lease import HEARTBEAT_INTERVAL_S, LeaderLease, LeaseSignals
+
+        self.leader_lease = None
+        self.is_leader = True
+        path = self.config_manager.load_lease_path()
+        if path:
+            if self.lease_signals is None:
+                self.lease_signals = LeaseSignals()
+                self.lease_signals.heartbeat.connect(self.on_lease_heartbeat)
+                self.lease_timer.setInterval(int(HEARTBEAT_INTERVAL_S * 1000))
+            try:
+                self.leader_lease = LeaderLease(path, client_id)
+                self.is_leader = self.leader_lease.try_acquire()
+            except (OSError, sqlite3.Error) as e:
+                logger.error("Общий файл аренды недоступен (%s): %s. Работаю без координации.", path, e)
+                self.leader_lease = None
+                self.is_leader = True
+        if self.leader_lease is not None:
+            if not self.is_leader:
+                logger.warning("Магазин %s уже обслуживает %s: этот экземпляр ведомый, только просмотр.",
+                               client_id, self.leader_lease.current_holder)
+            self.snapshot_dirty = self.catalog_dirty = self.is_leader
+            self.snapshot_catalog_id = None
+            self.snapshot_seen_at = 0.0
+            self.lease_timer.start()
+        self.update_leader_controls()
+
+    def close_leader_lease(self):
+        """Освобождает аренду (ведомый займет ее на ближайшем продлении) и закрывает файл."""
+        if self.leader_lease is None:
+            return
+        self.lease_timer.stop()
+        lease, self.leader_lease = self.leader_lease, None
+        try:
+            lease.release()
+        except sqlite3.Error as e:
+            logger.warning("Не удалось освободить аренду ведущего: %s", e)
+        lease.close()
+        self.lease_job_running = False
+        self.is_leader = True
+        self.update_leader_controls()
+
+    def update_leader_controls(self):
+        """Ведомый экземпляр только показывает данные: редактирование и импорт выключены."""
+        self.edit_btn.setEnabled(self.is_leader or self.is_edit_mode)
+        self.import_action.setEnabled(self.is_leader)
+        self.update_window_title()
+
+    def update_window_title(self):
+        title = "Ozon Price Equalizer"
+        if self.is_degraded:
+            title += " - API недоступно, запись приостановлена"
+        if not self.is_leader:
+            title += " - ведомый экземпляр, только просмотр"
+        self.setWindowTitle(title)
+
+    def capture_snapshot(self, with_catalog):
+        """
+        Копирует данные снимка для ведомых: цены товаров, желаемые цены и коэффициенты,
+        а при with_catalog - и полный каталог. handle_price_update меняет словари товаров
+        на месте, поэтому копия снимается в основном потоке, а сериализуется и сжимается
+        она в пуле потоков. Возвращает (снимок, каталог или None).
+        """
+        products = self.detailed_products or []
+        state = {
+            "prices": {p.get('offer_id'): [p.get('price'), p.get('marketing_price')] for p in products},
+            "tracked_products": dict(self.tracked_products),
+            "product_coefs": dict(self.product_coefs),
+            "coef": self.coef_spin_box.value(),
+            "catalog_id": self.snapshot_catalog_id,
+        }
+        # Верхний уровень словаря товара update() заменяет целиком, поэтому хватает поверхностной копии
+        catalog = [dict(p) for p in products] if with_catalog else None
+        return state, catalog
+
+    def on_lease_tick(self):
+        """
+        Слот таймера аренды. В пуле потоков продлевает (или пытается взять) аренду;
+        ведущий при этом публикует снимок, если данные изменились, ведомый - читает новый.
+        """
+        from leader_lease import encode_snapshot
+
+        lease = self.leader_lease
+        if lease is None or self.lease_job_running:
+            return
+        state = catalog = None
+        if self.is_leader and self.snapshot_dirty and \
+                time.monotonic() - self.snapshot_published_at >= SNAPSHOT_PUBLISH_INTERVAL_S:
+            if self.catalog_dirty:
+                self.snapshot_catalog_id = os.urandom(8).hex()
+            state, catalog = self.capture_snapshot(self.catalog_dirty)
+            self.snapshot_dirty = self.catalog_dirty = False
+            self.snapshot_published_at = time.monotonic()
+        seen_at = self.snapshot_seen_at
+        known_catalog_id = self.snapshot_catalog_id
+
+        def heartbeat(job):
+            leader, snapshot, published = False, None, None
+            try:
+                leader = lease.try_acquire()
+                if leader and state is not None:
+                    published = False
+                    catalog_data = None if catalog is None else encode_snapshot({"products": catalog})
+                    published = lease.publish_snapshot(encode_snapshot(state), catalog_data, state["catalog_id"])
+                elif not leader:
+                    snapshot = lease.read_snapshot(seen_at, known_catalog_id)
+            except Exception as e:
+                # Сбой базы или испорченный снимок (sqlite3.Error, zlib.error, ValueError).
+                # Без связи с базой остаемся ведущим только до истечения уже взятой аренды
+                logger.warning("Не удалось продлить аренду ведущего или обменяться снимком: %s", e)
+                leader = lease.is_leader()
+                snapshot = None
+            finally:
+                # Испускаем всегда: иначе lease_job_running останется True и продления прекратятся
+                self.lease_signals.heartbeat.emit(job.generation, leader, snapshot, published)
+
+        self.lease_job_running = True
+        self.lease_job_catalog = catalog is not None
+        self.worker_pool.submit("lease", heartbeat)
+
+    def on_lease_heartbeat(self, generation, leader, snapshot, published):
+        if not self.worker_pool.is_current("lease", generation) or self.leader_lease is None:
+            return
+        self.lease_job_running = False
+        if published is False and leader:
+            # Снимок не записан: опубликуем его заново на следующем продлении
+            self.snapshot_dirty = True
+            self.catalog_dirty = self.catalog_dirty or self.lease_job_catalog
+        if leader != self.is_leader:
+            self.set_leader(leader)
+        if snapshot is not None and not self.is_leader:
+            self.apply_snapshot(snapshot)
+
+    def set_leader(self, leader):
+        """Переключает экземпляр между ролями ведущего и ведомого."""
+        self.is_leader = leader
+        client_id = self.client_ID_lineEdit.text()
+        if leader:
+            logger.warning("Этот экземпляр стал ведущим для магазина %s: запускаю синхронизацию.", client_id)
+            self.snapshot_dirty = self.catalog_dirty = True
+            self.poll_scheduler.sync_tracked(self.tracked_products)
+            self.start_push_receiver(client_id)
+            self.start_price_update()
+        else:
+            logger.warning("Роль ведущего для магазина %s перешла к %s: опрос и запись цен остановлены.",
+                           client_id, self.leader_lease.current_holder)
+            self.price_update_timer.stop()
+            self.watchdog_timer.stop()
+            self.worker_pool.new_generation("price")
+            self.is_update_running = False
+            self.stop_push_receiver()
+        self.update_leader_controls()
+
+    def apply_snapshot(self, snapshot):
+        """
+        Показывает снимок ведущего. Таблица перестраивается, только если изменился состав
+        товаров или отслеживание; иначе обновляются цены в существующих строках.
+        Желаемые цены ведущего перенимаются, чтобы при смене ведущего продолжить с ними же.
+        """
+        if self.is_edit_mode:
+            return  # Не затираем правки пользователя; снимок применится на следующем продлении
+        self.snapshot_seen_at = snapshot["updated_at"]
+        products = snapshot.get("products")
+        if products is not None:
+            # Вместе со снимком прочитан новый каталог ведущего
+            self.snapshot_catalog_id = snapshot.get("catalog_id")
+        else:
+            products = self.detailed_products or []
+        for product in products:
+            prices = snapshot.get("prices", {}).get(product.get('offer_id'))
+            if prices is not None:
+                product['price'], product['marketing_price'] = prices
+        tracked_products = snapshot.get("tracked_products", {})
+        product_coefs = {offer_id: float(coef) for offer_id, coef in snapshot.get("product_coefs", {}).items()}
+        rebuild = (
+            tracked_products != self.tracked_products or product_coefs != self.product_coefs
+            or [p.get('offer_id') for p in products] != [p.get('offer_id') for p in self.detailed_products or []]
+        )
+        self.tracked_products = tracked_products
+        self.product_coefs = product_coefs
+        self.poll_scheduler.sync_tracked(self.tracked_products)
+        if "coef" in snapshot:
+            self.price_discount_coef = snapshot["coef"]
+            self.coef_spin_box.setValue(self.price_discount_coef)
+        self.detailed_products = products
+        if rebuild:
+            self.make_table(products)
+        else:
+            self.refresh_price_cells({p.get('offer_id'): p for p in products})
+        logger.debug("Применен снимок ведущего %s: товаров %d, отслеживается %d",
+                     snapshot.get("holder"), len(products), len(tracked_products))
+
+    def start_push_receiver(self, client_id):
+        """Запускает прием push-уведомлений, если он включен в настройках (порт не 0)."""
+        port, host = self.config_manager.load_push_settings()
+        if not port:
+            return
+        from push_receiver import PushReceiver, PushReceiverSignals, start_push_server
+
+        if self.push_signals is None:
+            self.push_signals = PushReceiverSignals()
+            self.push_signals.products_changed.connect(self.on_push_products_changed)
+        receiver = PushReceiver(self.push_signals.products_changed.emit, seller_id=client_id)
+        self.push_server = start_push_server(receiver, port, host)
+        if self.push_server is not None:
+            # Изменения приходят уведомлениями, плановый опрос остается редкой сверкой
+            self.poll_scheduler.set_min_interval(PUSH_RECONCILE_MIN_INTERVAL_S)
+
+    def stop_push_receiver(self):
+        """Останавливает прием push-уведомлений и возвращает обычную частоту опроса."""
+        if self.push_server is None:
+            return
+        self.push_server.shutdown()
+        self.push_server.server_close()
+        self.push_server = None
+        self.push_timer.stop()
+        self.pending_push_offer_ids.clear()
+        self.poll_scheduler.set_min_interval(None)
+
+    def on_push_products_changed(self, offer_ids, product_ids):
+        """Слот push-уведомления: копит изменившиеся товары, чтобы опросить их одной пачкой."""
+        self.pending_push_offer_ids.update(offer_ids)
+        for product_id in product_ids:
+            offer_id = self.offer_id_by_product_id.get(product_id)
+            if offer_id is not None:
+                self.pending_push_offer_ids.add(offer_id)
+        if self.pending_push_offer_ids and not self.push_timer.isActive():
+            self.push_timer.start()
+
+    def process_push_changes(self):
+        """
+        Ставит отслеживаемые товары из накопленных уведомлений в начало очереди планировщика
+        и, если цикл обновления не идет, сразу их опрашивает. Иначе они будут опрошены
+        на первом тике после текущего цикла.
+        """
+        offer_ids = [offer_id for offer_id in self.pending_push_offer_ids if offer_id in self.tracked_products]
+        self.pending_push_offer_ids.clear()
+        if not offer_ids or not self.is_running:
+            return
+        logger.info("Push-уведомления: изменились %d отслеживаемых товаров: %s",
+                    len(offer_ids), summarize_items(offer_ids))
+        self.poll_scheduler.mark_urgent(offer_ids)
+        if not self.is_update_running:
+            self.on_scheduler_tick()
 
-        print("Начинаю обновление... Таймер остановлен на время работы.")
+    def on_scheduler_tick(self):
+        """
+        Слот таймера планировщика. Раз в FULL_REFRESH_INTERVAL_S загружает весь каталог,
+        в остальное время опрашивает только товары, которым подошла очередь.
+        """
+        if self.api_client is None or self.is_update_running or not self.is_leader:
+            return
+        if self.is_degraded:
+            # Пока хотя бы один предохранитель разомкнут, запросов не шлем. Когда все они
+            # пропустят пробный запрос (в том числе запись цен, иначе синхронизация тут же
+            # снова упрется в разомкнутую запись), делаем одну полную догоняющую синхронизацию.
+            if self.api_client.retry_in() == 0:
+                logger.info("Проверяю доступность API: полная догоняющая синхронизация...")
+                self.start_price_update()
+            return
+        if time.monotonic() - self.last_full_refresh >= FULL_REFRESH_INTERVAL_S:
+            self.start_price_update()
+            return
+        due_offer_ids = self.poll_scheduler.pop_due()
+        if due_offer_ids:
+            self.start_price_update(due_offer_ids)
+
+    def start_price_update(self, offer_ids=None):
+        """
+        Запускает фоновый процесс обновления цен.
+        :param offer_ids: Какие товары опросить; None - загрузить весь каталог.
+        """
+        if self.api_client is None or not self.is_leader:
+            return  # Не запускаем, если API не инициализирован или экземпляр ведомый
+
+        logger.debug("Начинаю обновление... Таймер остановлен на время работы.")
         self.is_update_running = True  # 1. Устанавливаем флаг-блокировку
         self.price_update_timer.stop()  # 2. Останавливаем таймер
+        self.update_started_at = time.monotonic()
+        self.watchdog_timer.start()
+
+        # 1. Новое поколение: предыдущий цикл (если он еще идет) отменяется
+        self.worker_pool.new_generation("price")
+
+        # 2. Создаем воркера с общими сигналами и ставим его в пул
+        from price_update_worker import PriceUpdateWorker, PriceUpdateWorkerSignals
+
+        if self.price_signals is None:
+            self.price_signals = PriceUpdateWorkerSignals()
+            self.price_signals.finished.connect(self.on_price_worker_finished)
+            self.price_signals.error.connect(self.on_price_worker_error)
+        price_worker = PriceUpdateWorker(api_client=self.api_client, signals=self.price_signals,
+                                         offer_ids=offer_ids, deadline_s=CYCLE_DEADLINE_S)
+        self.worker_pool.submit("price", price_worker.run)
+
+    def on_price_worker_finished(self, generation, new_products_list, requested_offer_ids):
+        """Передает результат воркера в обработку, если цикл не был заменен сторожевым таймером."""
+        if not self.worker_pool.is_current("price", generation):
+            logger.warning("Отброшен результат устаревшего цикла обновления #%d.", generation)
+            return
+        self.handle_price_update(new_products_list, requested_offer_ids)
 
-        # 1. Создаем воркера
-        self.price_worker = PriceUpdateWorker(api_client=self.api_client)
+    def on_price_worker_error(self, generation, error_message):
+        if not self.worker_pool.is_current("price", generation):
+            logger.warning("Отброшена ошибка устаревшего цикла обновления #%d.", generation)
+            return
+        self.handle_price_error(error_message)
 
-        # 2. Подключаем его сигналы к методам-обработчикам
-        self.price_worker.signals.finished.connect(self.handle_price_update)
-        self.price_worker.signals.error.connect(self.handle_price_error)
+    def check_stalled_update(self):
+        """
+        Слот сторожевого таймера. Если цикл обновления идет дольше лимита с запасом,
+        считает его зависшим: отбрасывает его будущий результат и возобновляет расписание.
+        """
+        if not self.is_update_running:
+            self.watchdog_timer.stop()
+            return
+        elapsed = time.monotonic() - self.update_started_at
+        if elapsed < CYCLE_DEADLINE_S + WATCHDOG_GRACE_S:
+            return
+        logger.error("Цикл обновления #%d завис (%.0f с). Запускаю следующий по расписанию.",
+                     self.worker_pool.generation("price"), elapsed)
+        api_metrics.observe_cycle("price_fetch_stalled", elapsed, ok=False)
+        self.worker_pool.new_generation("price")  # Зависший воркер отменяется, его результат будет отброшен
+        self.is_update_running = False
+        self.watchdog_timer.stop()
+        self.price_update_timer.start()
 
-        # 3. Создаем и запускаем поток
-        thread = threading.Thread(target=self.price_worker.run)
-        thread.daemon = True
-        thread.start()
+    def set_degraded(self, degraded):
+        """Включает/выключает деградированный режим (пауза записи цен при сбоях API)."""
+        if degraded == self.is_degraded:
+            return
+        self.is_degraded = degraded
+        if degraded:
+            logger.warning("API недоступно: запись цен приостановлена, показываю последний загруженный каталог.")
+        else:
+            logger.info("API снова доступно: деградированный режим выключен.")
+        self.update_window_title()
 
     def handle_price_error(self, error_message):
         """Обрабатывает ошибку от фонового воркера."""
         # Здесь можно показать уведомление пользователю
-        print(f"Не удалось обновить цены: {error_message}")
+        logger.error("Не удалось обновить цены: %s", error_message)
+        if self.api_client is not None and self.api_client.is_degraded():
+            self.set_degraded(True)
         self.is_update_running = False  # 1. Снимаем блокировку
+        self.watchdog_timer.stop()
         self.price_update_timer.start()  # 2. Перезапускаем таймер для следующей попытки
-        print(f"Следующая попытка обновления через {self.price_update_timer.interval() / 60000} минут.")
 
-    def handle_price_update(self, new_products_list):
+    @PROFILER.profile("price_apply")
+    def handle_price_update(self, new_products_list, requested_offer_ids=None):
         """
         Основной метод, который обрабатывает новые данные, сравнивает цены
         и обновляет таблицу.
+        :param new_products_list: Новые данные о товарах.
+        :param requested_offer_ids: Какие товары опрашивались; None - загружен весь каталог.
         """
+        started = time.perf_counter()
         try:
-            print("Фоновое обновление: получены новые данные. Сравниваю цены...")
+            logger.debug("Фоновое обновление: получены новые данные. Сравниваю цены...")
 
-            # 1. Создаем словарь старых цен для отслеживаемых товаров для быстрой проверки
-            old_tracked_prices = {}
-            for offer_id in self.tracked_products.keys():
-                # Находим старые данные для товара
-                product_data = self.tracked_products.get(offer_id, {})
-                old_tracked_prices[offer_id] = product_data
+            # 1. Индексируем новые данные по offer_id, чтобы не искать их перебором
+            new_by_offer_id = {p.get('offer_id'): p for p in new_products_list}
 
             # 2. Обновляем наш основной источник данных
-            self.detailed_products = new_products_list
-
-            # 3. Обновляем всю таблицу новыми данными
-            for row in range(self.tableWidget.rowCount()):
-                # Получаем offer_id из ячейки, чтобы найти новые данные
-                offer_id_item = self.tableWidget.item(row, 1)
-                if not offer_id_item:
-                    continue
-
-                offer_id = offer_id_item.text()
-
-                # Находим новые данные для этого offer_id
-                new_data = next((p for p in new_products_list if p.get('offer_id') == offer_id), None)
-                if new_data:
-                    # Обновляем ячейку с ценой в таблице
-                    new_price = new_data.get('price', 'Цена не найдена')
-                    marketing_price = new_data.get('marketing_price', 'Цена не найдена')
-                    
-                    try:
-                        new_price = float(new_price)
-                    except ValueError as e:
-                        continue
-                    try:
-                        marketing_price = float(marketing_price)
-                    except ValueError as e:
-                        marketing_price = new_price
-
-                    self.tableWidget.item(row, 4).setText(
-                        str(math.ceil(float(new_price) * self.get_final_coef(float(new_price), float(marketing_price)))) + '.00'
-                    )
+            rebuild = False
+            if requested_offer_ids is None:
+                # Строки таблицы - это позиции товаров в detailed_products: если состав или порядок
+                # каталога изменился, индекс строк устарел, и таблицу нужно перестроить
+                rebuild = not self.row_by_offer_id or (
+                    [p.get('offer_id') for p in new_products_list]
+                    != [p.get('offer_id') for p in self.detailed_products or []]
+                )
+                self.detailed_products = new_products_list
+                self.last_full_refresh = time.monotonic()
+                # Полный каталог загружен целиком - это и есть догоняющая синхронизация,
+                # но выходим из деградированного режима, только если замкнуты все предохранители
+                if self.api_client is None or not self.api_client.is_degraded():
+                    self.set_degraded(False)
+            elif self.detailed_products:
+                for offer_id, new_data in new_by_offer_id.items():
+                    row = self.row_by_offer_id.get(offer_id)
+                    if row is not None:
+                        self.detailed_products[row].update(new_data)
+
+            # 3. Обновляем в таблице цены товаров, по которым пришли данные
+            if rebuild:
+                # Таблицы еще нет (ведомый без снимка стал ведущим) или изменился состав товаров
+                self.make_table(self.detailed_products)
+            else:
+                self.refresh_price_cells(new_by_offer_id)
+            self.snapshot_dirty = True
+            if requested_offer_ids is None:
+                self.catalog_dirty = True
 
             if self.is_edit_mode:
                 return
@@ -231,34 +778,46 @@ class Window(QtWidgets.QMainWindow, window.Ui_MainWindow):
             current_product_prices = {}
 
             # 4. Сравниваем цены для отслеживаемых товаров
-            for offer_id, old_price in old_tracked_prices.items():
-                new_data = next((p for p in new_products_list if p.get('offer_id') == offer_id), None)
-                if new_data:
-                    
-                    try:
-                        new_price = float(new_data.get('price', 'Цена не найдена'))
-                    except ValueError as e:
-                        continue
-                    try:
-                        new_marketing_price = float(new_data.get('marketing_price', 'Цена не найдена'))
-                    except ValueError as e:
-                        new_marketing_price = new_price
-                        
-                    current_product_prices[offer_id] = [new_price, new_marketing_price]
-                        
-                    # Также обновляем данные в нашем словаре отслеживаемых товаров
-                    # self.tracked_products[offer_id] = new_data
-
-                    if new_price > self.tracked_products[offer_id] * 1.01 or new_price < self.tracked_products[offer_id] * 0.99:
-                        print(f"!!! ИЗМЕНЕНИЕ ЦЕНЫ для {offer_id}: было '{old_price}', стало '{new_price}'")
-                        products_to_update.append(offer_id)
-            self.set_prices(products_to_update, self.tracked_products, current_product_prices)
-
-            print("Фоновое обновление завершено.")
+            for offer_id, preferred_price in self.tracked_products.items():
+                new_data = new_by_offer_id.get(offer_id)
+                if not new_data:
+                    continue
+                prices = pricing.parse_prices(new_data)
+                if prices is None:
+                    continue
+                new_price, new_marketing_price = prices
+                current_product_prices[offer_id] = [new_price, new_marketing_price]
+                # Планировщик подстраивает частоту опроса товара под его волатильность
+                self.poll_scheduler.record(offer_id, new_price, new_marketing_price, preferred_price)
+                if self.price_history is not None:
+                    self.price_history.record(offer_id, new_price, new_marketing_price, preferred_price)
+
+                if pricing.is_out_of_band(new_price, preferred_price):
+                    logger.debug("Изменение цены для %s: желаемая '%s', стала '%s'", offer_id, preferred_price, new_price)
+                    products_to_update.append(offer_id)
+            if products_to_update:
+                logger.info("Цена ушла от желаемой у %d товаров: %s",
+                            len(products_to_update), summarize_items(products_to_update))
+                self.set_prices(products_to_update, self.tracked_products, current_product_prices)
+
+            logger.debug("Фоновое обновление завершено.", extra={"fields": self.poll_scheduler.stats()})
         finally:
+            api_metrics.observe_cycle("price_apply", time.perf_counter() - started)
             self.is_update_running = False  # 1. Снимаем блокировку
+            self.watchdog_timer.stop()
             self.price_update_timer.start()  # 2. Перезапускаем таймер
-            print(f"Следующее обновление запланировано через {self.price_update_timer.interval() / 60000} минут.")
+
+    def refresh_price_cells(self, products_by_offer_id):
+        """Обновляет столбец цены в строках таблицы по данным товаров (словарь по offer_id)."""
+        for offer_id, new_data in products_by_offer_id.items():
+            row = self.row_by_offer_id.get(offer_id)
+            prices = pricing.parse_prices(new_data)
+            if row is None or prices is None or not self.tableWidget.item(row, 4):
+                continue
+            new_price, marketing_price = prices
+            self.tableWidget.item(row, 4).setText(
+                str(pricing.displayed_price(new_price, marketing_price, self.coef_for(offer_id))) + '.00'
+            )
 
     def set_prices(self, products_to_update, tracked_products, current_product_prices):
         query_list = []
@@ -267,21 +826,48 @@ class Window(QtWidgets.QMainWindow, window.Ui_MainWindow):
             marketing_price = current_product_prices[offer_id][1]
             query_list.append({
                 "offer_id": offer_id,
-                "price": str(math.ceil(float(tracked_products[offer_id] / self.get_final_coef(price, marketing_price)))) + '.00',  # Новая цена
+                "price": str(pricing.seller_price_for(tracked_products[offer_id], price, marketing_price,
+                                                      self.coef_for(offer_id))) + '.00',  # Новая цена
                 "old_price": "0",  # Новая зачеркнутая цена
                 "currency_code": "RUB"
             })
-        print(json.dumps(query_list, indent=2, ensure_ascii=False))
-        update_results = self.api_client.update_prices(query_list)
-        print("\n--- Результаты обновления ---")
-        print(f"Успешно обновлено: {len(update_results['successful'])}")
-        for success in update_results['successful']:
-            print(f"  - Offer ID: {success.get('offer_id')}, Product ID: {success.get('product_id')}")
+        if logger.isEnabledFor(logging.DEBUG):
+            import json_backend
+            logger.debug("Отправляю новые цены: %s", json_backend.dumps(query_list).decode('utf-8'))
+        if self.is_degraded:
+            logger.warning("Деградированный режим: запись %d цен пропущена.", len(query_list))
+            return
+        if self.leader_lease is not None and not self.leader_lease.is_leader():
+            # Аренда не продлена вовремя: ее может уже держать другой экземпляр
+            logger.warning("Аренда ведущего истекает: запись %d цен пропущена.", len(query_list))
+            return
+        write_deadline = WRITE_DEADLINE_S
+        if self.leader_lease is not None:
+            # Запись идет на потоке GUI, и аренда на это время не продлевается: прерываемся
+            # раньше, чем ее сможет перехватить другой экземпляр
+            write_deadline = min(write_deadline, self.leader_lease.time_left())
+        try:
+            update_results = self.api_client.update_prices(query_list, deadline=Deadline(write_deadline))
+        except (DeadlineExceeded, CircuitOpenError) as e:
+            logger.error("Запись цен прервана: %s", e)
+            if isinstance(e, CircuitOpenError):
+                # Запись цен недоступна: ждем догоняющей синхронизации, как при сбое опроса
+                self.set_degraded(True)
+            return
+        successful = update_results['successful']
+        if self.price_history is not None:
+            sent_prices = {query['offer_id']: float(query['price']) for query in query_list}
+            for success in successful:
+                if success.get('offer_id') in sent_prices:
+                    self.price_history.record_push(success['offer_id'], sent_prices[success['offer_id']])
+        logger.info("Успешно обновлено: %d (%s)", len(successful),
+                    summarize_items(success.get('offer_id') for success in successful))
 
         if update_results['failed']:
-            print(f"\nНе удалось обновить: {len(update_results['failed'])}")
+            # Ошибки выводим по каждому товару: их обычно мало, и причина нужна целиком
+            logger.warning("Не удалось обновить: %d", len(update_results['failed']))
             for failure in update_results['failed']:
-                print(f"  - Offer ID: {failure.get('offer_id')}, Ошибки: {failure.get('errors')}")
+                logger.warning("Offer ID: %s, Ошибки: %s", failure.get('offer_id'), failure.get('errors'))
 
         # self.start_price_update()
 
@@ -296,20 +882,21 @@ class Window(QtWidgets.QMainWindow, window.Ui_MainWindow):
         self.select_all_btn.setEnabled(self.is_edit_mode)
         self.coef_spin_box.setEnabled(self.is_edit_mode)
 
+        if was_in_edit_mode and not self.is_edit_mode:
+            # Если чекбокс отмечен, а поле для ввода пустое, снимаем отметку и убираем товар
+            # из отслеживания. .strip() удаляет пробелы по краям, чтобы поле из одних
+            # пробелов считалось пустым
+            self.set_rows_checked(
+                [w for w in self.table_widgets if w['checkbox'].isChecked() and not w['line_edit'].text().strip()],
+                False
+            )
+
         # Проходимся по всем сохраненным виджетам
+        self.tableWidget.setUpdatesEnabled(False)
         for widgets in self.table_widgets:
             checkbox = widgets['checkbox']
             line_edit = widgets['line_edit']
 
-            if was_in_edit_mode and not self.is_edit_mode:
-                # ...и если чекбокс отмечен, а поле для ввода пустое...
-                # .strip() удаляет пробелы по краям, чтобы поле из одних пробелов считалось пустым
-                if checkbox.isChecked() and not line_edit.text().strip():
-                    # ...то снимаем отметку.
-                    # Это автоматически вызовет on_checkbox_state_changed,
-                    # который уберет товар из отслеживания.
-                    checkbox.setChecked(False)
-
             # Включаем или выключаем чекбоксы
             checkbox.setEnabled(self.is_edit_mode)
 
@@ -322,11 +909,18 @@ class Window(QtWidgets.QMainWindow, window.Ui_MainWindow):
                 self.price_discount_coef = self.coef_spin_box.value()
             # Если входим - LineEdit останется выключенным, пока не нажмут на его чекбокс
             # Это поведение управляется в on_checkbox_state_changed
+        self.tableWidget.setUpdatesEnabled(True)
         if was_in_edit_mode and not self.is_edit_mode:
-            print("Отслеживаемые товары:", self.tracked_products)
-            print("Запускаю немедленное обновление цен после редактирования...")
-            # ...то запускаем обновление цен ОДИН РАЗ.
-            self.start_price_update()
+            logger.info("Отслеживается товаров: %d", len(self.tracked_products))
+            self.poll_scheduler.sync_tracked(self.tracked_products)
+            if self.price_history is not None:
+                self.price_history.forget(self.tracked_products)
+            self.snapshot_dirty = True
+            if self.tracked_products:
+                logger.info("Запускаю немедленное обновление цен после редактирования...")
+                # ...то опрашиваем отслеживаемые товары ОДИН РАЗ.
+                self.start_price_update(list(self.tracked_products))
+        self.update_leader_controls()
 
     def select_all_or_none(self):
         """
@@ -350,10 +944,172 @@ class Window(QtWidgets.QMainWindow, window.Ui_MainWindow):
         # в противном случае - True (отметить).
         new_state = not all_are_checked
 
-        # Применяем новое состояние ко всем чекбоксам
-        for widgets in self.table_widgets:
-            # setChecked вызовет сигнал stateChanged, только если состояние реально изменится
-            widgets['checkbox'].setChecked(new_state)
+        # Применяем новое состояние ко всем строкам одним пакетом
+        self.set_rows_checked(self.table_widgets, new_state)
+
+    def set_rows_checked(self, rows, checked):
+        """
+        Массово отмечает или снимает чекбоксы строк.
+        Сигналы чекбоксов на время блокируются, чтобы on_checkbox_state_changed не вызывался
+        на каждую строку: tracked_products меняется за один шаг, таблица перерисовывается один раз.
+        :param rows: Элементы self.table_widgets, которые нужно изменить.
+        :param checked: True - отметить, False - снять отметку.
+        """
+        started = time.perf_counter()
+        placeholder = "Введите цену..." if checked else ""
+        changed_offer_ids = []
+        new_prices = {}
+
+        self.tableWidget.setUpdatesEnabled(False)
+        try:
+            for widgets in rows:
+                checkbox = widgets['checkbox']
+                if checkbox.isChecked() == checked:
+                    continue
+                line_edit = widgets['line_edit']
+                checkbox.blockSignals(True)
+                checkbox.setChecked(checked)
+                checkbox.blockSignals(False)
+                line_edit.setEnabled(checked)
+                line_edit.setPlaceholderText(placeholder)
+                changed_offer_ids.append(widgets['offer_id'])
+                if checked and line_edit.text() != '':
+                    preferred_price = int(line_edit.text())
+                    if preferred_price:
+                        new_prices[widgets['offer_id']] = preferred_price
+        finally:
+            self.tableWidget.setUpdatesEnabled(True)
+
+        # Тот же результат, что и у on_checkbox_state_changed по каждой строке, но одним шагом
+        if checked:
+            self.tracked_products.update(new_prices)
+        else:
+            for offer_id in changed_offer_ids:
+                self.tracked_products.pop(offer_id, None)
+
+        logger.info("%s отметка у %d товаров за %.0f мс, отслеживается: %d",
+                    "Установлена" if checked else "Снята", len(changed_offer_ids),
+                    (time.perf_counter() - started) * 1000, len(self.tracked_products))
+
+    def import_prices(self):
+        """Импортирует желаемые цены (и коэффициенты) для многих товаров из CSV/XLSX."""
+        import price_import
+
+        if not self.detailed_products:
+            QMessageBox.warning(self, "Импорт цен", "Сначала загрузите каталог магазина (кнопка «Начать»).")
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "Импорт желаемых цен", "",
+                                              "Таблицы (*.csv *.xlsx);;CSV (*.csv);;Excel (*.xlsx)")
+        if not path:
+            return
+
+        progress_dialog = QProgressDialog("Чтение и проверка файла...", "Отмена", 0, 1000, self)
+        progress_dialog.setWindowTitle("Импорт цен")
+        progress_dialog.setWindowModality(QtCore.Qt.WindowModal)
+        progress_dialog.setMinimumDuration(300)
+
+        def on_progress(fraction):
+            progress_dialog.setValue(int(fraction * 1000))
+            QApplication.processEvents()
+            return not progress_dialog.wasCanceled()
+
+        try:
+            result = price_import.load_price_file(path, self.row_by_offer_id, progress=on_progress)
+        except price_import.PriceImportCancelled:
+            logger.info("Импорт цен отменен пользователем.")
+            return
+        except price_import.PriceImportError as e:
+            QMessageBox.critical(self, "Импорт цен", str(e))
+            return
+        finally:
+            progress_dialog.close()
+
+        message = f"Проверено строк: {result.rows}\nБудет применено: {len(result.targets)}"
+        if result.error_count:
+            shown = "\n".join(f"строка {line_no}: {text}" for line_no, text in result.errors[:10])
+            message += f"\nОтклонено: {result.error_count}\n\n{shown}"
+            if result.error_count > 10:
+                message += "\n..."
+        if not result.targets:
+            QMessageBox.warning(self, "Импорт цен", message)
+            return
+        answer = QMessageBox.question(self, "Импорт цен", message + "\n\nПрименить?")
+        if answer == QMessageBox.Yes:
+            self.apply_price_import(result)
+
+    def apply_price_import(self, result):
+        """
+        Применяет проверенный импорт одним шагом: желаемые цены и коэффициенты обновляются
+        целиком, строки таблицы отмечаются без сигналов по каждой строке.
+        :param result: price_import.PriceImportResult.
+        """
+        self.tracked_products.update(result.targets)
+        for offer_id in result.targets:
+            # Коэффициент из файла заменяет прежний; без коэффициента - общий из coef_spin_box
+            if offer_id in result.coefs:
+                self.product_coefs[offer_id] = result.coefs[offer_id]
+            else:
+                self.product_coefs.pop(offer_id, None)
+
+        self.tableWidget.setUpdatesEnabled(False)
+        try:
+            for widgets in self.table_widgets:
+                offer_id = widgets['offer_id']
+                target = result.targets.get(offer_id)
+                if target is None:
+                    continue
+                checkbox = widgets['checkbox']
+                line_edit = widgets['line_edit']
+                checkbox.blockSignals(True)
+                checkbox.setChecked(True)
+                checkbox.blockSignals(False)
+                line_edit.setText(str(target))
+                line_edit.setEnabled(self.is_edit_mode)
+                if self.is_edit_mode:
+                    line_edit.setPlaceholderText("Введите цену...")
+        finally:
+            self.tableWidget.setUpdatesEnabled(True)
+
+        self.poll_scheduler.sync_tracked(self.tracked_products)
+        if self.price_history is not None:
+            self.price_history.forget(self.tracked_products)
+        # Импортированные товары проверяем на ближайшем тике планировщика
+        self.poll_scheduler.mark_urgent(result.targets)
+        self.snapshot_dirty = True
+        self.config_manager.save_tracked_products(self.client_ID_lineEdit.text(), self.tracked_products)
+        self.config_manager.save_product_coefficients(self.client_ID_lineEdit.text(), self.product_coefs)
+        logger.info("Импорт применен: %d желаемых цен, отслеживается товаров: %d",
+                    len(result.targets), len(self.tracked_products))
+
+    def export_catalog(self):
+        """Выгружает загруженный каталог с рассчитанными и желаемыми ценами в CSV или Parquet."""
+        import catalog_export
+
+        if not self.detailed_products:
+            QMessageBox.warning(self, "Экспорт каталога", "Сначала загрузите каталог магазина (кнопка «Начать»).")
+            return
+        path, selected_filter = QFileDialog.getSaveFileName(self, "Экспорт каталога", "catalog.csv",
+                                                            "CSV (*.csv);;Parquet (*.parquet)")
+        if not path:
+            return
+        fmt = "parquet" if path.lower().endswith(".parquet") or selected_filter.startswith("Parquet") else "csv"
+        if not path.lower().endswith("." + fmt):
+            path += "." + fmt
+
+        QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+        try:
+            # Копия списка: пока идет выгрузка, handle_price_update может заменить каталог
+            rows = catalog_export.export_catalog(
+                list(self.detailed_products), path, fmt,
+                tracked_products=dict(self.tracked_products), coef=self.coef_spin_box.value(),
+                product_coefs=dict(self.product_coefs),
+            )
+        except (catalog_export.CatalogExportError, OSError) as e:
+            QApplication.restoreOverrideCursor()
+            QMessageBox.critical(self, "Экспорт каталога", str(e))
+            return
+        QApplication.restoreOverrideCursor()
+        QMessageBox.information(self, "Экспорт каталога", f"Выгружено товаров: {rows}\n{path}")
 
     def on_header_clicked(self, column_index):
         """
@@ -383,7 +1139,7 @@ class Window(QtWidgets.QMainWindow, window.Ui_MainWindow):
         # 3. Устанавливаем этот новый элемент в качестве заголовка для нашего столбца
         self.tableWidget.setHorizontalHeaderItem(self.STATUS_COLUMN_INDEX, status_header_item)
 
-        print(f"Применение фильтра. Текущее состояние: {'Включен' if self.is_status_filtered else 'Выключен'}")
+        logger.debug("Применение фильтра. Текущее состояние: %s", 'Включен' if self.is_status_filtered else 'Выключен')
 
         # Проходим по каждой строке таблицы
         for row in range(self.tableWidget.rowCount()):
@@ -404,12 +1160,15 @@ class Window(QtWidgets.QMainWindow, window.Ui_MainWindow):
                 # Просто показываем все строки
                 self.tableWidget.setRowHidden(row, False)
 
+    @PROFILER.profile("make_table")
     def make_table(self, detailed_products):
         # Сбрасываем состояние фильтра при полной перезагрузке таблицы
         self.is_status_filtered = False
         self.apply_status_filter()  # Убирает скрытие со всех строк, если оно было
 
         self.table_widgets.clear()
+        self.row_by_offer_id = {}
+        self.offer_id_by_product_id = {}
 
         row_count = len(detailed_products)
         column_count = self.tableWidget.columnCount()
@@ -442,11 +1201,11 @@ class Window(QtWidgets.QMainWindow, window.Ui_MainWindow):
                 offer_id = product.get('offer_id', 'Артикул не найден')
 
                 if len(primary_image) > 0:
-                    urls.append(primary_image[0])
+                    urls.append((i, primary_image[0]))
 
                 checkBoxWidget = QWidget()
                 checkBox = QCheckBox()
-                checkBox.setEnabled(False)
+                checkBox.setEnabled(self.is_edit_mode)  # Таблица может перестроиться и в режиме редактирования
                 layoutCheckBox = QHBoxLayout(checkBoxWidget)
                 layoutCheckBox.addWidget(checkBox)
                 layoutCheckBox.setAlignment(QtCore.Qt.AlignCenter)
@@ -476,24 +1235,35 @@ class Window(QtWidgets.QMainWindow, window.Ui_MainWindow):
                     lineEdit.setText(str(preferred_price))
 
                 self.table_widgets.append({
+                    'offer_id': offer_id,
                     'checkbox': checkBox,
                     'line_edit': lineEdit
                 })
 
+                self.row_by_offer_id[offer_id] = i
+                product_id = product.get('id', product.get('product_id'))
+                if product_id is not None:
+                    self.offer_id_by_product_id[product_id] = offer_id
                 self.tableWidget.setItem(i, 0, QtWidgets.QTableWidgetItem("Загрузка..."))
                 self.tableWidget.setItem(i, 1, QtWidgets.QTableWidgetItem(offer_id))
                 self.tableWidget.setItem(i, 2, QtWidgets.QTableWidgetItem(name))
                 self.tableWidget.setItem(i, 3, QtWidgets.QTableWidgetItem(status))
                 self.tableWidget.setItem(i, 4, QtWidgets.QTableWidgetItem(
-                    str(math.ceil(float(price) * self.get_final_coef(float(price), float(marketing_price)))) + '.00')
+                    str(math.ceil(float(price) * self.get_final_coef(float(price), float(marketing_price), offer_id))) + '.00')
                 )
                 self.tableWidget.setCellWidget(i, 5, checkBoxWidget)
                 self.tableWidget.setCellWidget(i, 6, lineEditWidget)
             self.start_download(urls)
+            if STARTUP.mark("first_data"):
+                STARTUP.stop_tracking()
+                STARTUP.log_report()
 
-    def get_final_coef(self, seller_price, market_price):
-        coef = self.coef_spin_box.value()
-        return (market_price / seller_price) * coef
+    def coef_for(self, offer_id=None):
+        """Коэффициент скидки товара: личный из импорта или общий из coef_spin_box."""
+        return self.product_coefs.get(offer_id, self.coef_spin_box.value())
+
+    def get_final_coef(self, seller_price, market_price, offer_id=None):
+        return pricing.final_coef(seller_price, market_price, self.coef_for(offer_id))
 
     def on_checkbox_state_changed(self, offer_id, line_edit, state):
         """
@@ -503,7 +1273,7 @@ class Window(QtWidgets.QMainWindow, window.Ui_MainWindow):
         :param state: Состояние чекбокса (Checked или Unchecked).
         """
         if state == QtCore.Qt.Checked:
-            print(f"Товар с артикулом {offer_id} добавлен в отслеживание.")
+            logger.debug("Товар с артикулом %s добавлен в отслеживание.", offer_id)
             preferred_price = None
             if line_edit.text() != '':
                 preferred_price = int(line_edit.text())
@@ -515,7 +1285,7 @@ class Window(QtWidgets.QMainWindow, window.Ui_MainWindow):
             line_edit.setPlaceholderText("Введите цену...")  # Полезный плейсхолдер
 
         else:
-            print(f"Товар с артикулом {offer_id} убран из отслеживания.")
+            logger.debug("Товар с артикулом %s убран из отслеживания.", offer_id)
             if offer_id in self.tracked_products:
                 del self.tracked_products[offer_id]
 
@@ -524,8 +1294,6 @@ class Window(QtWidgets.QMainWindow, window.Ui_MainWindow):
             # line_edit.clear()  # Очищаем текст
             line_edit.setPlaceholderText("")  # Убираем плейсхолдер
 
-        print("Отслеживаемые товары:", list(self.tracked_products.keys()))
-
     def on_lineedit_editing_finished(self, offer_id, line_edit):
         preferred_price = None
         if line_edit.text() != '':
@@ -533,28 +1301,31 @@ class Window(QtWidgets.QMainWindow, window.Ui_MainWindow):
             line_edit.setText(str(preferred_price))
         if preferred_price:
             self.tracked_products[offer_id] = preferred_price
-        print(f"Товару с артикулом {offer_id} присвоена желаемая цена: {preferred_price}.")
+        logger.debug("Товару с артикулом %s присвоена желаемая цена: %s.", offer_id, preferred_price)
+
+    def start_download(self, images):
+        """
+        Запускает загрузку изображений в пуле потоков.
+        :param images: Список пар (номер строки, URL изображения).
+        """
+        # 1. Новое поколение: загрузка для предыдущей таблицы отменяется
+        self.worker_pool.new_generation("images")
 
-    def start_download(self, urls):
-        """Запускает процесс загрузки в отдельном потоке."""
-        # 1. Создаем объект с сигналами
-        self.worker_signals = WorkerSignals()
-        self.worker_signals.image_ready.connect(self.update_image_in_table)
-        # self.worker_signals.finished.connect(self.on_download_finished)
+        # 2. Создаем ЭКЗЕМПЛЯР нашего загрузчика с общими сигналами
+        from image_downloader import ImageDownloader
 
-        # 2. Создаем ЭКЗЕМПЛЯР нашего загрузчика
         downloader = ImageDownloader(
-            urls=urls,
-            signals=self.worker_signals
+            images=images,
+            signals=self.image_signals
         )
 
-        # 3. Создаем и запускаем поток, целью которого является метод `run` нашего объекта
-        thread = threading.Thread(target=downloader.run)
-        thread.daemon = True
-        thread.start()
+        # 3. Ставим задачу в пул
+        self.worker_pool.submit("images", downloader.run)
 
-    def update_image_in_table(self, row, pixmap):
+    def update_image_in_table(self, generation, row, pixmap):
         """Слот для обновления ячейки с изображением. Выполняется в основном потоке."""
+        if not self.worker_pool.is_current("images", generation):
+            return  # Изображение для уже перестроенной таблицы
         self.tableWidget.setItem(row, 0, QtWidgets.QTableWidgetItem(""))
         if not pixmap.isNull():
             self.tableWidget.setRowHeight(row, 65)
@@ -567,6 +1338,7 @@ class Window(QtWidgets.QMainWindow, window.Ui_MainWindow):
 
 
 def main():
+    setup_logging()
     app = QtWidgets.QApplication(sys.argv)
     window_app = Window()
     window_app.show()
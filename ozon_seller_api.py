@@ -1,6 +1,35 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
 import requests
-import json
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterable, Optional, Sequence
+
+import json_backend
+from api_metrics import ApiMetrics, REGISTRY
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+# Общий пул для параллельных курсоров списка товаров: создается при первой загрузке
+# по разделам и живет до выхода, а не создается заново на каждое обновление
+_list_executor: Optional[ThreadPoolExecutor] = None
+_list_executor_lock = threading.Lock()
+
+
+def _shared_list_executor(max_workers: int) -> ThreadPoolExecutor:
+    global _list_executor
+    with _list_executor_lock:
+        if _list_executor is None:
+            _list_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="product-list")
+        return _list_executor
+
+
+class IncompleteDataError(Exception):
+    """Часть страниц или пачек не загрузилась, и данные о товарах неполные."""
 
 
 class OzonSellerAPI:
@@ -9,14 +38,35 @@ class OzonSellerAPI:
     """
 
     BASE_URL = "https://api-seller.ozon.ru"
-
-    def __init__(self, client_id: str, api_key: str):
+    # Поля детальной информации, которые реально использует приложение.
+    # Остальная часть ответа /v3/product/info/list отбрасывается прямо при чтении.
+    DETAIL_FIELDS = ("id", "offer_id", "name", "price", "marketing_price", "statuses", "primary_image")
+    # Размер порции при потоковом чтении тела ответа
+    STREAM_CHUNK_SIZE = 64 * 1024
+    # Таймауты одного запроса (в секундах): на установку соединения и на чтение ответа
+    CONNECT_TIMEOUT = 5
+    READ_TIMEOUT = 30
+    # Группы эндпоинтов, у каждой из которых свой предохранитель
+    ENDPOINT_GROUPS = {
+        '/v3/product/list': 'catalog',
+        '/v3/product/info/list': 'catalog',
+        '/v1/product/import/prices': 'prices',
+    }
+    # Разделы каталога по видимости для get_product_list_partitioned. Что VISIBLE и INVISIBLE
+    # вместе дают ровно visibility=ALL, не проверено, поэтому по умолчанию каталог
+    # листается одним курсором ALL, а разделы включаются явно
+    LIST_PARTITIONS = ({"visibility": "VISIBLE"}, {"visibility": "INVISIBLE"})
+    # Сколько курсоров списка товаров листать одновременно (включая поток вызывающего)
+    LIST_CONCURRENCY = 4
+
+    def __init__(self, client_id: str, api_key: str, metrics: Optional[ApiMetrics] = None):
         """
         Инициализирует клиент API.
 
         Args:
             client_id: Ваш Client ID для доступа к API.
             api_key: Ваш API Key для доступа к API.
+            metrics: Сборщик метрик запросов (по умолчанию - общий REGISTRY).
         """
         if not client_id or not api_key:
             raise ValueError("Client ID и Api-Key не могут быть пустыми.")
@@ -28,8 +78,27 @@ class OzonSellerAPI:
             "Api-Key": self.api_key,
             "Content-Type": "application/json"
         }
-
-    def _make_request(self, method: str, endpoint: str, payload: Optional[Dict] = None) -> Optional[Dict]:
+        self.metrics = metrics or REGISTRY
+        self.breakers = {group: CircuitBreaker(group) for group in set(self.ENDPOINT_GROUPS.values())}
+
+    def breaker_for(self, endpoint: str) -> CircuitBreaker:
+        """Предохранитель группы, к которой относится эндпоинт."""
+        group = self.ENDPOINT_GROUPS.get(endpoint, 'other')
+        if group not in self.breakers:
+            self.breakers[group] = CircuitBreaker(group)
+        return self.breakers[group]
+
+    def is_degraded(self) -> bool:
+        """True, если хотя бы один предохранитель не замкнут (API работает со сбоями)."""
+        return any(breaker.state != CircuitBreaker.CLOSED for breaker in self.breakers.values())
+
+    def retry_in(self) -> float:
+        """Через сколько секунд все предохранители пропустят запрос (0 - уже пропускают)."""
+        return max((breaker.retry_in() for breaker in self.breakers.values()), default=0.0)
+
+    def _make_request(self, method: str, endpoint: str, payload: Optional[Dict] = None,
+                      stream_key: Optional[str] = None, fields: Optional[Sequence[str]] = None,
+                      deadline: Optional[Deadline] = None) -> Optional[Dict]:
         """
         Приватный метод для выполнения запросов к API.
 
@@ -37,54 +106,119 @@ class OzonSellerAPI:
             method: HTTP-метод ('POST', 'GET').
             endpoint: Эндпоинт API (например, '/v3/product/list').
             payload: Тело запроса в виде словаря.
+            stream_key: Если задан, тело ответа разбирается потоково и возвращается
+                        только массив с этим ключом: {stream_key: [...]}.
+            fields: Поля, которые нужно оставить у элементов массива stream_key.
+            deadline: Крайний срок цикла; таймауты запроса урезаются до оставшегося времени.
 
         Returns:
             Ответ от API в виде словаря или None в случае ошибки.
+
+        Raises:
+            DeadlineExceeded: Если срок цикла истек до или во время запроса.
+            CircuitOpenError: Если предохранитель группы эндпоинтов разомкнут.
         """
         url = f"{self.BASE_URL}{endpoint}"
+        if deadline is not None:
+            timeout = deadline.timeout(self.CONNECT_TIMEOUT, self.READ_TIMEOUT, endpoint)
+        else:
+            timeout = (self.CONNECT_TIMEOUT, self.READ_TIMEOUT)
+        breaker = self.breaker_for(endpoint)
+        if not breaker.allow_request():
+            raise CircuitOpenError(f"API временно недоступно ({breaker.name}), запрос {endpoint} не отправлен")
+        # Сбоем API считаются сетевые ошибки, 5xx и 429; остальные 4xx - ошибки самого запроса
+        api_failed = True
+        body = json_backend.dumps(payload) if method.upper() == 'POST' else b""
+        status = "error"  # Останется таким, если ответ от сервера не получен
+        received = [0]
+        started = time.perf_counter()
         try:
             if method.upper() == 'POST':
-                response = requests.post(url, headers=self._headers, data=json.dumps(payload))
+                response = requests.post(url, headers=self._headers, data=body, timeout=timeout,
+                                         stream=stream_key is not None)
             else:  # Добавим GET для будущих методов
-                response = requests.get(url, headers=self._headers, params=payload)
+                response = requests.get(url, headers=self._headers, params=payload, timeout=timeout)
+            status = str(response.status_code)
+            api_failed = response.status_code >= 500 or response.status_code == 429
 
             response.raise_for_status()  # Проверка на ошибки HTTP (4xx/5xx)
-            return response.json()
-
+            if stream_key is not None:
+                with response:
+                    chunks = self._count_bytes(response.iter_content(chunk_size=self.STREAM_CHUNK_SIZE),
+                                               received, deadline)
+                    return {stream_key: list(json_backend.iter_array_items(chunks, stream_key, fields))}
+            received[0] = len(response.content)
+            return json_backend.loads(response.content)
+
+        except ValueError as e:
+            api_failed = True
+            logger.error("Не удалось разобрать ответ API (%s): %s", endpoint, e)
+            return None
         except requests.exceptions.RequestException as e:
-            print(f"Ошибка при запросе к API: {e}")
-            if 'response' in locals() and response.text:
-                print(f"Тело ответа: {response.text}")
+            logger.error("Ошибка при запросе к API: %s", e)
+            if isinstance(e, requests.exceptions.HTTPError):
+                self._log_error_body(response, received)
+            else:
+                api_failed = True  # Сетевая ошибка, в том числе обрыв посреди потокового тела
             return None
+        finally:
+            if api_failed:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            self.metrics.observe_request(endpoint, time.perf_counter() - started, status,
+                                         bytes_out=len(body), bytes_in=received[0])
 
-    def get_product_list(self, limit: int = 1000, visibility: str = "ALL") -> List[Dict]:
+    @staticmethod
+    def _log_error_body(response, counter: list):
         """
-        Получает полный список товаров продавца, обрабатывая постраничную загрузку.
-
-        Args:
-            limit: Количество товаров на одной странице (максимум 1000).
-            visibility: Фильтр по видимости товаров (ALL, VISIBLE, INVISIBLE и др.).
-
-        Returns:
-            Список словарей, где каждый словарь представляет один товар.
-            В случае ошибки возвращает пустой список.
+        Пишет в лог тело ответа с HTTP-ошибкой. У потокового ответа тело еще не прочитано,
+        и его чтение может оборваться само, поэтому ошибки чтения только логируются.
+        """
+        try:
+            text = response.text
+            counter[0] = len(response.content)
+        except (requests.exceptions.RequestException, RuntimeError) as e:
+            logger.error("Не удалось прочитать тело ответа: %s", e)
+            return
+        finally:
+            response.close()
+        if text:
+            logger.error("Тело ответа: %s", text)
+
+    @staticmethod
+    def _count_bytes(chunks, counter: list, deadline: Optional[Deadline] = None):
         """
+        Пропускает порции тела ответа насквозь, суммируя их размер в counter[0].
+        Между порциями проверяет срок цикла: read-таймаут ограничивает только паузу
+        между порциями, а не чтение всего тела.
+        """
+        for chunk in chunks:
+            counter[0] += len(chunk)
+            if deadline is not None:
+                deadline.check("чтение ответа")
+            yield chunk
+
+    def _list_cursor(self, product_filter: Dict, limit: int, deadline: Optional[Deadline],
+                     strict: bool) -> List[Dict]:
+        """Листает один курсор last_id списка товаров с заданным фильтром до конца."""
         all_products = []
         last_id = ""
 
-        print("Начинаю загрузку списка товаров...")
         while True:
             payload = {
-                "filter": {
-                    "visibility": visibility
-                },
+                "filter": product_filter,
                 "last_id": last_id,
                 "limit": limit
             }
 
-            data = self._make_request('POST', '/v3/product/list', payload)
+            data = self._make_request('POST', '/v3/product/list', payload, deadline=deadline)
 
             if not data:
+                if deadline is not None:
+                    deadline.check("список товаров")  # Ошибка могла быть вызвана урезанным таймаутом
+                if strict:
+                    raise IncompleteDataError(f"Список товаров загружен не полностью ({len(all_products)} шт.)")
                 break  # Прерываем цикл при ошибке в _make_request
 
             result = data.get('result', {})
@@ -94,19 +228,117 @@ class OzonSellerAPI:
                 break
 
             all_products.extend(products_on_page)
-            print(f"Загружено {len(products_on_page)} товаров. Всего: {len(all_products)}")
+            logger.debug("Загружено %d товаров (%s). Всего: %d", len(products_on_page), product_filter,
+                         len(all_products))
 
             last_id = result.get('last_id', "")
             if not last_id:
                 break
+        return all_products
 
-        print("Загрузка списка товаров завершена.")
+    def get_product_list(self, limit: int = 1000, visibility: str = "ALL",
+                         deadline: Optional[Deadline] = None, strict: bool = False) -> List[Dict]:
+        """
+        Получает полный список товаров продавца, обрабатывая постраничную загрузку.
+
+        Args:
+            limit: Количество товаров на одной странице (максимум 1000).
+            visibility: Фильтр по видимости товаров (ALL, VISIBLE, INVISIBLE и др.).
+            deadline: Крайний срок цикла (проверяется перед каждой страницей).
+            strict: Если True, ошибка на любой странице приводит к IncompleteDataError
+                    вместо возврата частичного списка.
+
+        Returns:
+            Список словарей, где каждый словарь представляет один товар.
+            В случае ошибки возвращает пустой список.
+        """
+        logger.info("Начинаю загрузку списка товаров...")
+        all_products = self._list_cursor({"visibility": visibility}, limit, deadline, strict)
+        logger.info("Загрузка списка товаров завершена. Всего товаров: %d", len(all_products))
+        return all_products
+
+    @staticmethod
+    def offer_id_partitions(offer_ids: Iterable[str], size: int = 1000) -> List[Dict]:
+        """
+        Фильтры-разделы по известным артикулам (по size штук). Подходят для обновления
+        уже загруженного каталога: новые товары в такие разделы не попадут.
+        """
+        offer_ids = list(offer_ids)
+        return [{"offer_id": offer_ids[i:i + size], "visibility": "ALL"}
+                for i in range(0, len(offer_ids), size)]
+
+    def get_product_list_partitioned(self, partitions: Sequence[Dict], limit: int = 1000,
+                                     deadline: Optional[Deadline] = None, strict: bool = False,
+                                     max_workers: int = LIST_CONCURRENCY) -> List[Dict]:
+        """
+        Получает список товаров, листая курсоры нескольких разделов каталога параллельно.
+        Время загрузки определяется самым большим разделом, а не всем каталогом.
+
+        Первый раздел листается в потоке вызывающего, остальные - в общем пуле модуля.
+        Пока предохранитель каталога не замкнут, разделы листаются по очереди: в HALF_OPEN
+        он пропускает один пробный запрос, и параллельные разделы получили бы CircuitOpenError.
+
+        Args:
+            partitions: Фильтры /v3/product/list для каждого раздела (например, LIST_PARTITIONS
+                        или offer_id_partitions). Вместе они должны покрывать нужную часть каталога;
+                        товар, попавший в несколько разделов, остается в результате один раз.
+            limit: Количество товаров на одной странице (максимум 1000).
+            deadline: Крайний срок цикла (общий для всех разделов).
+            strict: Если True, ошибка в любом разделе приводит к IncompleteDataError.
+            max_workers: Сколько разделов загружать одновременно.
+
+        Returns:
+            Список товаров без повторов, упорядоченный по product_id.
+        """
+        partitions = list(partitions)
+        breaker = self.breaker_for('/v3/product/list')
+        if len(partitions) <= 1 or max_workers <= 1 or breaker.state != CircuitBreaker.CLOSED:
+            results = [self._list_cursor(p, limit, deadline, strict) for p in partitions]
+        else:
+            logger.info("Начинаю загрузку списка товаров: %d разделов параллельно...", len(partitions))
+            executor = _shared_list_executor(self.LIST_CONCURRENCY - 1)
+            pending = deque(partitions[1:])
+            futures = []
+
+            def drain_partitions() -> List[List[Dict]]:
+                # Каждая задача берет разделы из общей очереди, пока она не опустеет:
+                # одновременно листается не больше max_workers курсоров
+                drained = []
+                while True:
+                    try:
+                        product_filter = pending.popleft()
+                    except IndexError:
+                        return drained
+                    drained.append(self._list_cursor(product_filter, limit, deadline, strict))
+
+            try:
+                futures = [executor.submit(drain_partitions)
+                           for _ in range(min(max_workers, len(partitions)) - 1)]
+                results = [self._list_cursor(partitions[0], limit, deadline, strict)]
+                # result() пробрасывает IncompleteDataError/DeadlineExceeded/CircuitOpenError из раздела
+                for future in futures:
+                    results.extend(future.result())
+            except BaseException:
+                # Еще не начатые разделы не загружаем, начатые дожидаемся: после выхода
+                # из метода запросов этого обновления быть не должно
+                pending.clear()
+                wait(futures)
+                raise
+
+        unique = {}
+        for products in results:
+            for product in products:
+                unique.setdefault(product['product_id'], product)
+        all_products = [unique[product_id] for product_id in sorted(unique)]
+        logger.info("Загрузка списка товаров завершена. Всего товаров: %d (разделов: %d, повторов: %d)",
+                    len(all_products), len(partitions), sum(map(len, results)) - len(all_products))
         return all_products
 
     # --- ЗАГЛУШКИ ДЛЯ БУДУЩИХ МЕТОДОВ ---
 
-    def get_product_info(self, product_ids: List[int] = None, offer_ids: List[str] = None, skus: List[int] = None) -> \
-            List[Dict]:
+    def get_product_info(self, product_ids: List[int] = None, offer_ids: List[str] = None, skus: List[int] = None,
+                         fields: Optional[Sequence[str]] = None, deadline: Optional[Deadline] = None,
+                         strict: bool = False) -> List[Dict]:
         """
         Получает подробную информацию о товарах по их идентификаторам.
         Автоматически разбивает запрос на части по 1000 товаров.
@@ -115,12 +347,16 @@ class OzonSellerAPI:
             product_ids: Список ID товаров (product_id).
             offer_ids: Список артикулов (offer_id).
             skus: Список SKU Ozon.
+            fields: Если задан, ответ разбирается потоково и у каждого товара
+                    остаются только эти поля. None - полный ответ.
+            deadline: Крайний срок цикла (проверяется перед каждой пачкой).
+            strict: Если True, ошибка в любой пачке приводит к IncompleteDataError.
 
         Returns:
             Список словарей с детальной информацией о каждом товаре.
         """
         if not any([product_ids, offer_ids, skus]):
-            print("Необходимо передать хотя бы один список идентификаторов (product_ids, offer_ids или skus).")
+            logger.error("Необходимо передать хотя бы один список идентификаторов (product_ids, offer_ids или skus).")
             return []
 
         # Определяем, какой идентификатор использовать
@@ -133,31 +369,50 @@ class OzonSellerAPI:
 
         all_details = []
         chunk_size = 1000
-        print(f"Шаг 2: Начинаю загрузку детальной информации для {len(id_list)} товаров...")
+        logger.info("Шаг 2: Начинаю загрузку детальной информации для %d товаров...", len(id_list))
 
         for i in range(0, len(id_list), chunk_size):
             chunk = id_list[i:i + chunk_size]
             payload = {id_key: chunk}
 
-            data = self._make_request('POST', '/v3/product/info/list', payload)
+            if fields is None:
+                data = self._make_request('POST', '/v3/product/info/list', payload, deadline=deadline)
+            else:
+                data = self._make_request('POST', '/v3/product/info/list', payload,
+                                          stream_key='items', fields=fields, deadline=deadline)
 
             if data and 'items' in data:
                 all_details.extend(data['items'])
-                print(f"  - Загружены детали для {len(all_details)}/{len(id_list)} товаров...")
+                logger.debug("Загружены детали для %d/%d товаров...", len(all_details), len(id_list))
+            elif strict:
+                raise IncompleteDataError(f"Детали загружены не полностью ({len(all_details)}/{len(id_list)})")
 
-        print("Шаг 2: Загрузка деталей завершена.")
+        logger.info("Шаг 2: Загрузка деталей завершена.")
         return all_details
 
-    def get_products_with_details(self) -> List[Dict]:
+    def get_products_with_details(self, detail_fields: Optional[Sequence[str]] = DETAIL_FIELDS,
+                                  deadline: Optional[Deadline] = None, strict: bool = False,
+                                  partitions: Optional[Sequence[Dict]] = None) -> List[Dict]:
         """
         Высокоуровневый метод: получает полный список товаров со всей необходимой информацией.
         Объединяет данные из get_product_list() и get_product_info().
 
+        Args:
+            detail_fields: Какие поля детальной информации оставить (по умолчанию DETAIL_FIELDS).
+                           None - сохранить ответ целиком.
+            deadline: Крайний срок всего цикла, передается в обе загрузки.
+            strict: Если True, вместо частичного каталога бросается IncompleteDataError.
+            partitions: Разделы каталога для параллельной загрузки списка
+                        (см. get_product_list_partitioned). По умолчанию - один курсор visibility=ALL.
+
         Returns:
             Полный список товаров с детальной информацией.
         """
         # Шаг 1: Получаем базовый список
-        product_list = self.get_product_list()
+        if partitions:
+            product_list = self.get_product_list_partitioned(partitions, deadline=deadline, strict=strict)
+        else:
+            product_list = self.get_product_list(deadline=deadline, strict=strict)
         if not product_list:
             return []
 
@@ -165,7 +420,8 @@ class OzonSellerAPI:
         product_ids = [p['product_id'] for p in product_list]
 
         # Шаг 3: Получаем детальную информацию
-        product_details = self.get_product_info(product_ids=product_ids)
+        product_details = self.get_product_info(product_ids=product_ids, fields=detail_fields,
+                                                deadline=deadline, strict=strict)
         if not product_details:
             return product_list  # Возвращаем хотя бы базовый список, если детали не загрузились
 
@@ -181,7 +437,7 @@ class OzonSellerAPI:
 
         return enriched_products
 
-    def update_prices(self, price_data: List[Dict]) -> Dict[str, List]:
+    def update_prices(self, price_data: List[Dict], deadline: Optional[Deadline] = None) -> Dict[str, List]:
         """
         Обновляет цены для списка товаров.
 
@@ -201,15 +457,20 @@ class OzonSellerAPI:
                             }
                         ]
                         Обязательные поля: (product_id или offer_id) и price.
+            deadline: Крайний срок записи (проверяется перед каждой пачкой).
 
         Returns:
             Словарь с результатами обновления: {'successful': [...], 'failed': [...]}.
+
+        Raises:
+            DeadlineExceeded: Если срок записи истек.
+            CircuitOpenError: Если предохранитель записи цен разомкнут; оставшиеся пачки не отправляются.
         """
         if not isinstance(price_data, list) or not price_data:
-            print("Ошибка: price_data должен быть непустым списком словарей.")
+            logger.error("Ошибка: price_data должен быть непустым списком словарей.")
             return {"successful": [], "failed": []}
 
-        print(f"Начинаю обновление цен для {len(price_data)} позиций...")
+        logger.info("Начинаю обновление цен для %d позиций...", len(price_data))
 
         successful_updates = []
         failed_updates = []
@@ -219,7 +480,7 @@ class OzonSellerAPI:
             chunk = price_data[i:i + chunk_size]
             payload = {"prices": chunk}
 
-            response_data = self._make_request('POST', '/v1/product/import/prices', payload)
+            response_data = self._make_request('POST', '/v1/product/import/prices', payload, deadline=deadline)
 
             if response_data and 'result' in response_data:
                 results = response_data['result']
@@ -228,11 +489,12 @@ class OzonSellerAPI:
                         successful_updates.append(res)
                     else:
                         failed_updates.append(res)
-                print(f"  - Обработана пачка из {len(chunk)} товаров.")
+                logger.debug("Обработана пачка из %d товаров.", len(chunk))
             else:
                 # Если весь запрос не удался, отмечаем все товары в чанке как неудачные
-                print(f"  - Ошибка при обработке пачки из {len(chunk)} товаров.")
+                logger.error("Ошибка при обработке пачки из %d товаров.", len(chunk))
                 failed_updates.extend(chunk)
 
-        print("Обновление цен завершено.")
+        logger.info("Обновление цен завершено.", extra={"fields": {
+            "successful": len(successful_updates), "failed": len(failed_updates)}})
         return {"successful": successful_updates, "failed": failed_updates}
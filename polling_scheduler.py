@@ -0,0 +1,178 @@
+import heapq
+import itertools
+import math
+import time
+from typing import Dict, Iterable, List, Optional
+
+import pricing
+
+
+class _ProductState:
+    """Состояние опроса одного отслеживаемого товара."""
+    __slots__ = ("interval", "due", "observations", "drifts", "last_prices")
+
+    def __init__(self, interval: float, due: float):
+        self.interval = interval
+        self.due = due
+        self.observations = 0
+        self.drifts = 0
+        self.last_prices = None
+
+
+class AdaptivePollScheduler:
+    """
+    Планировщик опроса отслеживаемых товаров на очереди с приоритетом.
+
+    У каждого offer_id свой интервал опроса. Если при очередной проверке цена
+    вышла из коридора ±1% или изменилась маркетинговая цена, интервал
+    сокращается вдвое (до min_interval), если товар стабилен - растет в
+    STABLE_GROWTH раз (до max_interval). Так волатильные товары опрашиваются
+    часто, а стабильные - редко.
+
+    Общий бюджет запросов ограничен корзиной токенов: не более
+    max_requests_per_minute запросов /v3/product/info/list в минуту,
+    в каждый запрос попадает до batch_size товаров.
+    """
+
+    STABLE_GROWTH = 1.5
+
+    def __init__(self, min_interval: float = 30.0, max_interval: float = 1800.0,
+                 initial_interval: float = 60.0, max_requests_per_minute: int = 30,
+                 batch_size: int = 1000, clock=time.monotonic):
+        self.min_interval = min_interval
+        self._base_min_interval = min_interval
+        self.max_interval = max_interval
+        self.initial_interval = initial_interval
+        self.max_requests_per_minute = max_requests_per_minute
+        self.batch_size = batch_size
+        self._clock = clock
+
+        self._states: Dict[str, _ProductState] = {}
+        self._heap = []  # (due, seq, offer_id); устаревшие записи пропускаются при извлечении
+        self._seq = itertools.count()
+        self._tokens = float(max_requests_per_minute)
+        self._tokens_updated = clock()
+
+    def __len__(self):
+        return len(self._states)
+
+    def _push(self, offer_id: str, due: float):
+        state = self._states[offer_id]
+        state.due = due
+        heapq.heappush(self._heap, (due, next(self._seq), offer_id))
+        # Устаревшие записи удаляются лениво; если их накопилось много, пересобираем очередь
+        if len(self._heap) > 2 * len(self._states) + 64:
+            self._heap = [(s.due, next(self._seq), oid) for oid, s in self._states.items()]
+            heapq.heapify(self._heap)
+
+    def sync_tracked(self, offer_ids: Iterable[str]):
+        """
+        Приводит набор опрашиваемых товаров в соответствие со списком отслеживаемых.
+        Новые товары опрашиваются сразу, убранные из отслеживания - забываются.
+        """
+        now = self._clock()
+        wanted = set(offer_ids)
+        for offer_id in list(self._states):
+            if offer_id not in wanted:
+                del self._states[offer_id]
+        for offer_id in wanted:
+            if offer_id not in self._states:
+                self._states[offer_id] = _ProductState(self.initial_interval, now)
+                self._push(offer_id, now)
+
+    def set_min_interval(self, min_interval: Optional[float] = None):
+        """
+        Меняет нижнюю границу интервала опроса (None - вернуть заданную при создании).
+        Пока изменения приходят push-уведомлениями, опрос нужен только как редкая сверка.
+        При снижении границы интервалы, поднятые прежней границей, возвращаются к
+        initial_interval: иначе частый опрос восстанавливался бы только через срабатывания.
+        """
+        previous = self.min_interval
+        self.min_interval = self._base_min_interval if min_interval is None else min_interval
+        upper = max(self.max_interval, self.min_interval)
+        now = self._clock()
+        for offer_id, state in self._states.items():
+            if self.min_interval < previous and state.interval >= previous:
+                state.interval = max(self.min_interval, min(self.initial_interval, upper))
+                # Товар опрашивается по новому интервалу, а не ждет конца длинного
+                if state.due > now + state.interval:
+                    self._push(offer_id, now + state.interval)
+            else:
+                state.interval = min(max(state.interval, self.min_interval), upper)
+
+    def mark_urgent(self, offer_ids: Iterable[str]):
+        """Ставит товары в начало очереди (будут опрошены на ближайшем тике)."""
+        now = self._clock()
+        for offer_id in offer_ids:
+            if offer_id in self._states:
+                self._push(offer_id, now)
+
+    def _refill_tokens(self, now: float):
+        rate = self.max_requests_per_minute / 60.0
+        self._tokens = min(float(self.max_requests_per_minute),
+                           self._tokens + (now - self._tokens_updated) * rate)
+        self._tokens_updated = now
+
+    def pop_due(self) -> List[str]:
+        """
+        Возвращает товары, которые пора опросить, в пределах бюджета запросов.
+        Не поместившиеся в бюджет товары остаются в очереди и будут первыми на следующем тике.
+        """
+        now = self._clock()
+        self._refill_tokens(now)
+        limit = int(self._tokens) * self.batch_size
+        due = []
+        while self._heap and len(due) < limit:
+            due_at, _, offer_id = self._heap[0]
+            state = self._states.get(offer_id)
+            if state is None or state.due != due_at:
+                heapq.heappop(self._heap)  # Устаревшая запись
+                continue
+            if due_at > now:
+                break
+            heapq.heappop(self._heap)
+            # Пока ответ не получен, повторно не выдаем: перенесем на интервал вперед
+            self._push(offer_id, now + state.interval)
+            due.append(offer_id)
+        self._tokens -= math.ceil(len(due) / self.batch_size)
+        return due
+
+    def record(self, offer_id: str, price: float, marketing_price: float, target: Optional[float]):
+        """Учитывает результат опроса товара и пересчитывает его интервал."""
+        state = self._states.get(offer_id)
+        if state is None:
+            return
+        drifted = target is not None and pricing.is_out_of_band(price, target)
+        if state.last_prices is not None and state.last_prices[1] != marketing_price:
+            drifted = True
+        state.last_prices = (price, marketing_price)
+        state.observations += 1
+        if drifted:
+            state.drifts += 1
+            state.interval = max(self.min_interval, state.interval / 2)
+        else:
+            state.interval = min(self.max_interval, state.interval * self.STABLE_GROWTH)
+        self._push(offer_id, self._clock() + state.interval)
+
+    def next_due_in(self) -> Optional[float]:
+        """Через сколько секунд наступит ближайший опрос (None, если товаров нет)."""
+        while self._heap:
+            due_at, _, offer_id = self._heap[0]
+            state = self._states.get(offer_id)
+            if state is None or state.due != due_at:
+                heapq.heappop(self._heap)
+                continue
+            return max(0.0, due_at - self._clock())
+        return None
+
+    def stats(self) -> Dict[str, float]:
+        """Сводка для логов: число товаров, средний интервал и доля срабатываний."""
+        if not self._states:
+            return {"products": 0, "avg_interval": 0.0, "drift_ratio": 0.0}
+        observations = sum(s.observations for s in self._states.values())
+        drifts = sum(s.drifts for s in self._states.values())
+        return {
+            "products": len(self._states),
+            "avg_interval": sum(s.interval for s in self._states.values()) / len(self._states),
+            "drift_ratio": drifts / observations if observations else 0.0,
+        }
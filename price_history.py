@@ -0,0 +1,339 @@
+"""
+История цен отслеживаемых товаров.
+
+Каждый тик handle_price_update записывает price, marketing_price и желаемую цену
+товара, а set_prices - отправленные в Ozon цены. Последние замеры каждого товара
+лежат в компактном кольцевом буфере в памяти, на диск (SQLite) они сбрасываются
+пачками. При сбросе сразу обновляются агрегаты по минутам, часам и дням, поэтому
+график за любой период строится одним запросом по индексу (offer_id, время).
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import namedtuple
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Размер корзины агрегатов, с
+RESOLUTIONS = {"minute": 60, "hour": 3600, "day": 86400}
+# Сколько хранить сырые замеры и агрегаты, с (дневные агрегаты хранятся всегда)
+RETENTION = {"raw": 14 * 86400, "minute": 90 * 86400, "hour": 2 * 365 * 86400}
+# Какое разрешение брать для запроса, если период не длиннее указанного, с
+AUTO_RESOLUTION = (("raw", 6 * 3600), ("minute", 3 * 86400), ("hour", 120 * 86400))
+PRUNE_INTERVAL_S = 3600
+
+# Точка графика. Для сырых замеров price_min == price_max == price, для агрегатов price - среднее
+HistoryPoint = namedtuple("HistoryPoint", "ts price price_min price_max marketing_price target")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    offer_id TEXT NOT NULL, ts REAL NOT NULL,
+    price REAL NOT NULL, marketing_price REAL NOT NULL, target REAL,
+    PRIMARY KEY (offer_id, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS pushes (
+    offer_id TEXT NOT NULL, ts REAL NOT NULL, price REAL NOT NULL,
+    PRIMARY KEY (offer_id, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollups (
+    resolution TEXT NOT NULL, offer_id TEXT NOT NULL, bucket INTEGER NOT NULL,
+    n INTEGER NOT NULL, price_min REAL, price_max REAL, price_sum REAL,
+    mp_min REAL, mp_max REAL, mp_sum REAL, target_last REAL, last_ts REAL,
+    PRIMARY KEY (resolution, offer_id, bucket)
+) WITHOUT ROWID;
+"""
+
+_UPSERT_ROLLUP = """
+INSERT INTO rollups (resolution, offer_id, bucket, n, price_min, price_max, price_sum,
+                     mp_min, mp_max, mp_sum, target_last, last_ts)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (resolution, offer_id, bucket) DO UPDATE SET
+    n = n + excluded.n,
+    price_min = min(price_min, excluded.price_min),
+    price_max = max(price_max, excluded.price_max),
+    price_sum = price_sum + excluded.price_sum,
+    mp_min = min(mp_min, excluded.mp_min),
+    mp_max = max(mp_max, excluded.mp_max),
+    mp_sum = mp_sum + excluded.mp_sum,
+    target_last = CASE WHEN excluded.last_ts >= last_ts THEN excluded.target_last ELSE target_last END,
+    last_ts = max(last_ts, excluded.last_ts)
+"""
+
+_NAN = float("nan")
+
+
+def default_history_path(client_id: str) -> str:
+    """Файл истории магазина: OZON_HISTORY_DIR или ~/OzonPriceEqualizer/history."""
+    base_dir = os.environ.get("OZON_HISTORY_DIR") or os.path.join(os.path.expanduser("~"), "OzonPriceEqualizer", "history")
+    safe_id = "".join(ch for ch in str(client_id) if ch.isalnum() or ch in "-_") or "default"
+    return os.path.join(base_dir, f"history_{safe_id}.sqlite3")
+
+
+class _Ring:
+    """Кольцевой буфер последних замеров одного товара: по 4 числа на замер в array('d')."""
+    __slots__ = ("size", "values", "start", "count")
+
+    FIELDS = 4  # ts, price, marketing_price, target (nan - нет желаемой цены)
+
+    def __init__(self, size: int):
+        self.size = size
+        self.values = array("d", bytes(8 * self.FIELDS * size))
+        self.start = 0
+        self.count = 0
+
+    def append(self, ts: float, price: float, marketing_price: float, target: float):
+        index = (self.start + self.count) % self.size if self.count < self.size else self.start
+        if self.count < self.size:
+            self.count += 1
+        else:
+            self.start = (self.start + 1) % self.size
+        offset = index * self.FIELDS
+        self.values[offset:offset + self.FIELDS] = array("d", (ts, price, marketing_price, target))
+
+    def oldest_ts(self) -> Optional[float]:
+        return self.values[self.start * self.FIELDS] if self.count else None
+
+    def points(self, start: float, end: float) -> List[HistoryPoint]:
+        result = []
+        for i in range(self.count):
+            offset = ((self.start + i) % self.size) * self.FIELDS
+            ts, price, marketing_price, target = self.values[offset:offset + self.FIELDS]
+            if start <= ts <= end:
+                result.append(HistoryPoint(ts, price, price, price, marketing_price,
+                                           None if target != target else target))
+        return result
+
+
+class PriceHistory:
+    """
+    Хранилище истории цен.
+
+    record() и record_push() только дописывают замер в кольцевой буфер и в очередь
+    на запись, поэтому их можно вызывать на каждом тике из потока GUI. flush()
+    сбрасывает очередь на диск одной транзакцией: по таймеру приложения, при выходе
+    и когда в очереди набралось FLUSH_BATCH замеров. В последнем случае record()
+    вызывает request_flush (приложение ставит flush() в пул потоков), а без него
+    сбрасывает очередь сам. Запросы истории на диск не пишут: еще не сброшенные
+    замеры они добавляют к прочитанному из базы.
+    Буферы и база защищены разными блокировками: пока flush() пишет на диск
+    в фоновом потоке, record() не ждет.
+    """
+
+    RING_SIZE = 120
+    FLUSH_BATCH = 5000
+
+    def __init__(self, db_path: str = ":memory:", ring_size: int = RING_SIZE, clock=time.time,
+                 request_flush: Optional[Callable[[], None]] = None):
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self.ring_size = ring_size
+        self._clock = clock
+        self._request_flush = request_flush
+        self._lock = threading.Lock()  # Кольцевые буферы и очереди на запись
+        self._db_lock = threading.Lock()  # Соединение с базой
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._rings: Dict[str, _Ring] = {}
+        self._pending_samples: List[Tuple] = []
+        self._pending_pushes: List[Tuple] = []
+        self._flush_requested = False  # Сброс полной пачки уже запрошен и еще не выполнен
+        self._closed = False
+        self._last_prune = 0.0
+
+    def record(self, offer_id: str, price: float, marketing_price: float, target: Optional[float] = None,
+               ts: Optional[float] = None):
+        """Записывает замер цен товара."""
+        ts = self._clock() if ts is None else ts
+        with self._lock:
+            ring = self._rings.get(offer_id)
+            if ring is None:
+                ring = self._rings[offer_id] = _Ring(self.ring_size)
+            ring.append(ts, price, marketing_price, _NAN if target is None else target)
+            self._pending_samples.append((offer_id, ts, price, marketing_price, target))
+            should_flush = len(self._pending_samples) >= self.FLUSH_BATCH and not self._flush_requested
+            if should_flush:
+                self._flush_requested = True
+        if should_flush:
+            if self._request_flush is not None:
+                self._request_flush()
+            else:
+                self.flush()
+
+    def record_push(self, offer_id: str, price: float, ts: Optional[float] = None):
+        """Записывает цену, отправленную в Ozon через update_prices."""
+        ts = self._clock() if ts is None else ts
+        with self._lock:
+            self._pending_pushes.append((offer_id, ts, price))
+
+    def forget(self, keep_offer_ids: Iterable[str]):
+        """Освобождает кольцевые буферы товаров, которые больше не отслеживаются (история на диске остается)."""
+        keep = set(keep_offer_ids)
+        with self._lock:
+            for offer_id in [offer_id for offer_id in self._rings if offer_id not in keep]:
+                del self._rings[offer_id]
+
+    @staticmethod
+    def _aggregate(samples: List[Tuple]) -> List[Tuple]:
+        """Сворачивает пачку замеров в строки агрегатов, чтобы обновлять каждую корзину один раз."""
+        buckets: Dict[Tuple, list] = {}
+        for offer_id, ts, price, marketing_price, target in samples:
+            for resolution, width in RESOLUTIONS.items():
+                key = (resolution, offer_id, int(ts // width) * width)
+                agg = buckets.get(key)
+                if agg is None:
+                    buckets[key] = [1, price, price, price, marketing_price, marketing_price,
+                                    marketing_price, target, ts]
+                    continue
+                agg[0] += 1
+                agg[1] = min(agg[1], price)
+                agg[2] = max(agg[2], price)
+                agg[3] += price
+                agg[4] = min(agg[4], marketing_price)
+                agg[5] = max(agg[5], marketing_price)
+                agg[6] += marketing_price
+                if ts >= agg[8]:
+                    agg[7], agg[8] = target, ts
+        return [key + tuple(agg) for key, agg in buckets.items()]
+
+    def flush(self) -> int:
+        """Сбрасывает накопленные замеры на диск. Возвращает число записанных замеров."""
+        with self._db_lock:
+            if self._closed:
+                return 0
+            with self._lock:
+                samples, self._pending_samples = self._pending_samples, []
+                pushes, self._pending_pushes = self._pending_pushes, []
+                self._flush_requested = False
+            if not samples and not pushes:
+                return 0
+            started = time.perf_counter()
+            try:
+                self._conn.execute("BEGIN")
+                self._conn.executemany("INSERT OR REPLACE INTO samples VALUES (?, ?, ?, ?, ?)", samples)
+                self._conn.executemany("INSERT OR REPLACE INTO pushes VALUES (?, ?, ?)", pushes)
+                self._conn.executemany(_UPSERT_ROLLUP, self._aggregate(samples))
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                # Не теряем замеры: вернем их в очередь и попробуем при следующем сбросе
+                with self._lock:
+                    self._pending_samples[:0] = samples
+                    self._pending_pushes[:0] = pushes
+                logger.exception("Не удалось записать историю цен в %s", self.db_path)
+                return 0
+            now = self._clock()
+            if now - self._last_prune >= PRUNE_INTERVAL_S:
+                self._prune(now)
+                self._last_prune = now
+        logger.debug("История цен: записано %d замеров и %d отправок за %.1f мс",
+                     len(samples), len(pushes), (time.perf_counter() - started) * 1000)
+        return len(samples)
+
+    def _prune(self, now: float):
+        """Удаляет сырые замеры и мелкие агрегаты старше срока хранения."""
+        self._conn.execute("DELETE FROM samples WHERE ts < ?", (now - RETENTION["raw"],))
+        for resolution in ("minute", "hour"):
+            self._conn.execute("DELETE FROM rollups WHERE resolution = ? AND bucket < ?",
+                               (resolution, now - RETENTION[resolution]))
+
+    @staticmethod
+    def pick_resolution(start: float, end: float) -> str:
+        """Самое подробное разрешение, при котором график за период остается небольшим."""
+        span = end - start
+        for resolution, max_span in AUTO_RESOLUTION:
+            if span <= max_span:
+                return resolution
+        return "day"
+
+    def query(self, offer_id: str, start: float, end: float,
+              resolution: Optional[str] = None) -> List[HistoryPoint]:
+        """
+        Возвращает точки истории товара за период [start, end] по возрастанию времени.
+        :param resolution: 'raw', 'minute', 'hour', 'day' или None - выбрать по длине периода.
+        """
+        resolution = resolution or self.pick_resolution(start, end)
+        if resolution == "raw":
+            with self._lock:
+                ring = self._rings.get(offer_id)
+                # Если период целиком попадает в кольцевой буфер, диск не нужен
+                if ring is not None and ring.count and ring.oldest_ts() <= start:
+                    return ring.points(start, end)
+            with self._db_lock:
+                rows = self._conn.execute(
+                    "SELECT ts, price, marketing_price, target FROM samples "
+                    "WHERE offer_id = ? AND ts BETWEEN ? AND ?", (offer_id, start, end)
+                ).fetchall()
+                pending = self._pending_for(self._pending_samples, offer_id, start, end)
+            merged = {row[0]: row for row in rows}
+            merged.update((sample[1], sample[1:]) for sample in pending)  # Как INSERT OR REPLACE
+            return [HistoryPoint(ts, price, price, price, marketing_price, target)
+                    for ts, price, marketing_price, target in (merged[ts] for ts in sorted(merged))]
+
+        width = RESOLUTIONS[resolution]
+        first_bucket = int(start // width) * width
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT bucket, n, price_min, price_max, price_sum, mp_min, mp_max, mp_sum, target_last, last_ts "
+                "FROM rollups WHERE resolution = ? AND offer_id = ? AND bucket BETWEEN ? AND ?",
+                (resolution, offer_id, first_bucket, end)
+            ).fetchall()
+            pending = self._pending_for(self._pending_samples, offer_id, first_bucket, end + width)
+        buckets = {row[0]: list(row[1:]) for row in rows}
+        # Несброшенные замеры сворачиваются так же, как при flush() (см. _UPSERT_ROLLUP)
+        for row in self._aggregate(pending):
+            if row[0] != resolution or row[2] > end:
+                continue
+            agg = buckets.get(row[2])
+            if agg is None:
+                buckets[row[2]] = list(row[3:])
+                continue
+            n, price_min, price_max, price_sum, mp_min, mp_max, mp_sum, target_last, last_ts = row[3:]
+            agg[0] += n
+            agg[1], agg[2], agg[3] = min(agg[1], price_min), max(agg[2], price_max), agg[3] + price_sum
+            agg[4], agg[5], agg[6] = min(agg[4], mp_min), max(agg[5], mp_max), agg[6] + mp_sum
+            if last_ts >= agg[8]:
+                agg[7], agg[8] = target_last, last_ts
+        return [HistoryPoint(bucket, agg[3] / agg[0], agg[1], agg[2], agg[6] / agg[0], agg[7])
+                for bucket, agg in sorted(buckets.items())]
+
+    def _pending_for(self, pending: List[Tuple], offer_id: str, start: float, end: float) -> List[Tuple]:
+        """Еще не сброшенные на диск записи товара за период (очереди защищены _lock)."""
+        with self._lock:
+            return [item for item in pending if item[0] == offer_id and start <= item[1] <= end]
+
+    def pushes(self, offer_id: str, start: float, end: float) -> List[Tuple[float, float]]:
+        """Отправленные в Ozon цены товара за период: пары (время, цена)."""
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT ts, price FROM pushes WHERE offer_id = ? AND ts BETWEEN ? AND ?",
+                (offer_id, start, end)
+            ).fetchall()
+            pending = self._pending_for(self._pending_pushes, offer_id, start, end)
+        merged = dict(rows)
+        merged.update((ts, price) for _, ts, price in pending)
+        return sorted(merged.items())
+
+    def offer_ids(self) -> List[str]:
+        """Товары, по которым есть история (для выбора в окне истории)."""
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT offer_id FROM rollups WHERE resolution = 'day'"
+            ).fetchall()
+            with self._lock:
+                pending = {sample[0] for sample in self._pending_samples}
+        return sorted(pending.union(row[0] for row in rows))
+
+    def close(self):
+        """Сбрасывает остаток на диск и закрывает базу (последующие flush() ничего не делают)."""
+        self.flush()
+        with self._db_lock:
+            self._closed = True
+            self._conn.close()
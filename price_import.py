@@ -0,0 +1,245 @@
+"""
+Массовый импорт желаемых цен из CSV/XLSX.
+
+Файл читается построчно (для XLSX - в режиме read_only), поэтому память не растет
+с размером файла. Каждая строка проверяется по индексу загруженного каталога;
+результат применяется к отслеживаемым товарам целиком одним шагом.
+
+Формат: offer_id; желаемая цена; необязательный коэффициент скидки для товара.
+Первая строка может быть заголовком - столбцы тогда ищутся по названиям.
+"""
+import csv
+import io
+import logging
+import math
+import os
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Допустимые значения (как у полей ввода в таблице и coef_spin_box)
+MAX_TARGET_PRICE = 99999
+MIN_COEF = 0.001
+MAX_COEF = 99.99
+# Сколько ошибок хранить для показа пользователю (считаются все)
+MAX_REPORTED_ERRORS = 100
+# Как часто (в строках) сообщать о прогрессе
+PROGRESS_EVERY = 2000
+
+# Названия столбцов в заголовке (в нижнем регистре)
+OFFER_ID_HEADERS = ("offer_id", "артикул", "offer id")
+PRICE_HEADERS = ("price", "target", "target_price", "цена", "желаемая цена", "уровень цены")
+COEF_HEADERS = ("coef", "coefficient", "коэффициент")
+
+# Функция прогресса получает долю от 0 до 1 и возвращает False, если импорт нужно прервать
+ProgressCallback = Callable[[float], bool]
+
+
+class PriceImportError(Exception):
+    """Файл не удалось прочитать (формат, кодировка, нет нужной библиотеки)."""
+
+
+class PriceImportCancelled(Exception):
+    """Импорт прерван пользователем."""
+
+
+class PriceImportResult:
+    """
+    Итог проверки файла импорта.
+
+    Attributes:
+        targets: Желаемые цены по offer_id (при повторах побеждает последняя строка).
+        coefs: Коэффициенты скидки по offer_id для строк, где они указаны.
+        rows: Сколько строк с данными прочитано.
+        error_count: Сколько строк отклонено.
+        errors: Первые MAX_REPORTED_ERRORS ошибок в виде (номер строки, описание).
+        duplicates: Сколько offer_id встретилось в файле повторно.
+    """
+
+    def __init__(self):
+        self.targets: Dict[str, int] = {}
+        self.coefs: Dict[str, float] = {}
+        self.rows = 0
+        self.error_count = 0
+        self.errors: List[Tuple[int, str]] = []
+        self.duplicates = 0
+
+    def add_error(self, line_no: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_no, message))
+
+    def summary(self) -> str:
+        return (f"строк: {self.rows}, принято: {len(self.targets)}, с коэффициентом: {len(self.coefs)}, "
+                f"отклонено: {self.error_count}, повторов: {self.duplicates}")
+
+
+def _parse_number(raw) -> float:
+    """Число из ячейки: поддерживает '1 234,50', неразрывные пробелы и значения из XLSX."""
+    if isinstance(raw, (int, float)):
+        return float(raw)
+    text = str(raw).strip().replace(" ", "").replace(" ", "").replace(",", ".")
+    return float(text)
+
+
+def _is_empty(raw) -> bool:
+    return raw is None or str(raw).strip() == ""
+
+
+def _cell_text(raw) -> str:
+    """Текст ячейки; числовой артикул из XLSX (12345.0) превращается в '12345'."""
+    if isinstance(raw, float) and raw.is_integer():
+        raw = int(raw)
+    return str(raw).strip()
+
+
+def _detect_delimiter(sample: str) -> str:
+    """
+    Разделитель по первой строке файла. Точка с запятой (так сохраняет Excel с русской
+    локалью) и табуляция важнее запятой: запятая может быть десятичным разделителем.
+    """
+    first_line = sample.splitlines()[0] if sample else ""
+    for delimiter in (";", "\t"):
+        if delimiter in first_line:
+            return delimiter
+    return ","
+
+
+def _column_map(header) -> Optional[Tuple[int, int, Optional[int]]]:
+    """Номера столбцов (offer_id, цена, коэффициент) по заголовку или None, если это не заголовок."""
+    names = [str(cell).strip().lower() if cell is not None else "" for cell in header]
+
+    def find(candidates):
+        for index, name in enumerate(names):
+            if name in candidates:
+                return index
+        return None
+
+    offer_col, price_col = find(OFFER_ID_HEADERS), find(PRICE_HEADERS)
+    if offer_col is None or price_col is None:
+        return None
+    return offer_col, price_col, find(COEF_HEADERS)
+
+
+def _iter_csv(path: str, progress: Optional[ProgressCallback]) -> Iterator[Tuple[int, list]]:
+    size = os.path.getsize(path) or 1
+    with open(path, "rb") as raw:
+        text = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+        try:
+            sample = text.read(4096)
+        except UnicodeDecodeError as e:
+            raise PriceImportError(f"Файл должен быть в кодировке UTF-8: {e}") from e
+        text.seek(0)
+        try:
+            for line_no, row in enumerate(csv.reader(text, delimiter=_detect_delimiter(sample)), start=1):
+                if progress is not None and line_no % PROGRESS_EVERY == 0 and not progress(raw.tell() / size):
+                    raise PriceImportCancelled()
+                yield line_no, row
+        except UnicodeDecodeError as e:
+            raise PriceImportError(f"Файл должен быть в кодировке UTF-8: {e}") from e
+
+
+def _iter_xlsx(path: str, progress: Optional[ProgressCallback]) -> Iterator[Tuple[int, list]]:
+    try:
+        import openpyxl  # Необязательная зависимость, нужна только для XLSX
+    except ImportError as e:
+        raise PriceImportError("Для импорта XLSX установите пакет openpyxl или сохраните файл в CSV.") from e
+    try:
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    except Exception as e:
+        raise PriceImportError(f"Не удалось открыть XLSX: {e}") from e
+    try:
+        sheet = workbook.worksheets[0]
+        total = sheet.max_row or 0
+        for line_no, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+            if progress is not None and line_no % PROGRESS_EVERY == 0 and total \
+                    and not progress(min(1.0, line_no / total)):
+                raise PriceImportCancelled()
+            yield line_no, list(row)
+    finally:
+        workbook.close()
+
+
+def iter_rows(path: str, progress: Optional[ProgressCallback] = None) -> Iterator[Tuple[int, list]]:
+    """Построчно читает CSV или XLSX, возвращая пары (номер строки, значения ячеек)."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".xlsx", ".xlsm"):
+        return _iter_xlsx(path, progress)
+    if extension in (".csv", ".txt", ".tsv"):
+        return _iter_csv(path, progress)
+    raise PriceImportError(f"Неподдерживаемый формат файла: {extension or 'без расширения'}")
+
+
+def validate_rows(rows: Iterable[Tuple[int, list]], catalog_offer_ids) -> PriceImportResult:
+    """
+    Проверяет строки импорта по каталогу.
+    :param rows: Пары (номер строки, значения ячеек), например из iter_rows().
+    :param catalog_offer_ids: Множество (или словарь) offer_id загруженного каталога.
+    """
+    result = PriceImportResult()
+    columns = (0, 1, 2)
+    first = True
+    for line_no, row in rows:
+        if first:
+            first = False
+            header_columns = _column_map(row)
+            if header_columns is not None:
+                columns = header_columns
+                continue
+        if not row or all(_is_empty(cell) for cell in row):
+            continue
+        result.rows += 1
+        offer_col, price_col, coef_col = columns
+
+        offer_id = _cell_text(row[offer_col]) if offer_col < len(row) and not _is_empty(row[offer_col]) else ""
+        if not offer_id:
+            result.add_error(line_no, "не указан offer_id")
+            continue
+        if offer_id not in catalog_offer_ids:
+            result.add_error(line_no, f"товара {offer_id} нет в каталоге")
+            continue
+
+        raw_price = row[price_col] if price_col < len(row) else None
+        try:
+            target = math.ceil(_parse_number(raw_price))
+        except (TypeError, ValueError):
+            result.add_error(line_no, f"{offer_id}: некорректная цена '{raw_price}'")
+            continue
+        if not 0 < target <= MAX_TARGET_PRICE:
+            result.add_error(line_no, f"{offer_id}: цена {target} вне диапазона 1..{MAX_TARGET_PRICE}")
+            continue
+
+        coef = None
+        raw_coef = row[coef_col] if coef_col is not None and coef_col < len(row) else None
+        if not _is_empty(raw_coef):
+            try:
+                coef = _parse_number(raw_coef)
+            except (TypeError, ValueError):
+                result.add_error(line_no, f"{offer_id}: некорректный коэффициент '{raw_coef}'")
+                continue
+            if not MIN_COEF <= coef <= MAX_COEF:
+                result.add_error(line_no, f"{offer_id}: коэффициент {coef:g} вне диапазона {MIN_COEF:g}..{MAX_COEF:g}")
+                continue
+
+        if offer_id in result.targets:
+            result.duplicates += 1
+        result.targets[offer_id] = target
+        if coef is not None:
+            result.coefs[offer_id] = coef
+        else:
+            result.coefs.pop(offer_id, None)
+    return result
+
+
+def load_price_file(path: str, catalog_offer_ids,
+                    progress: Optional[ProgressCallback] = None) -> PriceImportResult:
+    """
+    Читает и проверяет файл импорта целиком, ничего не меняя в приложении.
+    Бросает PriceImportError, если файл не читается, и PriceImportCancelled, если
+    progress вернул False.
+    """
+    result = validate_rows(iter_rows(path, progress), catalog_offer_ids)
+    if progress is not None:
+        progress(1.0)
+    logger.info("Импорт цен из %s: %s", os.path.basename(path), result.summary())
+    return result
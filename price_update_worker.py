@@ -1,25 +1,68 @@
+import logging
+import time
+
 from PyQt5 import QtCore
 
+from cycle_profiler import PROFILER
+from circuit_breaker import CircuitOpenError
+from deadline import CYCLE_DEADLINE_S, Deadline, DeadlineExceeded
+from ozon_seller_api import IncompleteDataError
+from worker_pool import Job, JobCancelled
+
+logger = logging.getLogger(__name__)
+
 class PriceUpdateWorkerSignals(QtCore.QObject):
-    """Сигналы для воркера обновления цен."""
-    finished = QtCore.pyqtSignal(list)  # Завершено успешно, передает новый список продуктов
-    error = QtCore.pyqtSignal(str)      # Произошла ошибка
+    """
+    Сигналы для воркера обновления цен. Создаются один раз и переиспользуются
+    всеми циклами; первым аргументом идет поколение цикла.
+    """
+    # Завершено успешно: поколение, новый список продуктов и offer_id, которые запрашивались (None - весь каталог)
+    finished = QtCore.pyqtSignal(int, list, object)
+    error = QtCore.pyqtSignal(int, str)      # Произошла ошибка
 
 class PriceUpdateWorker:
-    """Воркер для фонового обновления цен через API."""
-    def __init__(self, api_client):
+    """
+    Воркер для фонового обновления цен через API.
+    Загружает весь каталог или, если переданы offer_ids, только эти товары.
+    Весь цикл ограничен крайним сроком deadline_s и может быть отменен через токен задачи.
+    """
+    # Лимит времени одного цикла загрузки по умолчанию (в секундах)
+    DEFAULT_DEADLINE_S = CYCLE_DEADLINE_S
+
+    def __init__(self, api_client, signals: PriceUpdateWorkerSignals, offer_ids=None,
+                 deadline_s=DEFAULT_DEADLINE_S):
         self.api_client = api_client
-        self.signals = PriceUpdateWorkerSignals()
+        self.signals = signals
+        self.offer_ids = offer_ids
+        self.deadline_s = deadline_s
 
-    def run(self):
+    @PROFILER.profile("price_fetch")
+    def run(self, job: Job):
         """Выполняет запрос к API и отправляет сигнал о завершении."""
+        started = time.perf_counter()
+        ok = False
+        deadline = Deadline(self.deadline_s, cancel_token=job.token)
         try:
-            print("Фоновое обновление: запрашиваю новые данные о товарах...")
-            # Эта функция может занять время, поэтому она в потоке
-            new_products_list = self.api_client.get_products_with_details()
-            new_products_list.reverse()
-            self.signals.finished.emit(new_products_list)
+            # Эти функции могут занять время, поэтому они в потоке
+            if self.offer_ids is None:
+                logger.info("Фоновое обновление: запрашиваю новые данные о товарах...")
+                new_products_list = self.api_client.get_products_with_details(deadline=deadline, strict=True)
+                new_products_list.reverse()
+            else:
+                logger.info("Фоновое обновление: опрашиваю %d товаров по расписанию...", len(self.offer_ids))
+                new_products_list = self.api_client.get_product_info(
+                    offer_ids=self.offer_ids, fields=self.api_client.DETAIL_FIELDS, deadline=deadline, strict=True
+                )
+            job.token.raise_if_cancelled()
+            self.signals.finished.emit(job.generation, new_products_list, self.offer_ids)
+            ok = True
+        except JobCancelled:
+            raise
         except Exception as e:
             error_message = f"Ошибка фонового обновления: {e}"
-            print(error_message)
-            self.signals.error.emit(error_message)
+            # Для ожидаемых сбоев API трассировка не нужна
+            expected = isinstance(e, (IncompleteDataError, CircuitOpenError, DeadlineExceeded))
+            logger.error(error_message, exc_info=not expected)
+            self.signals.error.emit(job.generation, error_message)
+        finally:
+            self.api_client.metrics.observe_cycle("price_fetch", time.perf_counter() - started, ok)
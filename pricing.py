@@ -0,0 +1,44 @@
+import math
+from typing import Dict, Optional, Tuple
+
+# Допустимое отклонение цены продавца от желаемой цены (±1%)
+PRICE_BAND = 0.01
+
+
+def parse_prices(product: Dict) -> Optional[Tuple[float, float]]:
+    """
+    Извлекает из товара (price, marketing_price) в виде чисел.
+
+    Returns:
+        None, если у товара нет корректной цены. Если нет маркетинговой цены,
+        вместо нее возвращается цена продавца.
+    """
+    try:
+        price = float(product.get('price', 'Цена не найдена'))
+    except (TypeError, ValueError):
+        return None
+    try:
+        marketing_price = float(product.get('marketing_price', 'Цена не найдена'))
+    except (TypeError, ValueError):
+        marketing_price = price
+    return price, marketing_price
+
+
+def final_coef(seller_price: float, market_price: float, coef: float) -> float:
+    """Итоговый коэффициент: доля маркетинговой цены от цены продавца, умноженная на коэффициент скидки."""
+    return (market_price / seller_price) * coef
+
+
+def displayed_price(price: float, marketing_price: float, coef: float) -> int:
+    """Цена, которую видит покупатель (столбец 'Актуальная цена')."""
+    return math.ceil(price * final_coef(price, marketing_price, coef))
+
+
+def seller_price_for(target: float, price: float, marketing_price: float, coef: float) -> int:
+    """Цена продавца, которую нужно записать, чтобы покупатель увидел желаемую цену target (с округлением вверх)."""
+    return math.ceil(float(target / final_coef(price, marketing_price, coef)))
+
+
+def is_out_of_band(price: float, target: float, band: float = PRICE_BAND) -> bool:
+    """Проверяет, вышла ли цена продавца за допустимый коридор вокруг желаемой цены."""
+    return price > target * (1 + band) or price < target * (1 - band)
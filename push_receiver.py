@@ -0,0 +1,311 @@
+"""
+Прием push-уведомлений Ozon об изменениях товаров.
+
+Ozon присылает POST-запрос с JSON-уведомлением на адрес, указанный в личном
+кабинете продавца (обычно через обратный прокси к этому локальному серверу).
+Уведомление проверяется, повторы отбрасываются, а затронутые товары передаются
+в приложение: их цены опрашиваются сразу, не дожидаясь очереди планировщика.
+Плановый опрос при этом остается редкой страховочной сверкой.
+
+Для проверки без Ozon есть тестовый отправитель:
+    python push_receiver.py --port 9110                          # приемник, печатает события
+    python push_receiver.py --send http://127.0.0.1:9110/ --offer-id ART-1
+"""
+import argparse
+import logging
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from PyQt5 import QtCore
+
+import json_backend
+
+logger = logging.getLogger(__name__)
+
+# Проверочный запрос Ozon при подключении уведомлений
+PING_TYPE = "TYPE_PING"
+# Уведомления, после которых нужно перепроверить цену товара
+PRICE_EVENT_TYPES = ("TYPE_PRICE_INDEX_CHANGED", "TYPE_CREATE_OR_UPDATE_ITEM", "TYPE_UPDATE_ITEM")
+# Ограничение размера тела уведомления
+MAX_BODY_BYTES = 64 * 1024
+# Сколько помнить уже принятые уведомления (в секундах и штуках)
+DEDUP_TTL_S = 600
+DEDUP_MAX_ENTRIES = 10000
+
+RECEIVER_NAME = "ozon-price-equalizer"
+RECEIVER_VERSION = "1.0"
+
+
+class PushValidationError(Exception):
+    """Уведомление не прошло проверку. code - код ошибки в формате ответа Ozon."""
+
+    def __init__(self, message: str, code: str = "ERROR_PARAMETER_VALUE_MISSED"):
+        super().__init__(message)
+        self.code = code
+
+
+class PushEvent:
+    """
+    Проверенное уведомление об изменении товара.
+
+    Attributes:
+        message_type: Тип уведомления Ozon.
+        offer_id: Артикул товара, если он есть в уведомлении.
+        product_id: Идентификатор товара Ozon, если он есть в уведомлении.
+        key: Ключ для отбрасывания повторов одного и того же уведомления
+             (None - повтор не отличить от нового изменения, уведомление не отбрасывается).
+    """
+    __slots__ = ("message_type", "offer_id", "product_id", "key")
+
+    def __init__(self, message_type: str, offer_id: Optional[str], product_id: Optional[int],
+                 key: Optional[Tuple]):
+        self.message_type = message_type
+        self.offer_id = offer_id
+        self.product_id = product_id
+        self.key = key
+
+    def __repr__(self):
+        return f"PushEvent({self.message_type}, offer_id={self.offer_id!r}, product_id={self.product_id!r})"
+
+
+def parse_event(payload, seller_id: Optional[str] = None) -> Optional[PushEvent]:
+    """
+    Проверяет уведомление. Возвращает PushEvent для уведомлений об изменении цены
+    и None для остальных типов (их принимаем, но не обрабатываем).
+    :param seller_id: Client-ID магазина; уведомления для другого магазина отклоняются.
+    """
+    if not isinstance(payload, dict):
+        raise PushValidationError("Тело уведомления должно быть JSON-объектом")
+    message_type = payload.get("message_type")
+    if not isinstance(message_type, str) or not message_type:
+        raise PushValidationError("Не указан message_type")
+    event_seller_id = payload.get("seller_id")
+    if seller_id and event_seller_id is not None and str(event_seller_id) != str(seller_id):
+        raise PushValidationError(f"Уведомление для другого магазина: {event_seller_id}",
+                                  code="ERROR_PARAMETER_VALUE_INVALID")
+    if message_type not in PRICE_EVENT_TYPES:
+        return None
+
+    offer_id = payload.get("offer_id")
+    if offer_id is not None and (not isinstance(offer_id, str) or not offer_id.strip()):
+        raise PushValidationError("Некорректный offer_id", code="ERROR_PARAMETER_VALUE_INVALID")
+    product_id = payload.get("product_id")
+    if product_id is not None:
+        try:
+            product_id = int(product_id)
+        except (TypeError, ValueError):
+            raise PushValidationError("Некорректный product_id", code="ERROR_PARAMETER_VALUE_INVALID") from None
+    if not offer_id and not product_id:
+        raise PushValidationError("В уведомлении нет ни offer_id, ни product_id")
+
+    changed_at = payload.get("changed_at") or payload.get("updated_at")
+    # Без времени изменения два разных изменения товара выглядят одинаково: лишний опрос
+    # дешевле пропущенного изменения цены, поэтому такие уведомления не отбрасываем
+    key = (message_type, offer_id, product_id, changed_at) if changed_at else None
+    return PushEvent(message_type, offer_id.strip() if offer_id else None, product_id, key)
+
+
+class _Deduplicator:
+    """Помнит ключи недавних уведомлений: Ozon повторяет доставку, если не получил ответ вовремя."""
+
+    def __init__(self, ttl: float = DEDUP_TTL_S, max_entries: int = DEDUP_MAX_ENTRIES, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._seen: "OrderedDict[Tuple, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_new(self, key: Tuple) -> bool:
+        now = self._clock()
+        with self._lock:
+            while self._seen:
+                oldest_key, seen_at = next(iter(self._seen.items()))
+                if now - seen_at < self.ttl and len(self._seen) < self.max_entries:
+                    break
+                del self._seen[oldest_key]
+            if key in self._seen:
+                return False
+            self._seen[key] = now
+            return True
+
+
+class PushReceiverSignals(QtCore.QObject):
+    """Сигналы приемника (испускаются из потока HTTP-сервера, обрабатываются в основном потоке)."""
+    # Изменились товары: список offer_id и список product_id (если артикула в уведомлении не было)
+    products_changed = QtCore.pyqtSignal(list, list)
+
+
+class PushReceiver:
+    """
+    Обработчик уведомлений без привязки к HTTP: проверяет, отбрасывает повторы
+    и передает затронутые товары в on_change(offer_ids, product_ids).
+    """
+
+    def __init__(self, on_change: Callable[[list, list], None], seller_id: Optional[str] = None,
+                 dedup: Optional[_Deduplicator] = None):
+        self.on_change = on_change
+        self.seller_id = seller_id
+        self._dedup = dedup or _Deduplicator()
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {"accepted": 0, "duplicate": 0, "ignored": 0, "rejected": 0}
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def handle(self, body: bytes) -> Tuple[int, Dict]:
+        """Обрабатывает тело запроса и возвращает (HTTP-статус, JSON-ответ) в формате Ozon."""
+        try:
+            payload = json_backend.loads(body)
+        except ValueError:
+            self._count("rejected")
+            return 400, _error("ERROR_PARAMETER_VALUE_MISSED", "Тело уведомления - не JSON")
+        if isinstance(payload, dict) and payload.get("message_type") == PING_TYPE:
+            return 200, {
+                "version": RECEIVER_VERSION,
+                "name": RECEIVER_NAME,
+                "time": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            }
+        try:
+            event = parse_event(payload, self.seller_id)
+        except PushValidationError as e:
+            self._count("rejected")
+            logger.warning("Отклонено push-уведомление: %s", e)
+            return 400, _error(e.code, str(e))
+        if event is None:
+            self._count("ignored")
+            return 200, {"result": True}
+        # Повтор подтверждаем как успешный, иначе Ozon продолжит повторять доставку
+        if event.key is not None and not self._dedup.is_new(event.key):
+            self._count("duplicate")
+            return 200, {"result": True}
+        self._count("accepted")
+        logger.debug("Push-уведомление: %r", event)
+        self.on_change([event.offer_id] if event.offer_id else [],
+                       [event.product_id] if not event.offer_id else [])
+        return 200, {"result": True}
+
+
+def _error(code: str, message: str) -> Dict:
+    return {"error": {"code": code, "message": message, "details": None}}
+
+
+class _PushRequestHandler(BaseHTTPRequestHandler):
+    receiver: PushReceiver = None
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if not 0 < length <= MAX_BODY_BYTES:
+            self._reply(413 if length > MAX_BODY_BYTES else 400,
+                        _error("ERROR_PARAMETER_VALUE_MISSED", "Некорректная длина тела уведомления"))
+            return
+        status, response = self.receiver.handle(self.rfile.read(length))
+        self._reply(status, response)
+
+    def _reply(self, status: int, response: Dict):
+        body = json_backend.dumps(response)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Не засоряем консоль запросами Ozon
+
+
+def start_push_server(receiver: PushReceiver, port: int,
+                      host: str = "127.0.0.1") -> Optional[ThreadingHTTPServer]:
+    """
+    Запускает HTTP-сервер приема уведомлений (POST на любой путь) в фоновом потоке.
+
+    Returns:
+        Объект сервера или None, если порт занят.
+    """
+    handler = type("PushRequestHandler", (_PushRequestHandler,), {"receiver": receiver})
+    try:
+        server = ThreadingHTTPServer((host, port), handler)
+    except OSError as e:
+        logger.warning("Не удалось запустить прием push-уведомлений на %s:%s: %s", host, port, e)
+        return None
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    logger.info("Push-уведомления принимаются по адресу http://%s:%s/", host, server.server_address[1])
+    return server
+
+
+def send_event(url: str, message_type: str, timeout: float = 5.0, **fields) -> Tuple[int, Dict]:
+    """
+    Тестовый отправитель: шлет уведомление так же, как Ozon, и возвращает (статус, ответ).
+    Пример: send_event(url, "TYPE_CREATE_OR_UPDATE_ITEM", offer_id="ART-1", seller_id=123)
+    """
+    body = json_backend.dumps({"message_type": message_type, **fields})
+    request = urllib.request.Request(url, data=body, method="POST",
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, json_backend.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json_backend.loads(e.read())
+
+
+def send_price_changes(url: str, offer_ids: Iterable[str], seller_id=None) -> Dict[int, int]:
+    """Тестовый отправитель: шлет по уведомлению на каждый offer_id. Возвращает счетчик статусов ответа."""
+    statuses: Dict[int, int] = {}
+    for offer_id in offer_ids:
+        fields = {"offer_id": offer_id, "changed_at": datetime.now(timezone.utc).isoformat()}
+        if seller_id is not None:
+            fields["seller_id"] = seller_id
+        status, _ = send_event(url, "TYPE_CREATE_OR_UPDATE_ITEM", **fields)
+        statuses[status] = statuses.get(status, 0) + 1
+    return statuses
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Приемник push-уведомлений Ozon и тестовый отправитель.")
+    parser.add_argument("--port", type=int, default=9110, help="Порт приемника")
+    parser.add_argument("--host", default="127.0.0.1", help="Адрес приемника")
+    parser.add_argument("--seller-id", help="Принимать уведомления только этого Client-ID")
+    parser.add_argument("--send", metavar="URL", help="Не принимать, а отправить уведомления на URL")
+    parser.add_argument("--offer-id", action="append", default=[], help="Артикул для отправки (можно несколько)")
+    parser.add_argument("--ping", action="store_true", help="Отправить TYPE_PING")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    from app_logging import setup_logging
+
+    args = parse_args(argv)
+    setup_logging()
+    if args.send:
+        if args.ping:
+            print(send_event(args.send, PING_TYPE, time=datetime.now(timezone.utc).isoformat()))
+        print(send_price_changes(args.send, args.offer_id, args.seller_id))
+        return 0
+
+    def on_change(offer_ids, product_ids):
+        print(f"offer_id: {offer_ids}, product_id: {product_ids}", flush=True)
+
+    server = start_push_server(PushReceiver(on_change, args.seller_id), args.port, args.host)
+    if server is None:
+        return 1
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
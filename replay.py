@@ -0,0 +1,352 @@
+"""
+Прогон (бэктест) правил ценообразования по записанной истории цен.
+
+Для каждого замера отслеживаемого товара повторяет логику приложения:
+проверку коридора из handle_price_update и формулу новой цены из set_prices
+(pricing.is_out_of_band, pricing.seller_price_for). Сколько записей цен сделало бы
+правило и насколько цена для покупателя отклонялась бы от желаемой, считается
+сразу для нескольких вариантов (коэффициент, ширина коридора) за один проход.
+
+Моделирование контрфактическое: цена продавца меняется только записями
+правила, а доля маркетинговой цены от цены продавца (софинансирование Ozon)
+берется из записи. Моменты замеров берутся из записи как есть.
+
+Если установлен numpy, каждый тик считается векторно по всем товарам сразу.
+
+Пример:
+    python replay.py --history ~/OzonPriceEqualizer/history/history_123.sqlite3 --days 7 \\
+        --coef 0.852 0.86 --band 0.01 0.02
+"""
+import argparse
+import csv
+import math
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import pricing
+
+try:
+    import numpy
+except ImportError:  # numpy - необязательная зависимость, без нее работает чистый Python
+    numpy = None
+
+_NAN = float("nan")
+
+# Гистограмма |отклонения| в процентах для перцентилей: корзины по 0.01% до 50%
+ERROR_BIN_PCT = 0.01
+ERROR_BINS = 5000
+
+# Тик: (время, цены продавца, маркетинговые цены, желаемые цены) в порядке offer_ids;
+# nan - в этот момент товар не опрашивался (или не отслеживался)
+Tick = Tuple[float, Sequence[float], Sequence[float], Sequence[float]]
+
+TRIGGERS = ("seller", "displayed")
+
+
+class ReplayPolicy:
+    """
+    Вариант правила ценообразования.
+
+    Attributes:
+        coef: Коэффициент скидки (как coef_spin_box).
+        band: Допустимое отклонение от желаемой цены (PRICE_BAND в pricing).
+        trigger: Что сравнивается с желаемой ценой: 'seller' - цена продавца, как
+            в handle_price_update сейчас; 'displayed' - цена для покупателя.
+    """
+
+    def __init__(self, coef: float = 0.852, band: float = pricing.PRICE_BAND, trigger: str = "seller"):
+        if trigger not in TRIGGERS:
+            raise ValueError(f"Неизвестный trigger: {trigger}")
+        self.coef = coef
+        self.band = band
+        self.trigger = trigger
+
+    def __str__(self):
+        return f"coef={self.coef:g} band=±{self.band * 100:g}% trigger={self.trigger}"
+
+
+class ReplayReport:
+    """Итоги прогона одного варианта правила."""
+
+    def __init__(self, policy: ReplayPolicy, offer_count: int):
+        self.policy = policy
+        self.ticks = 0
+        self.observations = 0  # Замеров отслеживаемых товаров (товар x тик)
+        self.writes = 0
+        self.writes_per_offer = [0] * offer_count
+        self.error_sum = 0.0  # Сумма |отклонения| цены для покупателя от желаемой, %
+        self.error_max = 0.0
+        self.error_histogram = [0] * (ERROR_BINS + 1)
+        self.elapsed = 0.0
+
+    @property
+    def offers_written(self) -> int:
+        return sum(1 for count in self.writes_per_offer if count)
+
+    @property
+    def write_share(self) -> float:
+        return self.writes / self.observations if self.observations else 0.0
+
+    @property
+    def mean_error_pct(self) -> float:
+        return self.error_sum / self.observations if self.observations else 0.0
+
+    def error_percentile(self, q: float) -> float:
+        """
+        Приближенный перцентиль |отклонения| (точность ERROR_BIN_PCT).
+        Для отклонений больше ERROR_BINS * ERROR_BIN_PCT возвращает максимум - оценку сверху.
+        """
+        if not self.observations:
+            return 0.0
+        rank = q * self.observations
+        seen = 0
+        for index, count in enumerate(self.error_histogram):
+            seen += count
+            if seen >= rank:
+                return self.error_max if index == ERROR_BINS else min(index * ERROR_BIN_PCT, self.error_max)
+        return self.error_max
+
+    def render_text(self) -> str:
+        rate = self.observations / self.elapsed if self.elapsed else 0.0
+        return (
+            f"{self.policy}\n"
+            f"  тиков: {self.ticks}, замеров: {self.observations}\n"
+            f"  записей цен: {self.writes} ({self.write_share * 100:.1f}% замеров, товаров: {self.offers_written})\n"
+            f"  |отклонение| цены для покупателя, %: среднее {self.mean_error_pct:.2f}, "
+            f"медиана {self.error_percentile(0.5):.2f}, p95 {self.error_percentile(0.95):.2f}, "
+            f"макс {self.error_max:.2f}\n"
+            f"  скорость: {rate:,.0f} замеров/с"
+        )
+
+
+def _replay_python(ticks: Iterable[Tick], offer_count: int, policies: List[ReplayPolicy],
+                   reports: List[ReplayReport]):
+    sim_prices = [[_NAN] * offer_count for _ in policies]
+    for ts, prices, marketing_prices, targets in ticks:
+        for report in reports:
+            report.ticks += 1
+        for i in range(offer_count):
+            price, target = prices[i], targets[i]
+            if price != price or target != target or price <= 0:
+                continue
+            ratio = marketing_prices[i] / price
+            for policy, report, sim in zip(policies, reports, sim_prices):
+                seller_price = price if sim[i] != sim[i] else sim[i]
+                displayed = pricing.displayed_price(seller_price, seller_price * ratio, policy.coef)
+                error = abs(displayed - target) / target * 100
+                report.observations += 1
+                report.error_sum += error
+                report.error_max = max(report.error_max, error)
+                report.error_histogram[min(ERROR_BINS, int(error / ERROR_BIN_PCT))] += 1
+                checked = seller_price if policy.trigger == "seller" else displayed
+                if pricing.is_out_of_band(checked, target, policy.band):
+                    # Та же формула, что в set_prices
+                    report.writes += 1
+                    report.writes_per_offer[i] += 1
+                    seller_price = pricing.seller_price_for(target, seller_price, seller_price * ratio, policy.coef)
+                sim[i] = seller_price
+
+
+def _replay_numpy(ticks: Iterable[Tick], offer_count: int, policies: List[ReplayPolicy],
+                  reports: List[ReplayReport]):
+    np = numpy
+    sim_prices = [np.full(offer_count, np.nan) for _ in policies]
+    writes_per_offer = [np.zeros(offer_count, dtype=np.int64) for _ in policies]
+    histograms = [np.zeros(ERROR_BINS + 1, dtype=np.int64) for _ in policies]
+    for ts, prices, marketing_prices, targets in ticks:
+        prices = np.asarray(prices, dtype=np.float64)
+        marketing_prices = np.asarray(marketing_prices, dtype=np.float64)
+        targets = np.asarray(targets, dtype=np.float64)
+        observed = np.flatnonzero((prices > 0) & ~np.isnan(targets))
+        price, target = prices[observed], targets[observed]
+        ratio = marketing_prices[observed] / price
+        for policy, report, sim, offer_writes, histogram in zip(
+                policies, reports, sim_prices, writes_per_offer, histograms):
+            report.ticks += 1
+            if not observed.size:
+                continue
+            seller_price = sim[observed]
+            seller_price = np.where(np.isnan(seller_price), price, seller_price)
+            # Порядок операций как в pricing.final_coef, чтобы округления совпадали с Python-версией
+            coef = (seller_price * ratio) / seller_price * policy.coef
+            displayed = np.ceil(seller_price * coef)  # pricing.displayed_price
+            error = np.abs(displayed - target) / target * 100
+            report.observations += observed.size
+            report.error_sum += float(error.sum())
+            report.error_max = max(report.error_max, float(error.max()))
+            histogram += np.bincount(np.minimum(ERROR_BINS, (error / ERROR_BIN_PCT).astype(np.int64)),
+                                     minlength=ERROR_BINS + 1)
+            checked = seller_price if policy.trigger == "seller" else displayed
+            out = (checked > target * (1 + policy.band)) | (checked < target * (1 - policy.band))
+            report.writes += int(out.sum())
+            offer_writes[observed[out]] += 1
+            seller_price = np.where(out, np.ceil(target / coef), seller_price)  # pricing.seller_price_for
+            sim[observed] = seller_price
+    for report, offer_writes, histogram in zip(reports, writes_per_offer, histograms):
+        report.writes_per_offer = offer_writes.tolist()
+        report.error_histogram = histogram.tolist()
+
+
+def replay(ticks: Iterable[Tick], offer_ids: Sequence[str], policies: Sequence[ReplayPolicy],
+           use_numpy: Optional[bool] = None) -> List[ReplayReport]:
+    """
+    Прогоняет варианты правила по тикам за один проход.
+    :param use_numpy: None - использовать numpy, если он установлен.
+    """
+    policies = list(policies)
+    reports = [ReplayReport(policy, len(offer_ids)) for policy in policies]
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    if use_numpy and numpy is None:
+        raise RuntimeError("numpy не установлен")
+    started = time.perf_counter()
+    (_replay_numpy if use_numpy else _replay_python)(ticks, len(offer_ids), policies, reports)
+    elapsed = time.perf_counter() - started
+    for report in reports:
+        report.elapsed = elapsed
+    return reports
+
+
+def ticks_from_history(db_path: str, start: float, end: float, step: float = 60.0,
+                       targets: Optional[Dict[str, float]] = None) -> Tuple[List[str], Iterator[Tick]]:
+    """
+    Тики из базы истории цен (price_history). Замеры группируются по шагу step секунд.
+    :param targets: Желаемые цены вместо записанных (например, новые цены из импорта).
+    :return: (offer_ids, итератор тиков). Тики читаются из базы потоком.
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    offer_ids = [row[0] for row in conn.execute(
+        "SELECT DISTINCT offer_id FROM samples WHERE ts BETWEEN ? AND ? ORDER BY offer_id", (start, end))]
+    index = {offer_id: i for i, offer_id in enumerate(offer_ids)}
+    override = [_NAN] * len(offer_ids)
+    if targets:
+        for offer_id, target in targets.items():
+            if offer_id in index:
+                override[index[offer_id]] = float(target)
+
+    def generate():
+        try:
+            rows = conn.execute(
+                "SELECT CAST(ts / ? AS INTEGER) AS bucket, offer_id, price, marketing_price, target "
+                "FROM samples WHERE ts BETWEEN ? AND ? ORDER BY bucket", (step, start, end))
+            current = None
+            prices = marketing_prices = tick_targets = None
+            for bucket, offer_id, price, marketing_price, target in rows:
+                if bucket != current:
+                    if current is not None:
+                        yield current * step, prices, marketing_prices, tick_targets
+                    current = bucket
+                    prices = [_NAN] * len(offer_ids)
+                    marketing_prices = [_NAN] * len(offer_ids)
+                    tick_targets = [_NAN] * len(offer_ids)
+                i = index[offer_id]
+                prices[i] = price
+                marketing_prices[i] = marketing_price
+                if targets:
+                    tick_targets[i] = override[i]
+                else:
+                    tick_targets[i] = _NAN if target is None else target
+            if current is not None:
+                yield current * step, prices, marketing_prices, tick_targets
+        finally:
+            conn.close()
+
+    return offer_ids, generate()
+
+
+def ticks_from_exports(paths: Sequence[str]) -> Tuple[List[str], Iterator[Tick]]:
+    """
+    Тики из CSV-снимков catalog_export (один файл - один тик, по порядку имен файлов).
+    Учитываются только отслеживаемые на момент снимка товары (с заполненным target).
+    """
+    paths = sorted(paths)
+
+    def read(path):
+        with open(path, encoding="utf-8-sig", newline="") as file:
+            for row in csv.DictReader(file, delimiter=";"):
+                if row.get("target"):
+                    yield row
+
+    offer_ids = sorted({row["offer_id"] for path in paths for row in read(path)})
+    index = {offer_id: i for i, offer_id in enumerate(offer_ids)}
+
+    def generate():
+        for path in paths:
+            prices = [_NAN] * len(offer_ids)
+            marketing_prices = [_NAN] * len(offer_ids)
+            targets = [_NAN] * len(offer_ids)
+            exported_at = None
+            for row in read(path):
+                i = index[row["offer_id"]]
+                prices[i] = float(row["price"])
+                marketing_prices[i] = float(row["marketing_price"])
+                targets[i] = float(row["target"])
+                exported_at = exported_at or row.get("exported_at")
+            ts = datetime.fromisoformat(exported_at).timestamp() if exported_at else os.path.getmtime(path)
+            yield ts, prices, marketing_prices, targets
+
+    return offer_ids, generate()
+
+
+def synthetic_ticks(offer_count: int, tick_count: int, seed: int = 1) -> Tuple[List[str], Iterator[Tick]]:
+    """Случайные тики для замера скорости: все товары опрашиваются на каждом тике."""
+    import random
+    rnd = random.Random(seed)
+    offer_ids = [f"SYN-{i}" for i in range(offer_count)]
+    base = [rnd.uniform(500, 5000) for _ in range(offer_count)]
+    targets = [math.ceil(price) for price in base]
+
+    def generate():
+        ratio = [0.93] * offer_count
+        for tick in range(tick_count):
+            # Софинансирование Ozon иногда меняется у части товаров
+            for i in rnd.sample(range(offer_count), max(1, offer_count // 100)):
+                ratio[i] = rnd.uniform(0.8, 1.0)
+            yield tick * 60.0, base, [price * r for price, r in zip(base, ratio)], targets
+
+    return offer_ids, generate()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Бэктест правил ценообразования по записанной истории цен.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--history", help="База истории цен (history_<client_id>.sqlite3)")
+    source.add_argument("--exports", nargs="+", help="CSV-снимки catalog_export")
+    source.add_argument("--synthetic", nargs=2, type=int, metavar=("OFFERS", "TICKS"),
+                        help="Случайные данные для замера скорости")
+    parser.add_argument("--days", type=float, default=7.0, help="Сколько последних дней истории прогнать")
+    parser.add_argument("--step", type=float, default=60.0, help="Шаг группировки замеров в тики, с")
+    parser.add_argument("--coef", type=float, nargs="+", default=[0.852], help="Коэффициенты скидки")
+    parser.add_argument("--band", type=float, nargs="+", default=[pricing.PRICE_BAND],
+                        help="Ширина коридора (0.01 = ±1%%)")
+    parser.add_argument("--trigger", choices=TRIGGERS, nargs="+", default=["seller"],
+                        help="С чем сравнивать желаемую цену")
+    parser.add_argument("--no-numpy", action="store_true", help="Считать на чистом Python")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.history:
+        end = time.time()
+        offer_ids, ticks = ticks_from_history(args.history, end - args.days * 86400, end, args.step)
+    elif args.exports:
+        offer_ids, ticks = ticks_from_exports(args.exports)
+    else:
+        offer_ids, ticks = synthetic_ticks(*args.synthetic)
+    policies = [ReplayPolicy(coef, band, trigger)
+                for coef in args.coef for band in args.band for trigger in args.trigger]
+    reports = replay(ticks, offer_ids, policies, use_numpy=False if args.no_numpy else None)
+    print(f"Товаров: {len(offer_ids)}, вариантов: {len(policies)}, "
+          f"расчет: {'numpy' if numpy is not None and not args.no_numpy else 'Python'}")
+    for report in reports:
+        print(report.render_text())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""
+Нагрузочный прогон (soak test) цикла синхронизации и перестроения таблицы.
+
+Прогоняет тысячи циклов PriceUpdateWorker -> handle_price_update и периодически
+перестраивает таблицу через make_table на фейковом клиенте API, следя за
+RSS процесса, приростом памяти по tracemalloc, числом живых QObject и потоков.
+Если прирост после прогрева превышает заданный бюджет, завершается с кодом 1.
+
+Пример:
+    python soak_harness.py --cycles 5000 --products 2000 --rss-budget-mb 50
+"""
+import argparse
+import gc
+import math
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+
+# Окно не показываем, сервер метрик не поднимаем
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ.setdefault("OZON_METRICS_PORT", "0")
+
+from PyQt5 import QtCore, QtWidgets
+
+from api_metrics import ApiMetrics
+from circuit_breaker import CircuitBreaker
+
+
+class FakeOzonSellerAPI:
+    """
+    Фейковый клиент с тем же интерфейсом, что и OzonSellerAPI, без сети.
+    Цены товаров случайно блуждают, запись цен принимается и сразу применяется.
+    """
+    DETAIL_FIELDS = ("id", "offer_id", "name", "price", "marketing_price", "statuses", "primary_image")
+
+    def __init__(self, product_count: int, volatility: float = 0.02, seed: int = 1):
+        self._random = random.Random(seed)
+        self.volatility = volatility
+        self.metrics = ApiMetrics()
+        self._breaker = CircuitBreaker("fake")
+        self.prices = {f"SOAK-{i}": 1000.0 + i for i in range(product_count)}
+
+    def breaker_for(self, endpoint):
+        return self._breaker
+
+    def is_degraded(self):
+        return False
+
+    def _product(self, index: int, offer_id: str):
+        price = self.prices[offer_id]
+        return {
+            "product_id": index, "id": index, "offer_id": offer_id, "name": f"Товар {index}",
+            "price": f"{price:.2f}", "marketing_price": f"{price * 0.93:.2f}",
+            "statuses": {"status_description": ""}, "primary_image": [],
+        }
+
+    def _drift(self):
+        for offer_id in self._random.sample(list(self.prices), max(1, len(self.prices) // 20)):
+            self.prices[offer_id] *= 1 + self._random.uniform(-self.volatility, self.volatility)
+
+    def get_products_with_details(self, detail_fields=DETAIL_FIELDS, deadline=None, strict=False):
+        self._drift()
+        return [self._product(i, offer_id) for i, offer_id in enumerate(self.prices)]
+
+    def get_product_info(self, product_ids=None, offer_ids=None, skus=None, fields=None,
+                         deadline=None, strict=False):
+        self._drift()
+        index = {offer_id: i for i, offer_id in enumerate(self.prices)}
+        return [self._product(index[offer_id], offer_id) for offer_id in offer_ids or [] if offer_id in index]
+
+    def update_prices(self, price_data, deadline=None):
+        for item in price_data:
+            self.prices[item["offer_id"]] = float(item["price"])
+        return {"successful": [{"offer_id": item["offer_id"], "updated": True} for item in price_data],
+                "failed": []}
+
+
+def current_rss_mb() -> float:
+    """Текущий RSS процесса в МиБ (psutil, /proc или пиковое значение как запасной вариант)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2 ** 20
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        return 0.0
+
+
+def live_qobjects() -> int:
+    """Число живых Python-обёрток QObject (включая виджеты в ячейках таблицы)."""
+    gc.collect()
+    return sum(1 for obj in gc.get_objects() if isinstance(obj, QtCore.QObject))
+
+
+def sample(label, cycle):
+    return {
+        "label": label,
+        "cycle": cycle,
+        "rss_mb": current_rss_mb(),
+        "traced_mb": tracemalloc.get_traced_memory()[0] / 2 ** 20,
+        "qobjects": live_qobjects(),
+        "threads": threading.active_count(),
+    }
+
+
+def wait_for_cycle(app, window, timeout: float) -> bool:
+    """Крутит цикл событий Qt, пока не завершится текущий цикл обновления."""
+    end = time.monotonic() + timeout
+    while window.is_update_running:
+        if time.monotonic() > end:
+            return False
+        app.processEvents(QtCore.QEventLoop.AllEvents, 10)
+        time.sleep(0.0005)
+    flush_deleted(app)
+    return True
+
+
+def flush_deleted(app):
+    """
+    Обрабатывает отложенные удаления (deleteLater). Вложенный processEvents их не
+    выполняет, а в настоящем цикле событий app.exec_() они выполняются сами.
+    """
+    app.processEvents()
+    app.sendPostedEvents(None, QtCore.QEvent.DeferredDelete)
+
+
+def run(args) -> int:
+    import main  # Импортируем здесь, чтобы переменные окружения выше уже были заданы
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    window = main.Window()
+    fake_api = FakeOzonSellerAPI(args.products, seed=args.seed)
+    window.api_client = fake_api
+
+    offer_ids = list(fake_api.prices)
+    tracked_count = int(len(offer_ids) * args.tracked_share)
+    window.tracked_products = {offer_id: math.ceil(fake_api.prices[offer_id]) for offer_id in offer_ids[:tracked_count]}
+    window.poll_scheduler.sync_tracked(window.tracked_products)
+    window.detailed_products = fake_api.get_products_with_details()
+    window.make_table(window.detailed_products)
+
+    tracemalloc.start()
+    samples = []
+    baseline = None
+    started = time.perf_counter()
+    for cycle in range(1, args.cycles + 1):
+        if cycle % args.full_every == 0:
+            window.start_price_update()
+        else:
+            window.poll_scheduler.mark_urgent(window.tracked_products)
+            window.start_price_update(window.poll_scheduler.pop_due() or offer_ids[:1])
+        if not wait_for_cycle(app, window, args.cycle_timeout):
+            print(f"Цикл {cycle} не завершился за {args.cycle_timeout} с")
+            return 1
+        if cycle % args.table_every == 0:
+            window.make_table(window.detailed_products)
+            flush_deleted(app)
+
+        if cycle == args.warmup:
+            baseline = sample("baseline", cycle)
+            baseline_snapshot = tracemalloc.take_snapshot()
+            samples.append(baseline)
+        elif cycle % args.sample_every == 0 or cycle == args.cycles:
+            samples.append(sample("sample", cycle))
+            last = samples[-1]
+            print(f"[{cycle}/{args.cycles}] RSS {last['rss_mb']:.1f} МиБ, tracemalloc {last['traced_mb']:.1f} МиБ, "
+                  f"QObject {last['qobjects']}, потоков {last['threads']}")
+    elapsed = time.perf_counter() - started
+
+    if baseline is None:
+        print("Слишком мало циклов: прогрев не закончился, сравнивать не с чем.")
+        return 1
+
+    final = samples[-1]
+    growth = {key: final[key] - baseline[key] for key in ("rss_mb", "traced_mb", "qobjects", "threads")}
+    budgets = {"rss_mb": args.rss_budget_mb, "traced_mb": args.tracemalloc_budget_mb,
+               "qobjects": args.qobject_budget, "threads": args.thread_budget}
+
+    print(f"\nПрогнано {args.cycles} циклов за {elapsed:.1f} с ({args.cycles / elapsed:.1f} цикл/с)")
+    print("Показатель      | после прогрева | в конце | прирост | бюджет")
+    failed = False
+    for key, budget in budgets.items():
+        over = growth[key] > budget
+        failed = failed or over
+        print(f"{key:15s} | {baseline[key]:14.1f} | {final[key]:7.1f} | {growth[key]:7.1f} | {budget:g}"
+              f"{'  <-- ПРЕВЫШЕН' if over else ''}")
+
+    if failed or args.verbose:
+        print("\nНаибольший прирост памяти по строкам кода:")
+        for stat in tracemalloc.take_snapshot().compare_to(baseline_snapshot, "lineno")[:15]:
+            print(f"  {stat}")
+
+    window.worker_pool.shutdown()
+    return 1 if failed else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Soak-тест цикла синхронизации и таблицы на фейковом API.")
+    parser.add_argument("--cycles", type=int, default=2000, help="Сколько циклов обновления прогнать")
+    parser.add_argument("--products", type=int, default=1000, help="Размер фейкового каталога")
+    parser.add_argument("--tracked-share", type=float, default=0.3, help="Доля отслеживаемых товаров")
+    parser.add_argument("--full-every", type=int, default=10, help="Каждый N-й цикл - полная загрузка каталога")
+    parser.add_argument("--table-every", type=int, default=50, help="Каждый N-й цикл перестраивать таблицу")
+    parser.add_argument("--sample-every", type=int, default=250, help="Как часто снимать показатели")
+    parser.add_argument("--warmup", type=int, default=100, help="Циклы прогрева до снятия базовых показателей")
+    parser.add_argument("--cycle-timeout", type=float, default=30.0, help="Лимит времени одного цикла, с")
+    parser.add_argument("--rss-budget-mb", type=float, default=50.0, help="Допустимый прирост RSS, МиБ")
+    parser.add_argument("--tracemalloc-budget-mb", type=float, default=10.0,
+                        help="Допустимый прирост памяти по tracemalloc, МиБ")
+    parser.add_argument("--qobject-budget", type=int, default=50, help="Допустимый прирост числа QObject")
+    parser.add_argument("--thread-budget", type=int, default=0, help="Допустимый прирост числа потоков")
+    parser.add_argument("--seed", type=int, default=1, help="Зерно генератора цен")
+    parser.add_argument("--verbose", action="store_true", help="Всегда печатать топ прироста памяти")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(run(parse_args()))
@@ -0,0 +1,161 @@
+"""
+Замер времени запуска приложения.
+
+STARTUP.track_imports() подменяет builtins.__import__ и записывает, сколько занял
+каждый import в модуле main, который загрузил новые модули (вместе с их
+зависимостями). Ленивые импорты внутри методов окна тоже попадают в отчет. Вехи запуска
+(создание окна, первая отрисовка, загрузка настроек, первые данные) отмечаются
+через STARTUP.mark(). Когда появляются первые данные, отчет пишется в лог, а замер
+импортов выключается.
+
+Проверка без GUI (например, перед сборкой релиза):
+    python startup_timing.py --budget-ms 1500
+Запускает окно на offscreen-платформе, печатает отчет и завершается с кодом 1,
+если первая отрисовка случилась позже бюджета.
+"""
+import argparse
+import builtins
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Сколько самых долгих импортов показывать в отчете
+TOP_IMPORTS = 25
+# Импорты из каких модулей замеряются (main.py запускается как __main__)
+TRACKED_IMPORTERS = ("__main__", "main")
+
+# Вехи запуска в порядке отчета и их подписи
+MILESTONES = (
+    ("imports", "импорт модулей main"),
+    ("window_created", "окно создано"),
+    ("first_paint", "первая отрисовка"),
+    ("settings_loaded", "настройки загружены"),
+    ("start_clicked", "нажата кнопка «Начать»"),
+    ("first_data", "первые данные в таблице"),
+)
+
+
+class StartupTimer:
+    """Вехи запуска и время импорта модулей, в секундах от создания объекта (начала запуска)."""
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self.started = clock()
+        self.marks: Dict[str, float] = {}
+        self.imports: List[Tuple[str, float]] = []
+        self._original_import = None
+        self._lock = threading.Lock()
+
+    def mark(self, name: str) -> bool:
+        """Отмечает веху (повторные отметки игнорируются). Возвращает True при первой отметке."""
+        with self._lock:
+            if name in self.marks:
+                return False
+            self.marks[name] = self._clock() - self.started
+        return True
+
+    def track_imports(self):
+        """Включает замер импортов (повторный вызов ничего не делает)."""
+        if self._original_import is not None:
+            return
+        original_import = self._original_import = builtins.__import__
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            if not globals or globals.get("__name__") not in TRACKED_IMPORTERS:
+                return original_import(name, globals, locals, fromlist, level)
+            loaded_before = len(sys.modules)
+            started = self._clock()
+            try:
+                return original_import(name, globals, locals, fromlist, level)
+            finally:
+                # Зависимости входят во время импорта; уже загруженные модули не считаем
+                if len(sys.modules) > loaded_before:
+                    label = f"{name} ({', '.join(fromlist)})" if fromlist and fromlist != ("*",) else name
+                    with self._lock:
+                        self.imports.append((label, self._clock() - started))
+
+        builtins.__import__ = timed_import
+
+    def stop_tracking(self):
+        """Возвращает стандартный импорт."""
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def report(self, top: int = TOP_IMPORTS) -> str:
+        with self._lock:
+            marks = dict(self.marks)
+            imports = list(self.imports)
+        lines = ["Время запуска (от начала импорта main):"]
+        for name, title in MILESTONES:
+            if name in marks:
+                lines.append(f"  {title}: {marks[name] * 1000:.0f} мс")
+        if "start_clicked" in marks and "first_data" in marks:
+            lines.append(f"  загрузка каталога после «Начать»: "
+                         f"{(marks['first_data'] - marks['start_clicked']) * 1000:.0f} мс")
+        if imports:
+            total = sum(duration for _, duration in imports)
+            lines.append(f"Импорт модулей: {len(imports)} шт., {total * 1000:.0f} мс; самые долгие:")
+            for label, duration in sorted(imports, key=lambda item: item[1], reverse=True)[:top]:
+                lines.append(f"  {duration * 1000:8.1f} мс  {label}")
+        return "\n".join(lines)
+
+    def log_report(self):
+        logger.info("%s", self.report())
+
+
+# Общий замер запуска приложения
+STARTUP = StartupTimer()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Замер времени запуска окна приложения.")
+    parser.add_argument("--budget-ms", type=float, default=0.0,
+                        help="Бюджет до первой отрисовки, мс (0 - без проверки)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Сколько ждать загрузки настроек, с")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    # Окно не показываем, сервер метрик не поднимаем
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    os.environ.setdefault("OZON_METRICS_PORT", "0")
+    # Скриптом этот файл загружен как __main__, а main.py отмечает вехи в модуле startup_timing
+    import startup_timing
+    timer = startup_timing.STARTUP
+    timer.track_imports()
+
+    # Через importlib, а не import: иначе весь main попал бы в отчет одной строкой
+    app_main = importlib.import_module("main")
+    from PyQt5 import QtWidgets
+
+    app = QtWidgets.QApplication(sys.argv[:1])
+    window = app_main.Window()
+    window.show()
+    deadline = time.monotonic() + args.timeout
+    while "settings_loaded" not in timer.marks and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.005)
+    timer.stop_tracking()
+    print(timer.report())
+
+    window.worker_pool.shutdown()
+    first_paint = timer.marks.get("first_paint")
+    if first_paint is None:
+        print("Окно так и не было отрисовано.")
+        return 1
+    if args.budget_ms and first_paint * 1000 > args.budget_ms:
+        print(f"Первая отрисовка {first_paint * 1000:.0f} мс - больше бюджета {args.budget_ms:.0f} мс.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from api_metrics import ApiMetrics
+
+
+class StatsPanel(QtWidgets.QDialog):
+    """
+    Окно со сводкой метрик API и циклов синхронизации.
+    Обновляется по таймеру, пока открыто.
+    """
+    REFRESH_INTERVAL_MS = 2000
+
+    def __init__(self, metrics: ApiMetrics, parent=None):
+        super().__init__(parent)
+        self.metrics = metrics
+        self.setWindowTitle("Статистика API")
+        self.resize(760, 360)
+
+        self.text_view = QtWidgets.QPlainTextEdit(self)
+        self.text_view.setReadOnly(True)
+        self.text_view.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addWidget(self.text_view)
+
+        self.refresh_timer = QtCore.QTimer(self)
+        self.refresh_timer.setInterval(self.REFRESH_INTERVAL_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def refresh(self):
+        """Перерисовывает сводку."""
+        self.text_view.setPlainText(self.metrics.render_text())
+
+    def showEvent(self, event):
+        self.refresh()
+        self.refresh_timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
@@ -0,0 +1,83 @@
+from circuit_breaker import CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(clock, threshold=3, timeout=30.0):
+    return CircuitBreaker("prices", failure_threshold=threshold, recovery_timeout=timeout, clock=clock)
+
+
+def test_opens_after_threshold_and_closes_after_successful_probe():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    for _ in range(2):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+    clock.now = 30.0
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.retry_in() == 0.0
+
+
+def test_success_resets_failure_count():
+    breaker = make_breaker(FakeClock())
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_retry_in_counts_down_while_open():
+    clock = FakeClock()
+    breaker = make_breaker(clock, threshold=1)
+    assert breaker.retry_in() == 0.0
+    breaker.record_failure()
+    assert breaker.retry_in() == 30.0
+    clock.now = 20.0
+    assert breaker.retry_in() == 10.0
+    clock.now = 45.0
+    assert breaker.retry_in() == 0.0
+
+
+def test_half_open_lets_single_probe_through():
+    clock = FakeClock()
+    breaker = make_breaker(clock, threshold=1)
+    breaker.record_failure()
+    clock.now = 30.0
+
+    assert breaker.allow_request()
+    assert not breaker.allow_request()  # Второй запрос ждет исхода пробного
+    assert breaker.retry_in() == 30.0
+
+
+def test_failed_probe_reopens_for_full_timeout():
+    clock = FakeClock()
+    breaker = make_breaker(clock, threshold=3)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now = 30.0
+    assert breaker.allow_request()
+
+    breaker.record_failure()  # Одной ошибки пробного запроса достаточно
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.retry_in() == 30.0
+    clock.now = 59.0
+    assert not breaker.allow_request()
+    clock.now = 60.0
+    assert breaker.allow_request()
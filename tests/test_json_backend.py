@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+import json_backend
+
+RESPONSE = {
+    "result": {
+        "items": [
+            {"offer_id": "A-1", "price": "1290.00", "name": "Кружка {синяя}", "tags": [1, 2.5, None]},
+            {"offer_id": "B\"2\\", "price": "15", "nested": {"a": {"b": "}"}}, "emoji": "\U0001F600"},
+            {},
+            {"offer_id": "C-3", "price": "-0.5e1", "note": "\\\"{[é"},
+        ],
+        "last_id": "abc",
+    },
+}
+
+
+def split_at(data: bytes, *offsets):
+    bounds = [0, *offsets, len(data)]
+    return [data[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_items_match_json_loads_for_every_split(indent):
+    data = json.dumps(RESPONSE, ensure_ascii=False, indent=indent).encode("utf-8")
+    expected = RESPONSE["result"]["items"]
+    for offset in range(len(data) + 1):
+        chunks = split_at(data, offset)
+        assert list(json_backend.iter_array_items(chunks, "items")) == expected, offset
+
+
+def test_single_byte_chunks_and_fields():
+    data = json.dumps(RESPONSE).encode("utf-8")
+    chunks = [data[i:i + 1] for i in range(len(data))]
+    items = list(json_backend.iter_array_items(chunks, "items", ("offer_id",)))
+    assert items == [{"offer_id": "A-1"}, {"offer_id": "B\"2\\"}, {}, {"offer_id": "C-3"}]
+
+
+def test_missing_array_yields_nothing():
+    assert list(json_backend.iter_array_items([b'{"result": {"total": 0}}'], "items")) == []
+
+
+@pytest.mark.parametrize("body", [b'{"items": [1, 2]}', b'{"items": ["a"]}', b'{"items": [[]]}'])
+def test_non_object_items_are_rejected(body):
+    with pytest.raises(ValueError):
+        list(json_backend.iter_array_items([body], "items"))
+
+
+def test_truncated_item_raises():
+    data = json.dumps(RESPONSE).encode("utf-8")
+    with pytest.raises(ValueError):
+        list(json_backend.iter_array_items([data[:60]], "items"))
@@ -0,0 +1,71 @@
+import sqlite3
+import zlib
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from leader_lease import LeaderLease, encode_snapshot
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "lease.sqlite3")
+
+
+def test_only_one_holder_until_release(db_path):
+    first = LeaderLease(db_path, "42", holder="first")
+    second = LeaderLease(db_path, "42", holder="second")
+    assert first.try_acquire()
+    assert not second.try_acquire()
+    assert second.current_holder == "first"
+    first.release()
+    assert second.try_acquire()
+    assert not first.publish_snapshot(encode_snapshot({}))  # Аренда уже не наша
+    first.close()
+    second.close()
+
+
+def test_time_left_keeps_safety_margin(db_path):
+    now = [1000.0]
+    lease = LeaderLease(db_path, "42", ttl=10.0, safety=2.0, clock=lambda: now[0])
+    assert lease.time_left() == 0.0
+    assert lease.try_acquire()
+    assert lease.time_left() == 8.0
+    now[0] += 5.0
+    assert lease.time_left() == 3.0
+    now[0] += 4.0
+    assert lease.time_left() == 0.0
+    assert not lease.is_leader()
+    lease.close()
+
+
+def test_snapshot_carries_catalog_only_when_it_changed(db_path):
+    leader = LeaderLease(db_path, "42", holder="leader")
+    follower = LeaderLease(db_path, "42", holder="follower")
+    leader.try_acquire()
+    products = [{"offer_id": "A", "price": "100"}]
+    assert leader.publish_snapshot(encode_snapshot({"prices": {"A": ["100", "90"]}, "catalog_id": "c1"}),
+                                   encode_snapshot({"products": products}), "c1")
+
+    snapshot = follower.read_snapshot()
+    assert snapshot["products"] == products and snapshot["catalog_id"] == "c1"
+    assert snapshot["holder"] == "leader"
+    # Каталог уже загружен: снимок приходит без него
+    assert "products" not in follower.read_snapshot(known_catalog_id="c1")
+
+    leader.publish_snapshot(encode_snapshot({"prices": {"A": ["110", "95"]}, "catalog_id": "c1"}))
+    snapshot = follower.read_snapshot(known_catalog_id="c1")
+    assert snapshot["prices"] == {"A": ["110", "95"]} and "products" not in snapshot
+    assert follower.read_snapshot(newer_than=snapshot["updated_at"]) is None
+    leader.close()
+    follower.close()
+
+
+def test_corrupt_snapshot_raises_zlib_error(db_path):
+    lease = LeaderLease(db_path, "42", holder="leader")
+    lease.try_acquire()
+    lease.publish_snapshot(b"not zlib")
+    with pytest.raises(zlib.error):
+        lease.read_snapshot()
+    lease.close()
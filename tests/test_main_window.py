@@ -0,0 +1,227 @@
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ.setdefault("OZON_METRICS_PORT", "0")
+
+QtWidgets = pytest.importorskip("PyQt5.QtWidgets")
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+@pytest.fixture
+def window(app, tmp_path, monkeypatch):
+    # Настройки QSettings не должны попадать в профиль пользователя
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
+    import main
+    window = main.Window()
+    window.coef_spin_box.setValue(1.0)  # Цена в таблице равна цене продавца
+    yield window
+    window.worker_pool.shutdown()
+    window.deleteLater()
+
+
+def product(offer_id, product_id, price):
+    return {"offer_id": offer_id, "id": product_id, "product_id": product_id, "name": offer_id,
+            "price": str(price), "marketing_price": str(price), "statuses": {}, "primary_image": []}
+
+
+def table_offer_ids(window):
+    return [window.tableWidget.item(row, 1).text() for row in range(window.tableWidget.rowCount())]
+
+
+def test_full_refresh_with_new_products_rebuilds_row_index(window):
+    window.detailed_products = [product("A", 1, 100), product("B", 2, 200)]
+    window.make_table(window.detailed_products)
+
+    # Полная загрузка: появился новый товар, порядок строк сдвинулся
+    window.handle_price_update([product("C", 3, 300), product("A", 1, 100), product("B", 2, 200)])
+    assert table_offer_ids(window) == ["C", "A", "B"]
+    assert window.row_by_offer_id == {"C": 0, "A": 1, "B": 2}
+    assert window.offer_id_by_product_id[3] == "C"
+
+    # Частичный опрос обновляет свой товар, а не тот, что стоял в его строке раньше
+    window.handle_price_update([product("A", 1, 150)], ["A"])
+    assert [p["offer_id"] for p in window.detailed_products] == ["C", "A", "B"]
+    assert window.detailed_products[1]["price"] == "150"
+    assert window.detailed_products[0]["price"] == "300"
+    assert window.tableWidget.item(1, 4).text() == "150.00"
+
+
+def test_full_refresh_with_same_products_keeps_table(window):
+    window.detailed_products = [product("A", 1, 100), product("B", 2, 200)]
+    window.make_table(window.detailed_products)
+    first_item = window.tableWidget.item(0, 1)
+
+    window.handle_price_update([product("A", 1, 110), product("B", 2, 200)])
+    assert window.tableWidget.item(0, 1) is first_item  # Строки не пересоздавались
+    assert window.tableWidget.item(0, 4).text() == "110.00"
+
+
+def test_open_write_circuit_enters_degraded_mode(window):
+    from circuit_breaker import CircuitOpenError
+
+    class ClosedPricesApi:
+        def update_prices(self, price_data, deadline=None):
+            raise CircuitOpenError("API временно недоступно (prices)")
+
+    window.api_client = ClosedPricesApi()
+    window.tracked_products = {"A": 100}
+    window.set_prices(["A"], window.tracked_products, {"A": [120.0, 120.0]})
+    assert window.is_degraded
+
+
+def test_price_write_stops_before_lease_expires(window, tmp_path):
+    from leader_lease import LeaderLease
+
+    now = [1000.0]
+    window.leader_lease = LeaderLease(str(tmp_path / "lease.sqlite3"), "42", clock=lambda: now[0])
+    assert window.leader_lease.try_acquire()
+    now[0] += 5.0  # Продление задержалось: до отдачи аренды осталось 3 с
+
+    class RecordingApi:
+        def update_prices(self, price_data, deadline=None):
+            self.remaining = deadline.remaining()
+            return {"successful": [], "failed": []}
+
+    window.api_client = RecordingApi()
+    window.tracked_products = {"A": 100}
+    window.set_prices(["A"], window.tracked_products, {"A": [120.0, 120.0]})
+    assert window.api_client.remaining <= 3.0
+    window.leader_lease.close()
+    window.leader_lease = None
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def open_breaker(api, group, clock):
+    from circuit_breaker import CircuitBreaker
+
+    breaker = api.breakers[group] = CircuitBreaker(group, failure_threshold=1, recovery_timeout=30.0, clock=clock)
+    breaker.record_failure()
+    return breaker
+
+
+def test_degraded_mode_enters_on_open_catalog_and_leaves_after_catch_up(window, monkeypatch):
+    from ozon_seller_api import OzonSellerAPI
+
+    clock = FakeClock()
+    window.api_client = OzonSellerAPI(client_id="1", api_key="key")
+    breaker = open_breaker(window.api_client, "catalog", clock)
+    window.is_update_running = True
+    window.handle_price_error("API временно недоступно (catalog)")
+    assert window.is_degraded
+    assert "API недоступно" in window.windowTitle()
+
+    full_syncs = []
+    monkeypatch.setattr(window, "start_price_update", lambda offer_ids=None: full_syncs.append(offer_ids))
+    window.on_scheduler_tick()
+    assert full_syncs == []  # Предохранитель разомкнут - запросов не шлем
+
+    clock.now = 30.0
+    window.on_scheduler_tick()
+    assert full_syncs == [None]  # Одна полная догоняющая синхронизация
+
+    assert breaker.allow_request()
+    breaker.record_success()
+    window.handle_price_update([product("A", 1, 100)])
+    assert not window.is_degraded
+    assert "API недоступно" not in window.windowTitle()
+
+
+def test_catch_up_waits_while_only_write_breaker_is_open(window, monkeypatch):
+    from ozon_seller_api import OzonSellerAPI
+
+    clock = FakeClock()
+    window.api_client = OzonSellerAPI(client_id="1", api_key="key")
+    open_breaker(window.api_client, "prices", clock)
+    window.set_degraded(True)
+
+    full_syncs = []
+    monkeypatch.setattr(window, "start_price_update", lambda offer_ids=None: full_syncs.append(offer_ids))
+    window.on_scheduler_tick()
+    assert full_syncs == []  # Каталог доступен, но запись цен все равно упрется в предохранитель
+
+    # Полная загрузка каталога прошла, но запись цен еще недоступна - режим не снимается
+    window.handle_price_update([product("A", 1, 100)])
+    assert window.is_degraded
+
+    clock.now = 30.0
+    window.on_scheduler_tick()
+    assert full_syncs == [None]
+
+
+def test_start_with_open_catalog_circuit_shows_empty_table(window, monkeypatch, tmp_path):
+    import ozon_seller_api
+    from circuit_breaker import CircuitOpenError
+
+    class ClosedCatalogApi:
+        def __init__(self, client_id, api_key):
+            pass
+
+        def get_products_with_details(self, deadline=None):
+            raise CircuitOpenError("API временно недоступно (catalog)")
+
+    monkeypatch.setenv("OZON_HISTORY_DIR", str(tmp_path))
+    monkeypatch.setattr(ozon_seller_api, "OzonSellerAPI", ClosedCatalogApi)
+    monkeypatch.setattr(window.config_manager, "load_lease_path", lambda: "")
+    monkeypatch.setattr(window.config_manager, "load_push_settings", lambda: (0, ""))
+    full_syncs = []
+    monkeypatch.setattr(window, "start_price_update", lambda offer_ids=None: full_syncs.append(offer_ids))
+
+    window.start()
+    assert window.is_running
+    assert window.is_degraded
+    assert window.detailed_products == []
+    assert window.tableWidget.rowCount() == 0
+    assert full_syncs == []  # Каталог догрузит догоняющая синхронизация по таймеру
+    window.start()  # Остановка
+
+
+def test_corrupt_leader_snapshot_does_not_stop_heartbeats(window, tmp_path, monkeypatch):
+    import time
+
+    from leader_lease import LeaderLease
+
+    path = str(tmp_path / "lease.sqlite3")
+    other = LeaderLease(path, "42", holder="other")
+    other.try_acquire()
+    other.publish_snapshot(b"not zlib")
+    monkeypatch.setattr(window.config_manager, "load_lease_path", lambda: path)
+    window.open_leader_lease("42")
+    assert not window.is_leader
+
+    window.on_lease_tick()
+    deadline = time.monotonic() + 5
+    while window.lease_job_running and time.monotonic() < deadline:
+        QtWidgets.QApplication.processEvents()
+        time.sleep(0.01)
+    assert not window.lease_job_running
+    assert not window.is_leader
+    window.close_leader_lease()
+    other.close()
+
+
+def test_follower_applies_prices_from_light_snapshot(window):
+    window.apply_snapshot({"updated_at": 1.0, "holder": "leader", "catalog_id": "c1",
+                           "products": [product("A", 1, 100), product("B", 2, 200)],
+                           "prices": {"A": ["100", "100"]}, "tracked_products": {}, "product_coefs": {}})
+    first_item = window.tableWidget.item(0, 1)
+    assert window.snapshot_catalog_id == "c1"
+
+    window.apply_snapshot({"updated_at": 2.0, "holder": "leader", "catalog_id": "c1",
+                           "prices": {"A": ["120", "120"], "B": ["200", "200"]},
+                           "tracked_products": {}, "product_coefs": {}})
+    assert window.tableWidget.item(0, 1) is first_item
+    assert window.detailed_products[0]["price"] == "120"
+    assert window.tableWidget.item(0, 4).text() == "120.00"
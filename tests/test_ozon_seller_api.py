@@ -0,0 +1,135 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from ozon_seller_api import IncompleteDataError, OzonSellerAPI
+
+
+class PagedApi(OzonSellerAPI):
+    """Клиент, у которого /v3/product/list отвечает из словаря раздел -> товары, без HTTP."""
+
+    def __init__(self, catalog, page_size=2):
+        super().__init__(client_id="1", api_key="key")
+        self.catalog = catalog
+        self.page_size = page_size
+        self.filters = []
+        self.threads = set()
+        self._lock = threading.Lock()
+
+    def _make_request(self, method, endpoint, payload=None, stream_key=None, fields=None, deadline=None):
+        breaker = self.breaker_for(endpoint)
+        if not breaker.allow_request():
+            raise CircuitOpenError(endpoint)
+        breaker.record_success()
+        product_filter = payload["filter"]
+        with self._lock:
+            self.filters.append(product_filter)
+            self.threads.add(threading.current_thread().name)
+        products = self.catalog[product_filter["visibility"]]
+        start = int(payload["last_id"] or 0)
+        page = products[start:start + self.page_size]
+        last_id = str(start + self.page_size) if start + self.page_size < len(products) else ""
+        return {"result": {"items": page, "last_id": last_id}}
+
+
+CATALOG = {
+    "ALL": [{"product_id": i} for i in range(1, 8)],
+    "VISIBLE": [{"product_id": i} for i in (1, 3, 5, 7)],
+    "INVISIBLE": [{"product_id": i} for i in (2, 4, 6, 7)],
+}
+
+
+def test_products_with_details_uses_single_all_cursor_by_default():
+    api = PagedApi(CATALOG)
+    api.get_product_info = lambda **kwargs: []
+    products = api.get_products_with_details()
+    assert [p["product_id"] for p in products] == list(range(1, 8))
+    assert {f["visibility"] for f in api.filters} == {"ALL"}
+
+
+def test_partitions_are_merged_without_duplicates():
+    api = PagedApi(CATALOG)
+    products = api.get_product_list_partitioned(OzonSellerAPI.LIST_PARTITIONS, limit=2)
+    assert [p["product_id"] for p in products] == list(range(1, 8))
+    assert any(name.startswith("product-list") for name in api.threads)
+
+
+def test_half_open_breaker_lists_partitions_one_by_one():
+    clock = [0.0]
+    api = PagedApi(CATALOG)
+    breaker = api.breakers["catalog"] = CircuitBreaker("catalog", failure_threshold=1, recovery_timeout=5.0,
+                                                       clock=lambda: clock[0])
+    breaker.record_failure()
+    clock[0] = 10.0  # Пауза истекла: первый запрос будет пробным
+    products = api.get_product_list_partitioned(OzonSellerAPI.LIST_PARTITIONS, strict=True)
+    assert [p["product_id"] for p in products] == list(range(1, 8))
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert api.threads == {threading.current_thread().name}
+
+
+def test_failed_partition_raises_in_strict_mode():
+    api = PagedApi(dict(CATALOG, INVISIBLE=None))
+    original = api._make_request
+
+    def failing(method, endpoint, payload=None, **kwargs):
+        if payload["filter"]["visibility"] == "INVISIBLE":
+            return None
+        return original(method, endpoint, payload, **kwargs)
+
+    api._make_request = failing
+    with pytest.raises(IncompleteDataError):
+        api.get_product_list_partitioned(OzonSellerAPI.LIST_PARTITIONS, strict=True)
+
+
+class _TruncatingHandler(BaseHTTPRequestHandler):
+    """Отвечает 200 с Content-Length больше отправленного тела и обрывает соединение."""
+    status = 200
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = b'{"items": [{"id": 1, "offer_id": "A"}, {"id": 2, "off'
+        self.send_response(self.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body) + 1000))
+        self.end_headers()
+        self.wfile.write(body)
+        self.wfile.flush()
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def truncating_server():
+    servers = []
+
+    def start(status=200):
+        handler = type("Handler", (_TruncatingHandler,), {"status": status})
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        api = OzonSellerAPI(client_id="1", api_key="key")
+        api.BASE_URL = f"http://127.0.0.1:{server.server_address[1]}"
+        return api
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_connection_dropped_mid_stream_returns_none(truncating_server):
+    api = truncating_server()
+    assert api.get_product_info(product_ids=[1, 2], fields=OzonSellerAPI.DETAIL_FIELDS) == []
+    assert api.breaker_for('/v3/product/info/list')._failures == 1  # Обрыв - сбой API
+    with pytest.raises(IncompleteDataError):
+        api.get_product_info(product_ids=[1, 2], fields=OzonSellerAPI.DETAIL_FIELDS, strict=True)
+
+
+def test_error_status_with_dropped_body_returns_none(truncating_server):
+    api = truncating_server(status=503)
+    assert api.get_product_info(product_ids=[1, 2], fields=OzonSellerAPI.DETAIL_FIELDS) == []
+    assert api.get_product_list(limit=10) == []
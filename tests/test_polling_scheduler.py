@@ -0,0 +1,116 @@
+from polling_scheduler import AdaptivePollScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_scheduler(clock, **kwargs):
+    options = dict(min_interval=30.0, max_interval=1800.0, initial_interval=60.0,
+                   max_requests_per_minute=30, batch_size=1000, clock=clock)
+    options.update(kwargs)
+    return AdaptivePollScheduler(**options)
+
+
+def interval(scheduler, offer_id):
+    return scheduler._states[offer_id].interval
+
+
+def test_new_products_are_due_immediately():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    scheduler.sync_tracked(["A", "B"])
+    assert sorted(scheduler.pop_due()) == ["A", "B"]
+    # Выданные товары до ответа повторно не выдаются
+    assert scheduler.pop_due() == []
+    scheduler.sync_tracked(["B"])
+    assert len(scheduler) == 1
+
+
+def test_drift_halves_and_stability_grows_interval():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    scheduler.sync_tracked(["A"])
+    scheduler.record("A", 1000.0, 900.0, 1000)
+    assert interval(scheduler, "A") == 90.0
+    scheduler.record("A", 1100.0, 900.0, 1000)
+    assert interval(scheduler, "A") == 45.0
+    scheduler.record("A", 1100.0, 900.0, 1000)
+    assert interval(scheduler, "A") == 30.0  # Не меньше min_interval
+
+
+def test_marketing_price_change_counts_as_drift():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    scheduler.sync_tracked(["A"])
+    scheduler.record("A", 1000.0, 900.0, None)
+    scheduler.record("A", 1000.0, 850.0, None)
+    assert interval(scheduler, "A") == 45.0
+    assert scheduler.stats()["drift_ratio"] == 0.5
+
+
+def test_interval_is_capped_by_max_interval():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, max_interval=100.0)
+    scheduler.sync_tracked(["A"])
+    for _ in range(5):
+        scheduler.record("A", 1000.0, 900.0, 1000)
+    assert interval(scheduler, "A") == 100.0
+    assert scheduler.next_due_in() == 100.0
+
+
+def test_token_bucket_limits_batches_per_minute():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, max_requests_per_minute=2, batch_size=2)
+    scheduler.sync_tracked([f"P{i}" for i in range(10)])
+    assert len(scheduler.pop_due()) == 4  # Два запроса по два товара
+    assert scheduler.pop_due() == []
+    clock.now += 30  # За полминуты накопился один токен
+    assert len(scheduler.pop_due()) == 2
+
+
+def test_mark_urgent_moves_product_to_front():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    scheduler.sync_tracked(["A", "B"])
+    scheduler.pop_due()
+    scheduler.record("A", 1000.0, 900.0, 1000)
+    scheduler.record("B", 1000.0, 900.0, 1000)
+    assert scheduler.pop_due() == []
+    scheduler.mark_urgent(["B", "unknown"])
+    assert scheduler.pop_due() == ["B"]
+
+
+def test_set_min_interval_raises_floor():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    scheduler.sync_tracked(["A", "B"])
+    scheduler.record("B", 1100.0, 900.0, 1000)  # B стал волатильным: 30 с
+    scheduler.set_min_interval(600.0)
+    assert interval(scheduler, "A") == 600.0
+    assert interval(scheduler, "B") == 600.0
+    scheduler.record("B", 1100.0, 900.0, 1000)
+    assert interval(scheduler, "B") == 600.0  # Срабатывание не опускает ниже новой границы
+
+
+def test_lowering_min_interval_restores_polling():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    scheduler.sync_tracked(["A", "B"])
+    scheduler.pop_due()
+    scheduler.set_min_interval(600.0)
+    scheduler.record("A", 1000.0, 900.0, 1000)
+    scheduler.record("B", 1000.0, 900.0, 1000)
+    assert scheduler.next_due_in() == 900.0
+
+    scheduler.set_min_interval(None)
+    assert scheduler.min_interval == 30.0
+    assert interval(scheduler, "A") == interval(scheduler, "B") == 60.0
+    # Уже запланированные через 900 с опросы переносятся на новый интервал
+    assert scheduler.next_due_in() == 60.0
+    scheduler.record("B", 1100.0, 900.0, 1000)
+    assert interval(scheduler, "B") == 30.0
@@ -0,0 +1,71 @@
+import pytest
+
+from price_history import PriceHistory
+
+
+@pytest.fixture
+def history():
+    history = PriceHistory(ring_size=4, clock=lambda: 10_000.0)
+    yield history
+    history.close()
+
+
+def stored_samples(history):
+    return history._conn.execute("SELECT COUNT(*) FROM samples").fetchone()[0]
+
+
+def test_full_batch_requests_flush_instead_of_writing(history):
+    requests = []
+    history._request_flush = lambda: requests.append(True)
+    history.FLUSH_BATCH = 3
+    for i in range(5):
+        history.record("A", 100.0 + i, 90.0, 100, ts=1000.0 + i)
+    assert requests == [True]  # Один запрос на пачку, пока сброс не выполнен
+    assert stored_samples(history) == 0
+    assert history.flush() == 5
+    history.record("A", 100.0, 90.0, 100, ts=2000.0)
+    history.record("A", 100.0, 90.0, 100, ts=2001.0)
+    history.record("A", 100.0, 90.0, 100, ts=2002.0)
+    assert requests == [True, True]
+
+
+def test_queries_include_pending_samples_without_flushing(history):
+    history.record("A", 100.0, 90.0, 100, ts=1000.0)
+    history.record("A", 110.0, 95.0, 100, ts=1030.0)
+    history.flush()
+    history.record("A", 120.0, 99.0, 105, ts=1050.0)
+    history.record("B", 50.0, 45.0, None, ts=1060.0)
+    history.record_push("A", 101.0, ts=1040.0)
+
+    raw = history.query("A", 0.0, 2000.0, "raw")
+    assert [(p.ts, p.price) for p in raw] == [(1000.0, 100.0), (1030.0, 110.0), (1050.0, 120.0)]
+
+    (minute_a, minute_b) = history.query("A", 0.0, 2000.0, "minute")
+    assert minute_a.ts == 960 and minute_a.price == 100.0
+    # Корзина 1020..1080: замер из базы и несброшенный замер сведены вместе
+    assert minute_b.ts == 1020
+    assert (minute_b.price, minute_b.price_min, minute_b.price_max) == (115.0, 110.0, 120.0)
+    assert minute_b.target == 105
+
+    assert history.pushes("A", 0.0, 2000.0) == [(1040.0, 101.0)]
+    assert history.offer_ids() == ["A", "B"]
+    assert stored_samples(history) == 2
+
+    history.flush()
+    assert history.query("A", 0.0, 2000.0, "minute") == [minute_a, minute_b]
+
+
+def test_forget_drops_ring_buffers_only(history):
+    history.record("A", 100.0, 90.0, 100, ts=1000.0)
+    history.record("B", 100.0, 90.0, 100, ts=1000.0)
+    history.forget(["A"])
+    assert set(history._rings) == {"A"}
+    assert history.offer_ids() == ["A", "B"]
+
+
+def test_flush_after_close_does_nothing():
+    history = PriceHistory()
+    history.record("A", 100.0, 90.0, 100, ts=1000.0)
+    history.close()
+    history.record("A", 100.0, 90.0, 100, ts=1001.0)
+    assert history.flush() == 0
@@ -0,0 +1,41 @@
+import pytest
+
+import pricing
+
+
+def test_parse_prices_falls_back_to_seller_price():
+    assert pricing.parse_prices({"price": "1000.00", "marketing_price": "852.5"}) == (1000.0, 852.5)
+    assert pricing.parse_prices({"price": "1000", "marketing_price": ""}) == (1000.0, 1000.0)
+    assert pricing.parse_prices({"price": None}) is None
+    assert pricing.parse_prices({}) is None
+
+
+def test_displayed_price_rounds_up():
+    # 1000 * (900 / 1000) * 0.852 = 766.8
+    assert pricing.displayed_price(1000.0, 900.0, 0.852) == 767
+    assert pricing.displayed_price(1000.0, 1000.0, 1.0) == 1000
+
+
+def test_seller_price_for_rounds_up_and_reaches_target():
+    price, marketing_price, coef = 1000.0, 900.0, 0.852
+    new_price = pricing.seller_price_for(700, price, marketing_price, coef)
+    # 700 / 0.7668 = 912.88...
+    assert new_price == 913
+    ratio = marketing_price / price
+    assert pricing.displayed_price(new_price, new_price * ratio, coef) >= 700
+
+
+@pytest.mark.parametrize("price, target, expected", [
+    (1000.0, 1000, False),
+    (1010.0, 1000, False),
+    (990.0, 1000, False),
+    (1010.5, 1000, True),
+    (989.5, 1000, True),
+])
+def test_is_out_of_band(price, target, expected):
+    assert pricing.is_out_of_band(price, target) is expected
+
+
+def test_is_out_of_band_custom_band():
+    assert not pricing.is_out_of_band(1040.0, 1000, band=0.05)
+    assert pricing.is_out_of_band(1060.0, 1000, band=0.05)
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from push_receiver import PushReceiver
+
+
+def body(**fields):
+    payload = {"message_type": "TYPE_PRICE_INDEX_CHANGED", "seller_id": 1}
+    payload.update(fields)
+    return json.dumps(payload).encode("utf-8")
+
+
+@pytest.fixture
+def changes():
+    return []
+
+
+@pytest.fixture
+def receiver(changes):
+    return PushReceiver(lambda offer_ids, product_ids: changes.append((offer_ids, product_ids)), seller_id="1")
+
+
+def test_redelivery_with_timestamp_is_dropped(receiver, changes):
+    event = body(offer_id="A", changed_at="2026-10-19T10:00:00Z")
+    assert receiver.handle(event)[0] == 200
+    assert receiver.handle(event)[0] == 200
+    assert changes == [(["A"], [])]
+    assert receiver.counts["duplicate"] == 1
+    receiver.handle(body(offer_id="A", changed_at="2026-10-19T10:05:00Z"))
+    assert len(changes) == 2
+
+
+def test_events_without_timestamp_are_never_deduplicated(receiver, changes):
+    receiver.handle(body(product_id=42))
+    receiver.handle(body(product_id=42))
+    assert changes == [([], [42]), ([], [42])]
+    assert receiver.counts == {"accepted": 2, "duplicate": 0, "ignored": 0, "rejected": 0}
+
+
+def test_invalid_and_foreign_events_are_rejected(receiver, changes):
+    assert receiver.handle(b"not json")[0] == 400
+    assert receiver.handle(body(offer_id="A", seller_id=2))[0] == 400
+    assert receiver.handle(body())[0] == 400
+    assert receiver.handle(body(message_type="TYPE_NEW_POSTING", offer_id="A"))[0] == 200
+    assert changes == []
+    assert receiver.counts["rejected"] == 3 and receiver.counts["ignored"] == 1
@@ -0,0 +1,87 @@
+import pytest
+
+import replay
+from price_history import PriceHistory
+from replay import ReplayPolicy
+
+
+@pytest.fixture
+def history_path(tmp_path):
+    """Записанная история: три тика по минуте, C не отслеживается."""
+    path = str(tmp_path / "history.sqlite3")
+    history = PriceHistory(path, clock=lambda: 1000.0)  # Иначе старые замеры уйдут по сроку хранения
+    history.record("A", 200.0, 200.0, 200, ts=600.0)
+    history.record("B", 60.0, 60.0, 50, ts=610.0)
+    history.record("A", 200.0, 180.0, 200, ts=660.0)
+    history.record("C", 70.0, 70.0, None, ts=670.0)
+    history.record("A", 200.0, 180.0, 200, ts=720.0)
+    history.record("B", 60.0, 57.0, 50, ts=730.0)
+    history.flush()
+    history.close()
+    return path
+
+
+def run(history_path, policies, use_numpy=False):
+    offer_ids, ticks = replay.ticks_from_history(history_path, 0.0, 1000.0, step=60.0)
+    return offer_ids, replay.replay(ticks, offer_ids, policies, use_numpy=use_numpy)
+
+
+POLICIES = [ReplayPolicy(1.0, 0.01, "seller"), ReplayPolicy(1.0, 0.01, "displayed")]
+
+
+def test_replay_of_recorded_history(history_path):
+    offer_ids, (by_seller, by_displayed) = run(history_path, POLICIES)
+    assert offer_ids == ["A", "B", "C"]
+
+    # По цене продавца: B сразу вне коридора и записывается один раз, у A цена продавца
+    # в коридоре, хотя покупатель из-за софинансирования видит 180 вместо 200
+    assert by_seller.ticks == 3
+    assert by_seller.observations == 5
+    assert by_seller.writes == 1
+    assert by_seller.writes_per_offer == [0, 1, 0]
+    assert by_seller.error_sum == pytest.approx(0 + 20 + 10 + 10 + 4)
+    assert by_seller.error_max == pytest.approx(20.0)
+
+    # По цене для покупателя: A поднимается до 223 (покупатель видит 201), B - до 53
+    assert by_displayed.observations == 5
+    assert by_displayed.writes == 3
+    assert by_displayed.writes_per_offer == [1, 2, 0]
+    assert by_displayed.error_sum == pytest.approx(0 + 20 + 10 + 0.5 + 4)
+    assert by_displayed.mean_error_pct == pytest.approx(34.5 / 5)
+    assert by_displayed.error_percentile(0.5) == pytest.approx(4.0)
+
+
+def test_target_override_replaces_recorded_targets(history_path):
+    offer_ids, ticks = replay.ticks_from_history(history_path, 0.0, 1000.0, step=60.0, targets={"C": 70})
+    (report,) = replay.replay(ticks, offer_ids, [ReplayPolicy(1.0, 0.01)], use_numpy=False)
+    assert report.observations == 1  # Отслеживается только C
+    assert report.writes == 0
+
+
+def assert_same_reports(python_reports, numpy_reports):
+    for expected, actual in zip(python_reports, numpy_reports):
+        assert actual.ticks == expected.ticks
+        assert actual.observations == expected.observations
+        assert actual.writes == expected.writes
+        assert actual.writes_per_offer == expected.writes_per_offer
+        assert actual.error_histogram == expected.error_histogram
+        assert actual.error_sum == pytest.approx(expected.error_sum)
+        assert actual.error_max == pytest.approx(expected.error_max)
+
+
+def test_numpy_matches_python_on_recorded_history(history_path):
+    pytest.importorskip("numpy")
+    _, python_reports = run(history_path, POLICIES)
+    _, numpy_reports = run(history_path, POLICIES, use_numpy=True)
+    assert_same_reports(python_reports, numpy_reports)
+
+
+def test_numpy_matches_python_on_synthetic_ticks():
+    pytest.importorskip("numpy")
+    policies = [ReplayPolicy(coef, band, trigger)
+                for coef in (0.852, 0.9) for band in (0.01, 0.03) for trigger in replay.TRIGGERS]
+    offer_ids, ticks = replay.synthetic_ticks(200, 30)
+    python_reports = replay.replay(ticks, offer_ids, policies, use_numpy=False)
+    offer_ids, ticks = replay.synthetic_ticks(200, 30)
+    numpy_reports = replay.replay(ticks, offer_ids, policies, use_numpy=True)
+    assert_same_reports(python_reports, numpy_reports)
@@ -95,6 +95,32 @@ class Ui_MainWindow(object):
         self.gridLayout.addWidget(self.tableWidget, 1, 0, 1, 1)
         self.gridLayout_2.addLayout(self.gridLayout, 0, 0, 1, 1)
         MainWindow.setCentralWidget(self.centralwidget)
+        self.menubar = QtWidgets.QMenuBar(MainWindow)
+        self.menubar.setGeometry(QtCore.QRect(0, 0, 788, 21))
+        self.menubar.setObjectName("menubar")
+        self.file_menu = QtWidgets.QMenu(self.menubar)
+        self.file_menu.setObjectName("file_menu")
+        self.tools_menu = QtWidgets.QMenu(self.menubar)
+        self.tools_menu.setObjectName("tools_menu")
+        MainWindow.setMenuBar(self.menubar)
+        self.import_action = QtWidgets.QAction(MainWindow)
+        self.import_action.setObjectName("import_action")
+        self.export_action = QtWidgets.QAction(MainWindow)
+        self.export_action.setObjectName("export_action")
+        self.stats_action = QtWidgets.QAction(MainWindow)
+        self.stats_action.setObjectName("stats_action")
+        self.history_action = QtWidgets.QAction(MainWindow)
+        self.history_action.setObjectName("history_action")
+        self.profiling_action = QtWidgets.QAction(MainWindow)
+        self.profiling_action.setCheckable(True)
+        self.profiling_action.setObjectName("profiling_action")
+        self.file_menu.addAction(self.import_action)
+        self.file_menu.addAction(self.export_action)
+        self.tools_menu.addAction(self.stats_action)
+        self.tools_menu.addAction(self.history_action)
+        self.tools_menu.addAction(self.profiling_action)
+        self.menubar.addAction(self.file_menu.menuAction())
+        self.menubar.addAction(self.tools_menu.menuAction())
 
         self.retranslateUi(MainWindow)
         QtCore.QMetaObject.connectSlotsByName(MainWindow)
@@ -124,3 +150,10 @@ class Ui_MainWindow(object):
         item.setText(_translate("MainWindow", "Выравнивать"))
         item = self.tableWidget.horizontalHeaderItem(6)
         item.setText(_translate("MainWindow", "Уровень цены"))
+        self.file_menu.setTitle(_translate("MainWindow", "Файл"))
+        self.tools_menu.setTitle(_translate("MainWindow", "Инструменты"))
+        self.import_action.setText(_translate("MainWindow", "Импорт желаемых цен..."))
+        self.export_action.setText(_translate("MainWindow", "Экспорт каталога..."))
+        self.stats_action.setText(_translate("MainWindow", "Статистика API"))
+        self.history_action.setText(_translate("MainWindow", "История цен"))
+        self.profiling_action.setText(_translate("MainWindow", "Профилирование циклов"))
@@ -0,0 +1,125 @@
+import itertools
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """Задача отменена (пользователь остановил работу или ее результат устарел)."""
+
+
+class CancelToken:
+    """Флаг кооперативной отмены: задача сама проверяет его между шагами."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise JobCancelled("Задача отменена")
+
+
+class Job:
+    """
+    Задача в пуле потоков.
+
+    Attributes:
+        id: Порядковый номер задачи (для логов).
+        kind: Вид задачи ('price', 'images' и т.п.).
+        generation: Поколение вида на момент запуска; результаты старых поколений отбрасываются.
+        token: Флаг отмены задачи.
+    """
+
+    def __init__(self, job_id: int, kind: str, generation: int):
+        self.id = job_id
+        self.kind = kind
+        self.generation = generation
+        self.token = CancelToken()
+        self.future: Optional[Future] = None
+
+
+class WorkerPool:
+    """
+    Общий ограниченный пул потоков для фоновых задач приложения.
+
+    Вместо нового threading.Thread на каждую операцию задачи выполняются
+    в фиксированном наборе потоков. У каждого вида задач есть счетчик
+    поколений: new_generation() отменяет все выполняющиеся задачи этого вида,
+    а GUI по номеру поколения отбрасывает результаты, которые успели прийти от них.
+    """
+
+    def __init__(self, max_workers: int = 4, name: str = "worker"):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._jobs: Dict[int, Job] = {}
+        self._generations: Dict[str, int] = {}
+
+    def generation(self, kind: str) -> int:
+        """Текущее поколение задач вида kind."""
+        with self._lock:
+            return self._generations.get(kind, 0)
+
+    def is_current(self, kind: str, generation: int) -> bool:
+        """True, если результат с этим поколением еще актуален."""
+        return self.generation(kind) == generation
+
+    def new_generation(self, kind: str) -> int:
+        """Начинает новое поколение задач вида kind и отменяет все предыдущие."""
+        with self._lock:
+            generation = self._generations.get(kind, 0) + 1
+            self._generations[kind] = generation
+            stale = [job for job in self._jobs.values() if job.kind == kind]
+        for job in stale:
+            job.token.cancel()
+        return generation
+
+    def submit(self, kind: str, func: Callable[[Job], None]) -> Job:
+        """
+        Ставит задачу в очередь пула в текущем поколении вида kind.
+        func получает объект Job и должна периодически вызывать job.token.raise_if_cancelled().
+        """
+        job = Job(next(self._ids), kind, self.generation(kind))
+        with self._lock:
+            self._jobs[job.id] = job
+        job.future = self._executor.submit(self._run, job, func)
+        return job
+
+    def _run(self, job: Job, func: Callable[[Job], None]):
+        try:
+            if job.token.cancelled:
+                return  # Отменена, пока стояла в очереди
+            func(job)
+        except JobCancelled:
+            logger.debug("Задача %s #%d отменена.", job.kind, job.id)
+        except Exception:
+            logger.exception("Необработанная ошибка в задаче %s #%d", job.kind, job.id)
+        finally:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+
+    def active_jobs(self) -> int:
+        with self._lock:
+            return len(self._jobs)
+
+    def cancel_all(self):
+        """Отменяет все задачи всех видов и начинает для них новые поколения."""
+        with self._lock:
+            kinds = set(self._generations) | {job.kind for job in self._jobs.values()}
+        for kind in kinds:
+            self.new_generation(kind)
+
+    def shutdown(self):
+        """Отменяет задачи и останавливает пул, не дожидаясь зависших потоков."""
+        self.cancel_all()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -3,9 +3,11 @@ from PyQt5.QtGui import QPixmap
 
 class WorkerSignals(QObject):
     """
-    Определяет сигналы для рабочего потока.
-    - image_ready: передает номер строки (int) и загруженное изображение (QPixmap).
-    - finished: сообщает о завершении всей работы.
+    Определяет сигналы для рабочего потока. Объект создается один раз и
+    переиспользуется всеми загрузками; первым аргументом идет поколение задачи,
+    чтобы окно могло отбросить результаты загрузки для старой таблицы.
+    - image_ready: поколение (int), номер строки (int) и загруженное изображение (QPixmap).
+    - finished: поколение (int); сообщает о завершении всей работы.
     """
-    image_ready = pyqtSignal(int, QPixmap)
-    finished = pyqtSignal()
\ No newline at end of file
+    image_ready = pyqtSignal(int, int, QPixmap)
+    finished = pyqtSignal(int)
\ No newline at end of file